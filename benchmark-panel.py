@@ -0,0 +1,442 @@
+#!/usr/bin/env python3
+"""Benchmarks del Dragwaysk Control Center
+
+Uso:
+    python3 benchmark-panel.py status [--cycles N] [--units N]
+    python3 benchmark-panel.py helper [--ops N] [--pkexec]
+    python3 benchmark-panel.py pm2 [--cycles N] [--name shinobi]
+    python3 benchmark-panel.py cli [--runs N]
+    python3 benchmark-panel.py startup [--runs N]   (necesita pantalla; en CI: xvfb-run)
+    python3 benchmark-panel.py queue [--toggles N] [--units N] [--threads N]
+    python3 benchmark-panel.py reconcile [--seconds N] [--units N] [--crash P] [--fail P]
+"""
+import argparse
+import logging
+import os
+import random
+import re
+import resource
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+PANEL_PATH = os.path.join(BASE_DIR, "dragwaysk-panel.py")
+HELPER_PATH = os.path.join(BASE_DIR, "dragwaysk-helper.py")
+
+# systemctl simulado: tarda lo mismo que un start/stop trivial y siempre tiene éxito
+FAKE_SYSTEMCTL = """#!/bin/sh
+sleep 0.02
+exit 0
+"""
+
+
+def load_panel():
+    """Carga el motor del panel (dragwaysk_core, sin GTK)"""
+    sys.path.insert(0, BASE_DIR)
+    import dragwaysk_core
+    return dragwaysk_core
+
+
+class ForkCounter:
+    """Cuenta los procesos lanzados con subprocess mientras está activo"""
+
+    def __init__(self):
+        self.forks = 0
+        self._original = None
+
+    def __enter__(self):
+        counter = self
+        self._original = subprocess.Popen
+
+        class CountingPopen(self._original):
+            def __init__(self, *args, **kwargs):
+                counter.forks += 1
+                super().__init__(*args, **kwargs)
+
+        subprocess.Popen = CountingPopen
+        return self
+
+    def __exit__(self, *exc):
+        subprocess.Popen = self._original
+        return False
+
+
+def measure(fn, cycles):
+    """Ejecuta fn 'cycles' veces y devuelve (forks por ciclo, ms por ciclo)"""
+    with ForkCounter() as counter:
+        start = time.perf_counter()
+        for _ in range(cycles):
+            fn()
+        elapsed = time.perf_counter() - start
+    return counter.forks / cycles, elapsed * 1000 / cycles
+
+
+def measure_cpu(fn, cycles):
+    """Ejecuta fn 'cycles' veces y devuelve (ms de CPU propios + hijos, ms de reloj) por ciclo"""
+    def cpu():
+        own = resource.getrusage(resource.RUSAGE_SELF)
+        children = resource.getrusage(resource.RUSAGE_CHILDREN)
+        return own.ru_utime + own.ru_stime + children.ru_utime + children.ru_stime
+
+    cpu_start, start = cpu(), time.perf_counter()
+    for _ in range(cycles):
+        fn()
+    cpu_ms = (cpu() - cpu_start) * 1000 / cycles
+    return cpu_ms, (time.perf_counter() - start) * 1000 / cycles
+
+
+def system_units(limit):
+    """Devuelve hasta 'limit' servicios instalados para simular una configuración grande"""
+    result = subprocess.run(
+        ["systemctl", "list-units", "--type=service", "--all", "--no-legend", "--plain"],
+        capture_output=True,
+        text=True,
+        timeout=10
+    )
+    units = [line.split()[0] for line in result.stdout.splitlines() if line.strip()]
+    return [u[:-len(".service")] for u in units if u.endswith(".service")][:limit]
+
+
+def bench_status(args):
+    panel = load_panel()
+    if args.units:
+        services = system_units(args.units)
+    else:
+        services = [s["service"] for s in panel.SERVICES_CONFIG]
+    validator = panel.ServiceValidator
+
+    def per_row():
+        for name in services:
+            validator.get_service_status(name)
+
+    def batched():
+        validator.get_services_status(services)
+
+    print(f"Servicios: {len(services)}  Ciclos: {args.cycles}")
+    print(f"{'Modo':<24}{'forks/ciclo':>12}{'ms/ciclo':>12}")
+    for label, fn in (("is-active por fila", per_row), ("systemctl show en lote", batched)):
+        forks, ms = measure(fn, args.cycles)
+        print(f"{label:<24}{forks:>12.1f}{ms:>12.1f}")
+
+
+def bench_helper(args):
+    panel = load_panel()
+    with tempfile.TemporaryDirectory() as tmp:
+        fake = os.path.join(tmp, "systemctl")
+        with open(fake, "w") as f:
+            f.write(FAKE_SYSTEMCTL)
+        os.chmod(fake, 0o755)
+
+        prefix = ["pkexec"] if args.pkexec else []
+
+        def per_action():
+            subprocess.run(prefix + [fake, "start", "postgresql"], capture_output=True, check=True)
+
+        helper = panel.PrivilegedHelper(prefix + [sys.executable, HELPER_PATH, "--systemctl", fake])
+        # El arranque (y la contraseña) se pagan una sola vez; si falla (p. ej. como root, donde el
+        # ayudante rechaza --systemctl) las cifras no medirían nada
+        ok, error = helper.run("start", ["postgresql"])
+        if not ok:
+            print(f"El ayudante no funciona: {error}", file=sys.stderr)
+            return 1
+
+        def via_helper():
+            ok, error = helper.run("start", ["postgresql"])
+            if not ok:
+                raise RuntimeError(f"El ayudante falló durante la medición: {error}")
+
+        print(f"Operaciones: {args.ops}  (pkexec real: {'sí' if args.pkexec else 'no'})")
+        print(f"{'Modo':<24}{'forks/op':>12}{'ms/op':>12}")
+        try:
+            for label, fn in (("proceso por acción", per_action), ("ayudante persistente", via_helper)):
+                forks, ms = measure(fn, args.ops)
+                print(f"{label:<24}{forks:>12.1f}{ms:>12.1f}")
+        finally:
+            helper.close()
+
+
+def bench_pm2(args):
+    panel = load_panel()
+    client = panel.PM2Client()
+    if not client.daemon_running():
+        print(f"El demonio de PM2 no está corriendo ({client.rpc_path} no existe)")
+        return 1
+
+    def cli():
+        subprocess.run(["pm2", "jlist"], capture_output=True, text=True, timeout=10)
+
+    def native():
+        client.get_status(args.name)
+
+    print(f"Proceso: {args.name}  Ciclos: {args.cycles}")
+    print(f"{'Modo':<24}{'CPU ms/ciclo':>14}{'ms/ciclo':>12}")
+    for label, fn in (("pm2 jlist", cli), ("socket RPC de PM2", native)):
+        cpu_ms, ms = measure_cpu(fn, args.cycles)
+        print(f"{label:<24}{cpu_ms:>14.1f}{ms:>12.1f}")
+
+
+def bench_cli(args):
+    def run(argv):
+        start = time.perf_counter()
+        subprocess.run([sys.executable] + argv, capture_output=True)
+        return (time.perf_counter() - start) * 1000
+
+    commands = (
+        ("intérprete vacío", ["-c", "pass"]),
+        ("importar motor", ["-c", f"import sys; sys.path.insert(0, {BASE_DIR!r}); import dragwaysk_cli"]),
+        ("importar ventana", ["-c", f"import sys; sys.path.insert(0, {BASE_DIR!r}); import dragwaysk_gui"]),
+        ("status --json", [PANEL_PATH, "status", "--json"]),
+    )
+    print(f"Ejecuciones: {args.runs}")
+    print(f"{'Comando':<24}{'ms (mediana)':>14}")
+    for label, argv in commands:
+        times = sorted(run(argv) for _ in range(args.runs))
+        print(f"{label:<24}{times[len(times) // 2]:>14.1f}")
+
+
+def bench_startup(args):
+    """Abre y cierra la ventana varias veces y reporta la mediana de cada hito de arranque"""
+    mark_line = re.compile(r"^Arranque: (.+) a los (\d+) ms$")
+    marks = {}
+    for _ in range(args.runs):
+        result = subprocess.run(
+            [sys.executable, PANEL_PATH, "--profile-startup", "--exit-after-startup"],
+            capture_output=True, text=True, timeout=60
+        )
+        for line in result.stderr.splitlines():
+            match = mark_line.match(line)
+            if match:
+                marks.setdefault(match.group(1), []).append(int(match.group(2)))
+    if not marks:
+        print("La ventana no arrancó (¿hay DISPLAY?)")
+        return 1
+
+    print(f"Ejecuciones: {args.runs}")
+    print(f"{'Hito':<24}{'ms (mediana)':>14}{'mín':>8}{'máx':>8}")
+    for name, values in sorted(marks.items(), key=lambda item: sorted(item[1])[len(item[1]) // 2]):
+        values.sort()
+        print(f"{name:<24}{values[len(values) // 2]:>14}{values[0]:>8}{values[-1]:>8}")
+
+
+def bench_queue(args):
+    """Miles de toggles al azar contra un backend simulado: la cola no debe solapar operaciones
+    de una misma unidad y cada unidad debe acabar en el último estado pedido"""
+    panel = load_panel()
+    logging.disable(logging.WARNING)  # Los fallos simulados no interesan uno por uno
+    units = [f"unidad{i}" for i in range(args.units)]
+    state = {name: "inactive" for name in units}
+    busy = set()       # Unidades con comando o confirmación en curso
+    overlaps = []
+    commands = [0]
+    lock = threading.Lock()
+
+    def run_batch(names, action):
+        with lock:
+            overlaps.extend(busy.intersection(names))
+            busy.update(names)
+            commands[0] += len(names)
+        time.sleep(random.uniform(0, args.delay))
+        results = {}
+        with lock:
+            for name in names:
+                if random.random() < args.fail:
+                    busy.discard(name)
+                    results[name] = (False, "Fallo simulado")
+                else:
+                    state[name] = action == "start" and "active" or "inactive"
+                    results[name] = (True, None)
+        return results
+
+    def wait_ready(name, action, cancel):
+        start = time.monotonic()
+        cancelled = cancel.wait(random.uniform(0, args.delay))
+        with lock:
+            busy.discard(name)
+        return (None if cancelled else True), time.monotonic() - start
+
+    with tempfile.TemporaryDirectory() as tmp:
+        panel.TRACER.path = os.path.join(tmp, "operation-latency.json")  # No ensuciar los histogramas reales
+        operations = panel.OperationQueue(run_batch, wait_ready, group_key=lambda name: "simulado")
+        desired = {}   # unidad -> último estado pedido (None tras cancelar)
+        futures = []
+        submit_lock = threading.Lock()
+
+        def client(seed, count):
+            rng = random.Random(seed)
+            for _ in range(count):
+                roll = rng.random()
+                with submit_lock:  # El orden de envío define cuál es la última petición
+                    if roll < 0.02:
+                        name = rng.choice(units)
+                        desired[name] = None
+                        operations.cancel([name])
+                        continue
+                    names = roll < 0.05 and units or [rng.choice(units)]
+                    action = rng.choice(("start", "stop"))
+                    for name in names:
+                        desired[name] = action
+                    futures.extend(operations.submit(names, action).values())
+                time.sleep(rng.uniform(0, args.delay / 10))
+
+        start = time.perf_counter()
+        per_thread = args.toggles // args.threads
+        threads = [threading.Thread(target=client, args=(seed, per_thread)) for seed in range(args.threads)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        results = [future.result(timeout=60) for future in futures]
+        elapsed = time.perf_counter() - start
+
+    failed = [error for success, error, seconds in results if not success]
+    # Con fallos simulados una unidad puede quedar en el estado anterior a su última petición
+    wrong = [
+        name for name, action in desired.items()
+        if action is not None and not args.fail and state[name] != (action == "start" and "active" or "inactive")
+    ]
+    print(f"Peticiones: {len(futures)}  Unidades: {args.units}  Hilos: {args.threads}  ({elapsed:.1f} s)")
+    print(f"{'Comandos ejecutados':<28}{commands[0]:>8}")
+    print(f"{'Fusionadas o reemplazadas':<28}{failed.count(panel.OperationQueue.SUPERSEDED):>8}")
+    print(f"{'Canceladas':<28}{failed.count(panel.OperationQueue.CANCELLED):>8}")
+    print(f"{'Solapamientos por unidad':<28}{len(overlaps):>8}")
+    print(f"{'Estado final incorrecto':<28}{len(wrong):>8}")
+    return (overlaps or wrong) and 1 or 0
+
+
+def bench_reconcile(args):
+    """Caídas al azar contra un backend simulado, con un reloj simulado de un segundo por paso:
+    el reconciliador debe levantar cada unidad sin pasar de BURST reinicios en STABLE_SECONDS, y las
+    unidades en bucle de caídas, una vez abandonadas, no deben volver a reiniciarse"""
+    panel = load_panel()
+    logging.disable(logging.WARNING)
+    loops = [f"bucle{i}" for i in range(args.loops)]  # Caen en cuanto arrancan
+    units = [f"unidad{i}" for i in range(args.units)] + loops
+    state = {name: "inactive" for name in units}
+    lock = threading.Lock()
+
+    def run_batch(names, action):
+        results = {}
+        with lock:
+            for name in names:
+                if random.random() < args.fail:
+                    results[name] = (False, "Fallo simulado")
+                else:
+                    state[name] = action == "start" and "active" or "inactive"
+                    results[name] = (True, None)
+        return results
+
+    restarts = {name: [] for name in units}
+    gave_up = {}  # unidad -> instante en que se abandonó
+    clock = [0.0]
+
+    def on_drift(name, desired, actual, what):
+        if what == "restart":
+            restarts[name].append(clock[0])
+        elif what == "gave-up":
+            gave_up.setdefault(name, clock[0])
+
+    with tempfile.TemporaryDirectory() as tmp:
+        panel.TRACER.path = os.path.join(tmp, "operation-latency.json")
+        operations = panel.OperationQueue(run_batch, lambda name, action, cancel: (True, 0.0), lambda name: "simulado")
+        reconciler = panel.Reconciler(operations, on_drift, path=os.path.join(tmp, "desired-state.json")).attach()
+        operations.run(units, "start")
+
+        def settle():
+            while any(operations.is_busy(name) for name in units):
+                time.sleep(0.0005)
+
+        crashes = observed = down = 0
+        previous = {}  # El primer paso revisa todo, como el primer sondeo de la ventana
+        start = time.perf_counter()
+        for tick in range(args.seconds):
+            clock[0] = float(tick)
+            with lock:
+                for name in units:
+                    if state[name] == "active" and (name in loops or random.random() < args.crash):
+                        state[name] = "failed"
+                        crashes += 1
+                current = dict(state)
+            # Como en la ventana: solo los cambios y los reintentos vencidos, no un sondeo de todo
+            changes = {name: status for name, status in current.items() if previous.get(name) != status}
+            changes.update({name: current[name] for name in reconciler.due(clock[0])})
+            if changes:
+                observed += len(changes)
+                reconciler.observe(changes, clock[0])
+                settle()
+            previous = dict(state)
+            down += sum(status != "active" for status in previous.values())
+        elapsed = time.perf_counter() - start
+
+    window = reconciler.STABLE_SECONDS
+    worst = max(
+        (sum(1 for other in times if t <= other < t + window) for times in restarts.values() for t in times),
+        default=0
+    )
+    # Nadie más las inicia en la simulación: tras abandonarlas no debe haber ningún reinicio
+    after = sum(1 for name, at in gave_up.items() for t in restarts[name] if t > at)
+    print(f"Unidades: {len(units)}  Segundos simulados: {args.seconds}  ({elapsed:.1f} s reales)")
+    print(f"{'Caídas inyectadas':<32}{crashes:>8}")
+    print(f"{'Reinicios':<32}{sum(map(len, restarts.values())):>8}")
+    print(f"{'Unidades abandonadas':<32}{len(gave_up):>8}  ({len(set(loops) & set(gave_up))} de {len(loops)} en bucle)")
+    print(f"{'Estados revisados':<32}{observed:>8}")
+    print(f"{'Disponibilidad':<32}{100 - down * 100 / (args.seconds * len(units)):>7.2f}%")
+    print(f"{f'Máx. reinicios en {window} s':<32}{worst:>8}  (límite {reconciler.BURST})")
+    print(f"{'Reinicios tras abandonar':<32}{after:>8}  (debe ser 0)")
+    return (worst > reconciler.BURST or after or set(loops) - set(gave_up)) and 1 or 0
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmarks del Dragwaysk Control Center")
+    sub = parser.add_subparsers(dest="bench")
+    sub.required = True
+
+    status = sub.add_parser("status", help="Forks y tiempo por ciclo de refresco")
+    status.add_argument("--cycles", type=int, default=20)
+    status.add_argument("--units", type=int, default=0,
+                        help="Usar N servicios del sistema en lugar de SERVICES_CONFIG")
+    status.set_defaults(func=bench_status)
+
+    helper = sub.add_parser("helper", help="Latencia de toggle a confirmación: pkexec por acción vs ayudante")
+    helper.add_argument("--ops", type=int, default=50)
+    helper.add_argument("--pkexec", action="store_true",
+                        help="Incluir pkexec real en ambos caminos (pide contraseña)")
+    helper.set_defaults(func=bench_helper)
+
+    pm2 = sub.add_parser("pm2", help="CPU por refresco: 'pm2 jlist' vs socket RPC del demonio")
+    pm2.add_argument("--cycles", type=int, default=20)
+    pm2.add_argument("--name", default="shinobi")
+    pm2.set_defaults(func=bench_pm2)
+
+    cli = sub.add_parser("cli", help="Arranque en frío: CLI sin GTK vs importar la ventana")
+    cli.add_argument("--runs", type=int, default=10)
+    cli.set_defaults(func=bench_cli)
+
+    startup = sub.add_parser("startup", help="Hitos de arranque de la ventana: import de GTK, show_all, primer frame")
+    startup.add_argument("--runs", type=int, default=5)
+    startup.set_defaults(func=bench_startup)
+
+    stress = sub.add_parser("queue", help="Toggles al azar contra la cola de operaciones con un backend simulado")
+    stress.add_argument("--toggles", type=int, default=5000)
+    stress.add_argument("--units", type=int, default=8)
+    stress.add_argument("--threads", type=int, default=4)
+    stress.add_argument("--delay", type=float, default=0.005, help="Segundos máximos por comando y confirmación")
+    stress.add_argument("--fail", type=float, default=0.0, help="Probabilidad de que falle un comando")
+    stress.set_defaults(func=bench_queue)
+
+    reconcile = sub.add_parser("reconcile", help="Caídas simuladas contra el reconciliador de estado deseado")
+    reconcile.add_argument("--seconds", type=int, default=3600, help="Segundos simulados")
+    reconcile.add_argument("--units", type=int, default=8)
+    reconcile.add_argument("--crash", type=float, default=0.002, help="Probabilidad de caída por unidad y segundo")
+    reconcile.add_argument("--fail", type=float, default=0.2, help="Probabilidad de que falle un reinicio")
+    reconcile.add_argument("--loops", type=int, default=2, help="Unidades que caen en cuanto arrancan")
+    reconcile.set_defaults(func=bench_reconcile)
+
+    args = parser.parse_args()
+    return args.func(args)
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,105 @@
+#!/usr/bin/env python3
+"""Ayudante privilegiado del Dragwaysk Control Center
+
+Se lanza una sola vez por sesión con pkexec y recibe por stdin peticiones en
+JSON (una por línea) para iniciar, detener o reiniciar unidades de systemd.
+Cada petición se ejecuta en su propio hilo con una sola llamada a systemctl
+para todas sus unidades; la respuesta sale por stdout con el mismo "id".
+
+    {"id": 1, "action": "start", "units": ["postgresql", "docker"]}
+    {"id": 1, "ok": true, "error": null, "units": {"postgresql": true, "docker": true}}
+
+Termina cuando el panel cierra stdin (o muere).
+"""
+import argparse
+import json
+import os
+import re
+import subprocess
+import sys
+import threading
+
+ALLOWED_ACTIONS = ("start", "stop", "restart")
+UNIT_NAME = re.compile(r"^[A-Za-z0-9][A-Za-z0-9@._:-]*$")
+
+_write_lock = threading.Lock()
+
+
+def reply(message):
+    """Escribe una respuesta completa en stdout sin mezclarla con otros hilos"""
+    with _write_lock:
+        sys.stdout.write(json.dumps(message) + "\n")
+        sys.stdout.flush()
+
+
+def run_systemctl(systemctl, action, units, timeout):
+    """Ejecuta systemctl y devuelve (éxito, stderr)"""
+    try:
+        result = subprocess.run(
+            [systemctl, action, "--"] + units,
+            capture_output=True,
+            text=True,
+            timeout=timeout
+        )
+        return result.returncode == 0, result.stderr.strip() or None
+    except subprocess.TimeoutExpired:
+        return False, "La operación tardó demasiado tiempo"
+
+
+def handle(request, systemctl):
+    """Valida y ejecuta una petición; responde siempre aunque falle"""
+    request_id = request.get("id")
+    action = request.get("action")
+    units = request.get("units") or []
+    timeout = min(float(request.get("timeout", 30)), 300)
+
+    if action not in ALLOWED_ACTIONS:
+        return reply({"id": request_id, "ok": False, "error": f"Acción no permitida: {action}", "units": {}})
+    invalid = [u for u in units if not isinstance(u, str) or not UNIT_NAME.match(u)]
+    if invalid or not units:
+        return reply({"id": request_id, "ok": False, "error": f"Unidades no válidas: {invalid}", "units": {}})
+
+    # Un solo systemctl para todo el lote; si falla se repite unidad por unidad para saber cuál
+    ok, error = run_systemctl(systemctl, action, units, timeout)
+    if ok or len(units) == 1:
+        per_unit = {unit: ok for unit in units}
+    else:
+        per_unit = {unit: run_systemctl(systemctl, action, [unit], timeout)[0] for unit in units}
+    reply({"id": request_id, "ok": ok, "error": error, "units": per_unit})
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Ayudante privilegiado del Dragwaysk Control Center")
+    parser.add_argument("--systemctl", default="systemctl",
+                        help="Ruta de systemctl (solo sin privilegios, para pruebas)")
+    args = parser.parse_args()
+
+    # Nunca ejecutar un binario elegido por el usuario con privilegios de root
+    systemctl = args.systemctl
+    if os.geteuid() == 0 and systemctl != "systemctl":
+        print("--systemctl no se permite como root", file=sys.stderr)
+        return 2
+
+    reply({"ready": True, "pid": os.getpid()})
+    threads = []
+    for line in sys.stdin:
+        line = line.strip()
+        if not line:
+            continue
+        try:
+            request = json.loads(line)
+        except ValueError:
+            continue
+        thread = threading.Thread(target=handle, args=(request, systemctl))
+        thread.daemon = True
+        thread.start()
+        threads = [t for t in threads if t.is_alive()] + [thread]
+
+    # stdin cerrado: terminar las operaciones en curso antes de salir
+    for thread in threads:
+        thread.join()
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,402 @@
+#!/usr/bin/env python3
+"""Broker de estados del Dragwaysk Control Center
+
+Un solo proceso por usuario sondea systemd, PM2, etc. y guarda los estados en caché;
+las ventanas y la CLI se conectan por un socket Unix y reciben solo los cambios, así
+que N clientes cuestan lo mismo que uno. Lo lanza el primer cliente que no lo encuentra
+y termina solo cuando lleva IDLE_SECONDS sin clientes.
+
+Protocolo (un JSON por línea):
+
+    cliente -> {"op": "subscribe", "services": ["mariadb", "shinobi"]}
+    cliente -> {"op": "refresh", "services": ["mariadb"], "max_age": 0}
+    broker  -> {"event": "statuses", "statuses": {"mariadb": "active"}, "full": false}
+
+"subscribe" reemplaza los servicios vigilados por el cliente; "refresh" responde con
+el estado de todos los pedidos ("full": true), consultando solo los que tengan más de
+"max_age" segundos en caché.
+"""
+import fcntl
+import json
+import os
+import socket
+import stat
+import subprocess
+import sys
+import threading
+import time
+import logging
+
+from dragwaysk_core import COUNTERS, ConfigWatcher, EventLog, ServiceConfig, ServiceValidator, log_transitions
+
+IDLE_SECONDS = 30       # Sin clientes durante este tiempo, el broker termina
+FRESH_SECONDS = 1.0     # "refresh" sin max_age reutiliza estados más recientes que esto
+FAST_INTERVAL = 1       # Segundos entre sondeos tras un "refresh"
+DEFAULT_INTERVAL = 5
+MAX_INTERVAL = 120
+
+
+def private_dir(path):
+    """Crea el directorio si falta; True solo si es un directorio real del usuario sin permisos para otros"""
+    try:
+        os.mkdir(path, 0o700)
+    except FileExistsError:
+        pass
+    except OSError:
+        return False
+    try:
+        info = os.lstat(path)
+    except OSError:
+        return False
+    return stat.S_ISDIR(info.st_mode) and info.st_uid == os.getuid() and not info.st_mode & 0o077
+
+
+def runtime_dir():
+    """Directorio privado del usuario para el socket y el candado del broker, o None si no es seguro
+
+    Sin XDG_RUNTIME_DIR se usa /tmp, donde otro usuario podría crear antes el directorio (o un enlace)
+    para interceptar o suplantar el socket: entonces el broker queda desactivado.
+    """
+    runtime = os.environ.get("XDG_RUNTIME_DIR")
+    base = runtime or f"/tmp/dragwaysk-panel-{os.getuid()}"
+    path = os.path.join(base, "dragwaysk-panel")
+    for directory in (not runtime and [base] or []) + [path]:
+        if not private_dir(directory):
+            logging.error(f"{directory} no es un directorio privado de este usuario: broker de estados desactivado")
+            return None
+    return path
+
+
+def socket_path():
+    """Ruta del socket del broker, o None si no hay un directorio seguro para él"""
+    directory = runtime_dir()
+    return directory and os.path.join(directory, "broker.sock")
+
+
+def collect_statuses(service_names):
+    """{servicio: estado}, con "not-found" para los que no están instalados"""
+    existing = ServiceValidator.services_exist(service_names)
+    installed = [name for name in service_names if existing[name]]
+    statuses = ServiceValidator.get_services_status(installed) if installed else {}
+    return {
+        name: existing[name] and statuses.get(name, "error") or "not-found"
+        for name in service_names
+    }
+
+
+class StatusBroker:
+    """Dueño del sondeo: una consulta por servicio sin importar cuántos clientes la pidan"""
+
+    def __init__(self, path=None, idle_seconds=IDLE_SECONDS):
+        self.path = path or socket_path()
+        self.idle_seconds = idle_seconds
+        self.clients = {}     # socket -> servicios suscritos
+        self.cache = {}       # servicio -> estado
+        self.checked = {}     # servicio -> momento de la última consulta
+        self.intervals = {}   # servicio -> segundos hasta el próximo sondeo (con backoff)
+        self.next_due = {}    # servicio -> momento del próximo sondeo
+        self.last_client = time.monotonic()
+        self._lock = threading.Lock()
+        self._poll_lock = threading.Lock()  # Una consulta a la vez: las peticiones simultáneas usan la caché
+        self._send_lock = threading.Lock()
+        self._wake = threading.Event()
+        self._stopped = threading.Event()
+        self._server = None  # Socket de escucha mientras corre serve()
+
+    def serve(self):
+        """Atiende clientes hasta quedar inactivo; devuelve 0 también si ya hay otro broker"""
+        if self.path is None:
+            return 1  # runtime_dir() ya explicó por qué
+        lock_file = open(self.path + ".lock", "w")
+        try:
+            fcntl.flock(lock_file, fcntl.LOCK_EX | fcntl.LOCK_NB)
+        except OSError:
+            logging.info("Broker de estados: ya hay otro en ejecución")
+            return 0
+
+        if os.path.exists(self.path):
+            os.unlink(self.path)  # Socket de un broker anterior que no terminó limpio
+        server = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        server.bind(self.path)
+        os.chmod(self.path, 0o600)
+        server.listen(16)
+        self._server = server
+        logging.info(f"Broker de estados escuchando en {self.path} (pid {os.getpid()})")
+
+        poller = threading.Thread(target=self._poll_loop, name="broker-poll")
+        poller.daemon = True
+        poller.start()
+
+        try:
+            while not self._stopped.is_set():
+                try:
+                    conn, _ = server.accept()
+                except OSError:
+                    if self._stopped.is_set():
+                        break  # stop() cerró el socket para terminar accept()
+                    raise
+                with self._lock:
+                    self.clients[conn] = set()
+                thread = threading.Thread(target=self._serve_client, args=(conn,), name="broker-client")
+                thread.daemon = True
+                thread.start()
+        finally:
+            self._stopped.set()
+            self._wake.set()
+            os.unlink(self.path)
+            server.close()
+            lock_file.close()
+            logging.info(f"Broker de estados terminado: {COUNTERS.summary()}")
+        return 0
+
+    def stop(self):
+        """Termina serve(): el socket se cierra en lugar de despertar accept() para comprobarlo"""
+        self._stopped.set()
+        self._wake.set()
+        if self._server is not None:
+            try:
+                self._server.shutdown(socket.SHUT_RDWR)
+            except OSError:
+                pass
+
+    def _serve_client(self, conn):
+        """Lee las peticiones de un cliente hasta que se desconecta"""
+        try:
+            for line in conn.makefile("r", encoding="utf-8"):
+                try:
+                    request = json.loads(line)
+                except ValueError:
+                    continue
+                names = [name for name in request.get("services") or [] if isinstance(name, str)]
+                if request.get("op") == "subscribe":
+                    self._subscribe(conn, names)
+                elif request.get("op") == "refresh":
+                    max_age = request.get("max_age")
+                    self._refresh(conn, names, FRESH_SECONDS if max_age is None else float(max_age))
+        except OSError:
+            pass
+        finally:
+            with self._lock:
+                self.clients.pop(conn, None)
+                self.last_client = time.monotonic()
+            self._wake.set()  # El sondeo recalcula cuándo quedará inactivo
+            conn.close()
+
+    def _subscribe(self, conn, names):
+        """Reemplaza los servicios vigilados por el cliente y le envía lo que ya hay en caché"""
+        now = time.monotonic()
+        with self._lock:
+            self.clients[conn] = set(names)
+            for name in names:
+                if name not in self.intervals:
+                    self.intervals[name] = self._base_interval(name)
+                    self.next_due[name] = now
+            cached = {name: self.cache[name] for name in names if name in self.cache}
+        if cached:
+            self._send(conn, {"event": "statuses", "statuses": cached, "full": True})
+        self._wake.set()
+
+    def _refresh(self, conn, names, max_age):
+        """Responde con el estado actual y acelera el sondeo de esos servicios (p. ej. tras una operación)"""
+        self._poll(names, max_age, requester=conn)
+        now = time.monotonic()
+        with self._lock:
+            for name in names:
+                if name in self.intervals:
+                    self.intervals[name] = FAST_INTERVAL
+                    self.next_due[name] = now + FAST_INTERVAL
+        self._wake.set()
+
+    def _poll(self, names, max_age, requester=None):
+        """Consulta los servicios con caché vieja, reparte los cambios y devuelve los que cambiaron"""
+        with self._poll_lock:
+            now = time.monotonic()
+            with self._lock:
+                stale = [name for name in names if now - self.checked.get(name, float("-inf")) > max_age]
+            fresh = {}
+            if stale:
+                try:
+                    fresh = collect_statuses(stale)
+                except Exception as e:
+                    logging.error(f"Broker: error consultando {', '.join(stale)}: {e}")
+                    fresh = {name: "error" for name in stale}
+            with self._lock:
+                changes = {name: status for name, status in fresh.items() if self.cache.get(name) != status}
+                log_transitions(self.cache, fresh)
+                self.cache.update(fresh)
+                checked_at = time.monotonic()
+                for name in stale:
+                    self.checked[name] = checked_at
+                pushes = [
+                    (conn, {name: status for name, status in changes.items() if name in services})
+                    for conn, services in self.clients.items() if conn is not requester
+                ]
+                reply = {name: self.cache[name] for name in names if name in self.cache}
+
+        for conn, diff in pushes:
+            if diff:
+                self._send(conn, {"event": "statuses", "statuses": diff, "full": False})
+        if requester is not None:
+            self._send(requester, {"event": "statuses", "statuses": reply, "full": True})
+        return changes
+
+    def _poll_loop(self):
+        """Sondea los servicios suscritos cuando vencen; sin cambios, el intervalo se duplica"""
+        while not self._stopped.is_set():
+            now = time.monotonic()
+            with self._lock:
+                subscribed = set().union(*self.clients.values()) if self.clients else set()
+                due = [name for name in subscribed if self.next_due.get(name, now) <= now + 0.5]
+
+            if due:
+                changes = self._poll(due, max_age=0.5)
+                now = time.monotonic()
+                with self._lock:
+                    for name in due:
+                        base = self._base_interval(name)
+                        if name in changes:
+                            self.intervals[name] = base
+                        else:
+                            maximum = max(ServiceValidator.get_config(name).get("max_poll_interval", MAX_INTERVAL), base)
+                            self.intervals[name] = min(max(self.intervals.get(name, base), FAST_INTERVAL) * 2, maximum)
+                        self.next_due[name] = now + self.intervals[name]
+
+            with self._lock:
+                pending = [self.next_due[name] for name in subscribed if name in self.next_due]
+                if not self.clients:
+                    pending.append(self.last_client + self.idle_seconds)  # Cuándo termina si nadie se conecta
+            if not self.clients and time.monotonic() >= self.last_client + self.idle_seconds:
+                self.stop()
+                break
+            wait = min(pending) - time.monotonic() if pending else self.idle_seconds
+            self._wake.wait(max(wait, 0.05))
+            self._wake.clear()
+            COUNTERS.add_wakeup()
+
+    @staticmethod
+    def _base_interval(name):
+        return ServiceValidator.get_config(name).get("poll_interval", DEFAULT_INTERVAL)
+
+    def _send(self, conn, message):
+        try:
+            with self._send_lock:
+                conn.sendall((json.dumps(message) + "\n").encode("utf-8"))
+        except OSError:
+            pass  # El hilo del cliente detecta la desconexión
+
+
+class BrokerClient:
+    """Conexión de una ventana o de la CLI al broker; los estados llegan por on_statuses desde otro hilo"""
+
+    def __init__(self, on_statuses=None, on_closed=None, path=None):
+        self.on_statuses = on_statuses  # (estados, full)
+        self.on_closed = on_closed
+        self.path = path or socket_path()
+        self.sock = None
+        self._lock = threading.Lock()
+
+    @property
+    def connected(self):
+        return self.sock is not None
+
+    @staticmethod
+    def spawn():
+        """Lanza el broker desacoplado de esta sesión"""
+        COUNTERS.add_fork()
+        subprocess.Popen(
+            [sys.executable, os.path.abspath(__file__)],
+            stdin=subprocess.DEVNULL,
+            stdout=subprocess.DEVNULL,
+            stderr=subprocess.DEVNULL,
+            start_new_session=True,
+            close_fds=True
+        )
+
+    def connect(self, spawn=True, timeout=3.0):
+        """Se conecta (lanzando el broker si hace falta); devuelve False si no fue posible"""
+        if os.environ.get("DRAGWAYSK_NO_BROKER") or self.path is None:
+            return False
+        deadline = time.monotonic() + timeout
+        spawned = False
+        while True:
+            sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+            try:
+                sock.connect(self.path)
+                break
+            except OSError:
+                sock.close()
+                if not spawn or time.monotonic() > deadline:
+                    return False
+                if not spawned:
+                    self.spawn()
+                    spawned = True
+                time.sleep(0.05)
+
+        self.sock = sock
+        if self.on_statuses is not None:
+            reader = threading.Thread(target=self._read_loop, args=(sock,), name="broker-reader")
+            reader.daemon = True
+            reader.start()
+        return True
+
+    def subscribe(self, service_names):
+        return self._send({"op": "subscribe", "services": list(service_names)})
+
+    def refresh(self, service_names, max_age=None):
+        return self._send({"op": "refresh", "services": list(service_names), "max_age": max_age})
+
+    def query(self, service_names, max_age=None, timeout=10):
+        """Petición única sin hilo lector (CLI): devuelve {servicio: estado} o None"""
+        if not self.refresh(service_names, max_age):
+            return None
+        self.sock.settimeout(timeout)
+        try:
+            line = self.sock.makefile("r", encoding="utf-8").readline()
+            return json.loads(line)["statuses"]
+        except (OSError, ValueError, KeyError):
+            return None
+
+    def close(self):
+        with self._lock:
+            if self.sock is not None:
+                try:
+                    self.sock.shutdown(socket.SHUT_RDWR)
+                except OSError:
+                    pass
+                self.sock.close()
+                self.sock = None
+
+    def _send(self, message):
+        with self._lock:
+            if self.sock is None:
+                return False
+            try:
+                self.sock.sendall((json.dumps(message) + "\n").encode("utf-8"))
+                return True
+            except OSError:
+                return False
+
+    def _read_loop(self, sock):
+        try:
+            for line in sock.makefile("r", encoding="utf-8"):
+                try:
+                    message = json.loads(line)
+                except ValueError:
+                    continue
+                if message.get("event") == "statuses":
+                    self.on_statuses(message["statuses"], message.get("full", False))
+        except (OSError, ValueError):
+            pass
+        with self._lock:
+            closed = self.sock is sock
+            if closed:
+                self.sock = None
+        if closed and self.on_closed:
+            self.on_closed()
+
+
+if __name__ == "__main__":
+    EventLog.setup("broker")
+    ServiceConfig.load_user()
+    ConfigWatcher(ServiceConfig.apply).start()  # Los intervalos de sondeo siguen al archivo editado
+    sys.exit(StatusBroker().serve())
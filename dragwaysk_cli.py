@@ -0,0 +1,467 @@
+#!/usr/bin/env python3
+"""Línea de comandos del Dragwaysk Control Center (sin GTK)
+
+    dragwaysk-panel status [--json] [servicio ...]
+    dragwaysk-panel up [--json] [servicio ...]
+    dragwaysk-panel down [--json] [servicio ...]
+    dragwaysk-panel watch [--json] [--interval S] [servicio ...]
+    dragwaysk-panel stats [--json | --prometheus]
+    dragwaysk-panel boot [--json] [servicio ...]
+    dragwaysk-panel proxy [servicio ...]
+    dragwaysk-panel profile [--json] [perfil]
+    dragwaysk-panel history [--json] [--limit N] [servicio ...]
+    dragwaysk-panel reconcile [--json] [--interval S] [servicio ...]
+    dragwaysk-panel config [--init]
+
+Sin servicios se usan todos los de SERVICES_CONFIG. "up" y "down" usan el mismo
+orquestador que "Activar Todo" y "Detener Todo": en paralelo y respetando "requires".
+"status" usa la caché del broker de estados si está corriendo y "watch" se suscribe a él.
+"boot" estima con systemd-analyze cuánto añade cada servicio al arranque del sistema.
+"proxy" escucha en los puertos "on_demand" e inicia cada servicio con su primera conexión.
+"profile" sin nombre lista los perfiles; con nombre detiene e inicia lo justo para pasar a él.
+"history" lee del registro de eventos las operaciones y cambios de estado de cada servicio.
+"reconcile" reinicia lo que debía estar activo y cayó, como la ventana con "Mantener".
+"config" valida ~/.config/dragwaysk-panel/services.toml (o .json); --init lo crea con los valores actuales.
+"""
+import json
+import os
+import sys
+import threading
+import time
+
+from dragwaysk_broker import BrokerClient, collect_statuses
+from dragwaysk_core import (
+    OPERATIONS,
+    PROFILES,
+    SERVICES_CONFIG,
+    TRACER,
+    BootAnalyzer,
+    ConfigError,
+    EventLog,
+    PrivilegedHelper,
+    Reconciler,
+    ServiceConfig,
+    ServiceOrchestrator,
+    ServiceValidator,
+)
+
+STATUS_LABELS = {
+    "active": "● activo",
+    "inactive": "○ inactivo",
+    "failed": "✗ fallido",
+    "not-found": "- no instalado",
+}
+
+_print_lock = threading.Lock()
+
+
+def emit(line, stream=None):
+    """Imprime una línea completa aunque la escriban varios hilos a la vez"""
+    with _print_lock:
+        print(line, file=stream or sys.stdout, flush=True)
+
+
+def select_services(names):
+    """Servicios pedidos, o todos los configurados si no se indica ninguno"""
+    configured = [s["service"] for s in SERVICES_CONFIG]
+    unknown = [name for name in names if name not in configured]
+    if unknown:
+        raise SystemExit(f"Servicios no configurados: {', '.join(unknown)}")
+    return list(names) or configured
+
+
+def snapshot(service_names):
+    """{servicio: estado} desde la caché del broker si está corriendo; si no, consultando aquí"""
+    client = BrokerClient()
+    if client.connect(spawn=False):
+        statuses = client.query(service_names)
+        client.close()
+        if statuses is not None and set(statuses) == set(service_names):
+            return {name: statuses[name] for name in service_names}
+    return collect_statuses(service_names)
+
+
+def describe(service_name, status):
+    """Entrada de salida JSON para un servicio"""
+    return {
+        "service": service_name,
+        "label": ServiceValidator.get_config(service_name).get("label", service_name),
+        "backend": ServiceValidator.backend_name(service_name),
+        "status": status,
+    }
+
+
+def format_row(service_name, status):
+    info = describe(service_name, status)
+    return f"{info['label']:<20}{service_name:<20}{info['backend']:<16}{STATUS_LABELS.get(status, status)}"
+
+
+def cmd_status(args):
+    statuses = snapshot(select_services(args.services))
+    if args.json:
+        emit(json.dumps([describe(name, status) for name, status in statuses.items()]))
+    else:
+        for name, status in statuses.items():
+            emit(format_row(name, status))
+    return 0
+
+
+def on_progress(args):
+    """Avance de las operaciones por stderr (nada con --json)"""
+    def show(service_name, action, phase, elapsed):
+        if args.json or phase not in ("waiting", "done", "failed", "skipped", "cancelled"):
+            return
+        if phase == "waiting":
+            emit(f"… {action} {service_name}: esperando a que responda", sys.stderr)
+            return
+        mark = phase == "done" and "✓" or "✗"
+        emit(f"{mark} {action} {service_name} ({elapsed:.1f} s)", sys.stderr)
+    return show
+
+
+def run_action(args, action):
+    """Inicia o detiene los servicios con el orquestador; código 1 si alguno falla"""
+    requested = select_services(args.services)
+    existing = ServiceValidator.services_exist(requested)
+    available = [name for name in requested if existing[name]]
+    # Si se nombraron explícitamente, los no instalados cuentan como fallo
+    missing = [name for name in requested if not existing[name]] if args.services else []
+
+    results = {}
+    if available:
+        Reconciler().attach()  # Lo pedido aquí pasa a ser el estado deseado de la ventana y de 'reconcile'
+        orchestrator = ServiceOrchestrator(SERVICES_CONFIG, on_progress=on_progress(args))
+        try:
+            results = orchestrator.run(available, action)
+        except ValueError as e:
+            emit(str(e), sys.stderr)
+            return 2
+        finally:
+            OPERATIONS.cancel()  # Con Ctrl+C no se sigue esperando a los servicios
+            PrivilegedHelper.shared().close()
+    for name in missing:
+        results[name] = (False, "Servicio no instalado", 0.0)
+    return report_results(args, results)
+
+
+def report_results(args, results):
+    """Resultados del orquestador en JSON o los fallos por stderr; código 1 si alguno falla"""
+    failed = [name for name, (success, error_msg, seconds) in results.items() if not success]
+    if args.json:
+        emit(json.dumps({
+            name: {"ok": success, "error": error_msg, "seconds": round(seconds, 3)}
+            for name, (success, error_msg, seconds) in results.items()
+        }))
+    elif not results:
+        emit("No hay servicios disponibles", sys.stderr)
+    else:
+        for name in failed:
+            emit(f"✗ {name}: {results[name][1]}", sys.stderr)
+    return failed and 1 or 0
+
+
+def cmd_up(args):
+    return run_action(args, "start")
+
+
+def cmd_down(args):
+    return run_action(args, "stop")
+
+
+def cmd_profile(args):
+    """Lista los perfiles o pasa al indicado deteniendo e iniciando solo lo necesario"""
+    if not args.profile:
+        statuses = snapshot(select_services([]))
+        for name, services in PROFILES.items():
+            current = all(statuses.get(service) == "active" for service in services)
+            line = f"{'*' if current else ' '} {name:<16}{', '.join(services)}"
+            emit(json.dumps({"profile": name, "services": services, "current": current}) if args.json else line)
+        return 0
+    if args.profile not in PROFILES:
+        raise SystemExit(f"Perfil no configurado: {args.profile} (disponibles: {', '.join(PROFILES)})")
+
+    Reconciler().attach()
+    orchestrator = ServiceOrchestrator(SERVICES_CONFIG, on_progress=on_progress(args))
+    to_stop, to_start = orchestrator.profile_diff(PROFILES[args.profile], collect_statuses(select_services([])))
+    if not to_stop and not to_start:
+        emit(args.json and "{}" or f"Perfil {args.profile}: nada que cambiar")
+        return 0
+    if not args.json:
+        emit(f"Perfil {args.profile}: detener {', '.join(to_stop) or '-'}; iniciar {', '.join(to_start) or '-'}", sys.stderr)
+    try:
+        results = orchestrator.run_many({"stop": to_stop, "start": to_start})
+    except ValueError as e:
+        emit(str(e), sys.stderr)
+        return 2
+    finally:
+        OPERATIONS.cancel()
+        PrivilegedHelper.shared().close()
+    return report_results(args, results)
+
+
+def cmd_watch(args):
+    """Imprime cada cambio de estado (JSON por línea con --json) hasta Ctrl+C"""
+    service_names = select_services(args.services)
+    previous = {}
+
+    def show(statuses, full=False):
+        for name, status in statuses.items():
+            if previous.get(name) == status:
+                continue
+            previous[name] = status
+            if args.json:
+                emit(json.dumps(dict(describe(name, status), time=time.time())))
+            else:
+                emit(f"{time.strftime('%H:%M:%S')}  {format_row(name, status)}")
+
+    # Suscrito al broker (compartido con las ventanas abiertas); si no hay broker, sondeo propio
+    closed = threading.Event()
+    client = BrokerClient(show, closed.set)
+    try:
+        if client.connect():
+            client.subscribe(service_names)
+            closed.wait()
+        while True:
+            show(collect_statuses(service_names))
+            time.sleep(args.interval)
+    except KeyboardInterrupt:
+        client.close()
+        return 0
+
+
+DRIFT_LABELS = {
+    "restart": "caído, reiniciando",
+    "backoff": "sigue caído, esperando para reintentar",
+    "gave-up": "cae una y otra vez, no se reintenta más",
+    "drift": "activo sin haberlo pedido",
+}
+
+
+def cmd_reconcile(args):
+    """Mantiene los servicios en su último estado pedido hasta Ctrl+C"""
+    service_names = select_services(args.services)
+
+    def on_drift(name, desired, actual, what):
+        if args.json:
+            emit(json.dumps({"service": name, "desired": desired, "actual": actual, "action": what, "time": time.time()}))
+        else:
+            emit(f"{time.strftime('%H:%M:%S')}  {name}: {DRIFT_LABELS[what]} (pedido {desired}, está {actual})")
+
+    reconciler = Reconciler(on_drift=on_drift, on_progress=on_progress(args)).attach()
+
+    def observe(changes, full=False):
+        reconciler.observe(changes)
+
+    # Los cambios llegan del broker; sin broker, sondeo propio cada --interval
+    closed = threading.Event()
+    client = BrokerClient(observe, closed.set)
+    try:
+        if client.connect():
+            client.subscribe(service_names)
+        else:
+            closed.set()  # Sin broker (desactivado o no arrancó): sondeo propio desde el principio
+        observe(collect_statuses(service_names))
+        while True:
+            wait = reconciler.next_retry()
+            if closed.is_set():
+                time.sleep(wait is None and args.interval or min(max(wait, 1), args.interval))
+                observe(collect_statuses(service_names))
+            else:
+                closed.wait(wait is not None and max(wait, 1) or None)
+                due = reconciler.due()
+                if due:
+                    # Un backoff venció: se consulta el estado actual, no el último que llegó
+                    observe(collect_statuses(due))
+    except KeyboardInterrupt:
+        client.close()
+        OPERATIONS.cancel()
+        PrivilegedHelper.shared().close()
+        return 0
+
+
+def cmd_stats(args):
+    """Latencias acumuladas por servicio y fase (de la ventana y de la CLI)"""
+    data = TRACER.load()
+    if args.prometheus:
+        sys.stdout.write(TRACER.to_prometheus(data))
+        return 0
+    if args.json:
+        emit(json.dumps(data, indent=1))
+        return 0
+    if not data:
+        emit(f"Sin operaciones registradas en {TRACER.get_path()}")
+        return 0
+
+    def bound(value):
+        return value is None and "> 60" or f"≤ {value}"
+
+    emit(f"{'Servicio':<20}{'Acción':<10}{'Fase':<15}{'n':>5}{'media s':>10}{'p50 s':>10}{'p90 s':>10}")
+    for entry in sorted(data.values(), key=lambda e: (e["service"], e["action"])):
+        for phase in TRACER.PHASES:
+            histogram = entry["phases"].get(phase)
+            if not histogram or not histogram["count"]:
+                continue
+            mean = histogram["sum"] / histogram["count"]
+            emit(
+                f"{entry['service']:<20}{entry['action']:<10}{phase:<15}{histogram['count']:>5}{mean:>10.2f}"
+                f"{bound(TRACER.quantile(histogram, 0.5)):>10}{bound(TRACER.quantile(histogram, 0.9)):>10}"
+            )
+    return 0
+
+
+def cmd_boot(args):
+    """Segundos que añadiría cada servicio al arranque y si conviene dejarlo bajo demanda"""
+    report = BootAnalyzer().analyze(select_services(args.services))
+    if args.json:
+        emit(json.dumps(report))
+        return 0
+
+    emit(f"{'Servicio':<20}{'Arranque':>10}  {'Ruta crítica':<14}{'Habilitado':<12}Sugerencia")
+    for entry in sorted(report, key=lambda e: -(e["seconds"] or 0)):
+        seconds = entry["seconds"] is None and "?" or f"{entry['seconds']:.2f} s"
+        if entry["source"] == "panel":
+            seconds = "~" + seconds  # Estimado con las trazas del panel
+        emit(
+            f"{entry['service']:<20}{seconds:>10}  {entry['critical'] and 'sí' or 'no':<14}"
+            f"{entry['enabled'] or '-':<12}{entry['suggestion']}"
+        )
+    total = sum(e["seconds"] for e in report if e["seconds"] is not None and e["enabled"] == "enabled")
+    emit(f"\nHabilitados en el arranque: {total:.2f} s")
+    return 0
+
+
+def cmd_proxy(args):
+    """Proxies de arranque bajo demanda hasta Ctrl+C"""
+    import dragwaysk_proxy  # Solo este subcomando abre puertos
+
+    select_services(args.services)
+    proxies = dragwaysk_proxy.proxies_for(SERVICES_CONFIG, args.services)
+    if not proxies:
+        emit("Ningún servicio tiene \"on_demand\" en SERVICES_CONFIG", sys.stderr)
+        return 1
+    try:
+        for proxy in proxies:
+            proxy.bind()
+            emit(f"{proxy.service_name}: {proxy.listen[0]}:{proxy.listen[1]} -> {proxy.target[0]}:{proxy.target[1]}")
+        dragwaysk_proxy.serve_all(proxies)
+    except OSError as e:
+        emit(f"No se pudo abrir el puerto: {e}", sys.stderr)
+        return 1
+    except KeyboardInterrupt:
+        pass
+    return 0
+
+
+def cmd_history(args):
+    """Operaciones y cambios de estado registrados por la ventana, el broker y la CLI"""
+    service_names = select_services(args.services)
+    entries = EventLog.read(service_names, ("operation", "state", "idle-stop", "drift"))
+    # Ventana y broker pueden registrar el mismo cambio: se deja el primero
+    last_status, since, history = {}, {}, []
+    for entry in entries:
+        name = entry["service"]
+        if entry["event"] == "state":
+            if last_status.get(name) == entry["status"]:
+                continue
+            last_status[name] = entry["status"]
+            if name in since:
+                entry["previous_seconds"] = round(entry["time"] - since[name], 3)  # Tiempo en el estado anterior
+            since[name] = entry["time"]
+        history.append(entry)
+    history = history[-args.limit:] if args.limit else history
+
+    if args.json:
+        for entry in history:
+            emit(json.dumps(entry, ensure_ascii=False))
+        return 0
+    if not history:
+        emit("Sin eventos registrados")
+        return 0
+    for entry in history:
+        when = time.strftime("%Y-%m-%d %H:%M:%S", time.localtime(entry["time"]))
+        if entry["event"] == "operation":
+            phases = " ".join(f"{phase}={seconds:.2f}s" for phase, seconds in entry.get("phases", {}).items())
+            detail = f"{entry['action']:<8}{entry['outcome']:<13}{entry['total']:>7.2f} s  {phases}"
+        elif entry["event"] == "state":
+            held = "previous_seconds" in entry and f"  (tras {entry['previous_seconds']:.0f} s)" or ""
+            detail = f"{entry.get('previous', '?')} -> {entry['status']}{held}"
+        else:
+            detail = entry["message"]
+        emit(f"{when}  {entry['service']:<16}{entry['event']:<11}{detail}")
+    return 0
+
+
+def cmd_config(args):
+    """Valida el archivo de configuración; con --init lo crea a partir de la configuración actual"""
+    path = ServiceConfig.find()
+    if args.init:
+        if path:
+            raise SystemExit(f"Ya existe {path}")
+        path = os.path.join(ServiceConfig.config_dir(), "services.json")
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        with open(path, "w") as f:
+            json.dump({"services": SERVICES_CONFIG, "profiles": PROFILES}, f, indent=2, ensure_ascii=False)
+        emit(f"Creado {path}")
+        return 0
+    if path is None:
+        emit(f"Sin archivo en {ServiceConfig.config_dir()}: se usan los {len(SERVICES_CONFIG)} servicios por defecto")
+        return 0
+    try:
+        services, profiles = ServiceConfig.load(path)
+    except ConfigError as e:
+        emit(f"✗ {e}", sys.stderr)
+        return 1
+    emit(f"✓ {path}: {len(services)} servicios, {len(profiles)} perfiles")
+    return 0
+
+
+def add_subcommands(parser):
+    """Agrega los subcomandos de la CLI al parser del punto de entrada"""
+    sub = parser.add_subparsers(dest="command")
+    parser.set_defaults(func=None)  # Sin subcomando: ventana GTK
+
+    commands = (
+        ("status", cmd_status, "Estado de los servicios"),
+        ("up", cmd_up, "Inicia los servicios respetando sus dependencias"),
+        ("down", cmd_down, "Detiene los servicios respetando sus dependencias"),
+        ("watch", cmd_watch, "Muestra los cambios de estado hasta Ctrl+C"),
+        ("reconcile", cmd_reconcile, "Reinicia lo que cae y avisa de lo que se desvía del estado pedido"),
+    )
+    for name, func, help_text in commands:
+        command = sub.add_parser(name, help=help_text)
+        command.add_argument("services", nargs="*", metavar="servicio")
+        command.add_argument("--json", action="store_true", help="Salida en JSON")
+        if name in ("watch", "reconcile"):
+            default = name == "watch" and 2.0 or 10.0
+            command.add_argument("--interval", type=float, default=default,
+                                 help=f"Segundos entre consultas si no hay broker (por defecto {default:g})")
+        command.set_defaults(func=func)
+
+    stats = sub.add_parser("stats", help="Histogramas de latencia de las operaciones")
+    stats.add_argument("--json", action="store_true", help="Histogramas completos en JSON")
+    stats.add_argument("--prometheus", action="store_true", help="Formato de texto de Prometheus")
+    stats.set_defaults(func=cmd_stats)
+
+    boot = sub.add_parser("boot", help="Impacto de cada servicio en el arranque del sistema")
+    boot.add_argument("services", nargs="*", metavar="servicio")
+    boot.add_argument("--json", action="store_true", help="Salida en JSON")
+    boot.set_defaults(func=cmd_boot)
+
+    proxy = sub.add_parser("proxy", help="Inicia los servicios \"on_demand\" con su primera conexión")
+    proxy.add_argument("services", nargs="*", metavar="servicio")
+    proxy.set_defaults(func=cmd_proxy)
+
+    profile = sub.add_parser("profile", help="Lista los perfiles o cambia al indicado")
+    profile.add_argument("profile", nargs="?", metavar="perfil")
+    profile.add_argument("--json", action="store_true", help="Salida en JSON")
+    profile.set_defaults(func=cmd_profile)
+
+    history = sub.add_parser("history", help="Historial de operaciones y cambios de estado")
+    history.add_argument("services", nargs="*", metavar="servicio")
+    history.add_argument("--json", action="store_true", help="Un evento JSON por línea")
+    history.add_argument("--limit", type=int, default=50, help="Últimos N eventos (0: todos; por defecto 50)")
+    history.set_defaults(func=cmd_history)
+
+    config = sub.add_parser("config", help="Valida o crea el archivo de configuración de servicios")
+    config.add_argument("--init", action="store_true", help="Crea services.json con la configuración actual")
+    config.set_defaults(func=cmd_config)
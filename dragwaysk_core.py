@@ -0,0 +1,2749 @@
+#!/usr/bin/env python3
+"""Motor del Dragwaysk Control Center: configuración, backends y orquestación
+
+No importa GTK: lo comparten la ventana (dragwaysk_gui) y la línea de comandos (dragwaysk_cli).
+"""
+import atexit
+import collections
+import ctypes
+import fcntl
+import glob
+import json
+import os
+import queue
+import select
+import shutil
+import signal
+import socket
+import struct
+import subprocess
+import sys
+import threading
+import time
+import logging
+import logging.handlers
+from concurrent.futures import Future, ThreadPoolExecutor
+
+# --- CONFIGURACIÓN: AGREGA AQUÍ TUS SERVICIOS ---
+# (o en ~/.config/dragwaysk-panel/services.toml / services.json, que reemplaza estos valores: ver ServiceConfig)
+# "backend": systemd (por defecto), pm2 ("path", "scripts"), docker-compose ("compose_file",
+#            "compose_services") o process ("command", "match", "cwd")
+# "requires": servicios que deben estar activos antes (se detienen en orden inverso)
+# "poll_interval" / "max_poll_interval": segundos entre sondeos (5 / 120); si el estado no cambia
+#            el intervalo se duplica hasta el máximo (los avisados por D-Bus o PM2 no se sondean)
+# "ready": sondas que deben pasar para considerar el servicio listo tras iniciarlo:
+#            {"tcp": 5432}, {"unix": "/ruta.sock"}, {"http": "http://127.0.0.1:8080/", "status": 200},
+#            {"postgres": 5432}, {"mysql": 3306} o {"command": [...]}; "ready_timeout" (60 s por defecto)
+# "idle": detenerlo tras "minutes" sin actividad; "activity" dice qué cuenta como uso:
+#            {"connections": 5432} (clientes TCP), {"unix": "/ruta.sock"} (clientes del socket),
+#            {"containers": True} (contenedores de Docker corriendo) o {"cpu": 2.0} (% de CPU mínimo).
+#            Es opcional y ningún servicio lo trae activado: abajo quedan comentadas las políticas
+#            sugeridas para copiarlas a services.toml
+# "on_demand": {"listen": 6432, "target": 5432}: 'dragwaysk-panel proxy' escucha en "listen" e inicia
+#            el servicio con la primera conexión (ver dragwaysk_proxy); "idle_timeout" (segundos)
+#            cierra las conexiones sin tráfico
+SERVICES_CONFIG = [
+    {
+        "label": "PostgreSQL", "service": "postgresql", "icon": "server-database", "ready": {"postgres": 5432},
+        # "idle": {"minutes": 30, "activity": {"connections": 5432}},
+    },
+    {
+        "label": "MariaDB", "service": "mariadb", "icon": "drive-harddisk", "ready": {"unix": "/run/mysqld/mysqld.sock"},
+        # "idle": {"minutes": 30, "activity": {"connections": 3306, "unix": "/run/mysqld/mysqld.sock"}},
+    },
+    {
+        "label": "Docker Engine", "service": "docker", "icon": "system-run",
+        "ready": {"unix": "/var/run/docker.sock"}, "ready_timeout": 120,
+        # "idle": {"minutes": 30, "activity": {"containers": True}},
+    },
+    {
+        "label": "Shinobi CCTV", "service": "shinobi", "icon": "camera-video",
+        "backend": "pm2", "path": "/home/dragwaysk/Shinobi", "requires": ["mariadb"],
+        "scripts": {"start": "start-shinobi.sh", "stop": "stop-shinobi.sh", "restart": "restart-shinobi.sh"},
+        "ready": {"http": "http://127.0.0.1:8080/"},
+    },
+]
+
+# Perfiles: servicios que deben quedar activos (sus "requires" se añaden solos); el resto se detiene
+PROFILES = {
+    "web": ["postgresql", "docker"],
+    "cctv": ["shinobi"],
+}
+
+class ActivityCounters:
+    """Despertares del temporizador y procesos lanzados, para vigilar el consumo del panel en reposo"""
+    
+    def __init__(self):
+        self.started = time.monotonic()
+        self.wakeups = 0
+        self.forks = 0
+        self._lock = threading.Lock()
+    
+    def add_wakeup(self):
+        with self._lock:
+            self.wakeups += 1
+    
+    def add_fork(self):
+        with self._lock:
+            self.forks += 1
+    
+    def summary(self):
+        minutes = max((time.monotonic() - self.started) / 60, 1 / 60)
+        return (
+            f"{self.wakeups} despertares ({self.wakeups / minutes:.1f}/min), "
+            f"{self.forks} procesos ({self.forks / minutes:.1f}/min) en {minutes:.1f} min"
+        )
+
+COUNTERS = ActivityCounters()
+
+def run_process(cmd, **kwargs):
+    """subprocess.run contando el proceso lanzado"""
+    COUNTERS.add_fork()
+    return subprocess.run(cmd, **kwargs)
+
+def state_dir():
+    """Directorio de datos persistentes del panel ($XDG_STATE_HOME/dragwaysk-panel)"""
+    base = os.environ.get("XDG_STATE_HOME") or os.path.expanduser("~/.local/state")
+    path = os.path.join(base, "dragwaysk-panel")
+    os.makedirs(path, exist_ok=True)
+    return path
+
+class EventLog:
+    """Registro estructurado: JSON por línea en $XDG_STATE_HOME/dragwaysk-panel/events-<componente>.jsonl
+    
+    Los hilos (también el de GTK) solo encolan el registro; un QueueListener lo escribe y rota el
+    archivo por tamaño. Cada proceso (ventana, broker, CLI) escribe en el de su componente y
+    read() los mezcla por fecha. Varios procesos del mismo componente (varias ventanas o CLI)
+    comparten el archivo con SharedRotatingHandler.
+    """
+    
+    MAX_BYTES = 1024 * 1024
+    BACKUPS = 3
+    
+    class Formatter(logging.Formatter):
+        def __init__(self, component):
+            super().__init__()
+            self.component = component
+        
+        def format(self, record):
+            entry = {
+                "time": round(record.created, 3),
+                "level": record.levelname,
+                "component": self.component,
+                "pid": record.process,
+                "message": record.getMessage(),
+            }
+            entry.update(getattr(record, "fields", {}))
+            if record.exc_info:
+                entry["exception"] = self.formatException(record.exc_info)
+            return json.dumps(entry, ensure_ascii=False)
+    
+    class SharedRotatingHandler(logging.handlers.RotatingFileHandler):
+        """RotatingFileHandler seguro entre procesos que comparten el archivo
+        
+        Cada escritura (y la rotación) se hace con un flock sobre events-<componente>.lock, y si otro
+        proceso rotó el archivo mientras tanto (cambió el inodo) se reabre antes de escribir: nadie
+        sigue escribiendo en el ya rotado.
+        """
+        
+        def __init__(self, filename, **kwargs):
+            super().__init__(filename, delay=True, **kwargs)
+            self.lock_file = open(os.path.splitext(self.baseFilename)[0] + ".lock", "a")
+        
+        def emit(self, record):
+            try:
+                fcntl.flock(self.lock_file, fcntl.LOCK_EX)
+            except OSError:
+                self.handleError(record)
+                return
+            try:
+                self._reopen_if_rotated()
+                super().emit(record)
+            finally:
+                fcntl.flock(self.lock_file, fcntl.LOCK_UN)
+        
+        def _reopen_if_rotated(self):
+            if self.stream is None:
+                return
+            try:
+                rotated = os.stat(self.baseFilename).st_ino != os.fstat(self.stream.fileno()).st_ino
+            except FileNotFoundError:
+                rotated = True
+            if rotated:
+                self.stream.close()
+                self.stream = self._open()
+        
+        def close(self):
+            super().close()
+            self.lock_file.close()
+    
+    @classmethod
+    def setup(cls, component, level=logging.INFO):
+        """Configura el logging del proceso; devuelve el QueueListener (se detiene solo al salir)"""
+        handler = cls.SharedRotatingHandler(
+            os.path.join(state_dir(), f"events-{component}.jsonl"),
+            maxBytes=cls.MAX_BYTES,
+            backupCount=cls.BACKUPS,
+            encoding="utf-8"
+        )
+        handler.setFormatter(cls.Formatter(component))
+        log_queue = queue.SimpleQueue()
+        listener = logging.handlers.QueueListener(log_queue, handler)
+        root = logging.getLogger()
+        root.setLevel(level)
+        root.addHandler(logging.handlers.QueueHandler(log_queue))
+        listener.start()
+        atexit.register(listener.stop)  # Vacía la cola antes de salir
+        return listener
+    
+    @staticmethod
+    def read(service_names=None, events=None):
+        """Eventos de todos los componentes y archivos rotados, del más viejo al más nuevo"""
+        entries = []
+        for path in glob.glob(os.path.join(state_dir(), "events-*.jsonl*")):
+            try:
+                with open(path, encoding="utf-8") as f:
+                    for line in f:
+                        try:
+                            entry = json.loads(line)
+                        except ValueError:
+                            continue  # Línea a medio escribir
+                        if events and entry.get("event") not in events:
+                            continue
+                        if service_names and entry.get("service") not in service_names:
+                            continue
+                        entries.append(entry)
+            except OSError:
+                continue
+        entries.sort(key=lambda entry: entry.get("time", 0))
+        return entries
+
+def log_event(event, message, level=logging.INFO, **fields):
+    """Mensaje de log con campos estructurados (event, service, ...) para EventLog"""
+    logging.log(level, message, extra={"fields": dict(fields, event=event)})
+
+def log_transitions(previous, statuses):
+    """Registra los cambios de estado respecto a previous (la primera observación no cuenta)"""
+    for name, status in statuses.items():
+        before = previous.get(name)
+        if before is not None and before != status:
+            log_event("state", f"{name}: {before} -> {status}", service=name, status=status, previous=before)
+
+class OperationTrace:
+    """Tiempos de una operación: autorización, ejecución y confirmación del nuevo estado"""
+    
+    DESIRED = {"start": "active", "restart": "active", "stop": "inactive"}
+    
+    def __init__(self, service, action):
+        self.service = service
+        self.action = action
+        self.desired = self.DESIRED.get(action)
+        self.started = time.monotonic()
+        self.executed_at = None
+        self.phases = {}     # fase -> segundos
+        self.outcome = None  # ok, failed o unconfirmed
+        self.error = None
+    
+    def as_dict(self):
+        return {
+            "service": self.service,
+            "action": self.action,
+            "outcome": self.outcome,
+            "error": self.error,
+            "phases": {phase: round(seconds, 3) for phase, seconds in self.phases.items()},
+            "total": round(sum(self.phases.values()), 3),
+        }
+
+class OperationTracer:
+    """Traza cada start/stop por fases y acumula histogramas de latencia por servicio
+    
+    authorization: pkexec y arranque del ayudante (0 si ya estaba corriendo)
+    execution:     el comando del backend, sin la autorización
+    confirmation:  desde que termina el comando hasta que el servicio está listo (ver wait_ready)
+    """
+    
+    PHASES = ("authorization", "execution", "confirmation")
+    BUCKETS = (0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60)  # Segundos, límites superiores
+    CONFIRM_TIMEOUT = 300  # Trazas que nadie confirmó (p. ej. ventana cerrada): se cierran como "unconfirmed"
+    
+    def __init__(self, path=None):
+        self.path = path  # None: $XDG_STATE_HOME/dragwaysk-panel/operation-latency.json
+        self.open = {}    # servicio -> OperationTrace en curso
+        self._lock = threading.Lock()
+    
+    def get_path(self):
+        return self.path or os.path.join(state_dir(), "operation-latency.json")
+    
+    def begin(self, service, action):
+        with self._lock:
+            self.open[service] = OperationTrace(service, action)
+        self.expire()
+    
+    def add_authorization(self, services, seconds):
+        """Tiempo de autorización compartido por las unidades de un lote"""
+        with self._lock:
+            for service in services:
+                trace = self.open.get(service)
+                if trace is not None and trace.executed_at is None:
+                    trace.phases["authorization"] = trace.phases.get("authorization", 0.0) + seconds
+    
+    def executed(self, service, success, error=None):
+        """Fin del comando; si tuvo éxito la traza sigue abierta hasta confirmed()"""
+        with self._lock:
+            trace = self.open.get(service)
+            if trace is None:
+                return
+            trace.executed_at = time.monotonic()
+            authorization = trace.phases.get("authorization", 0.0)
+            trace.phases["execution"] = max(trace.executed_at - trace.started - authorization, 0.0)
+            if success:
+                return
+            trace.outcome, trace.error = "failed", error
+            del self.open[service]
+        self._finish(trace)
+    
+    def discard(self, service):
+        """Olvida la traza de una operación cancelada o reemplazada (no cuenta en los histogramas)"""
+        with self._lock:
+            self.open.pop(service, None)
+    
+    def confirmed(self, service, ready):
+        """Fin de la espera de disponibilidad (ready=False si se agotó el tiempo)"""
+        with self._lock:
+            trace = self.open.pop(service, None)
+            if trace is None or trace.executed_at is None:
+                return
+            trace.phases["confirmation"] = time.monotonic() - trace.executed_at
+            trace.outcome = ready and "ok" or "unconfirmed"
+        self._finish(trace)
+    
+    def expire(self):
+        """Cierra las trazas que nunca llegaron al estado esperado"""
+        now = time.monotonic()
+        with self._lock:
+            stale = [
+                trace for trace in self.open.values()
+                if trace.executed_at is not None and now - trace.executed_at > self.CONFIRM_TIMEOUT
+            ]
+            for trace in stale:
+                trace.outcome = "unconfirmed"
+                del self.open[trace.service]
+        for trace in stale:
+            self._finish(trace)
+    
+    def _finish(self, trace):
+        """Registra la traza en el log y la suma a los histogramas guardados"""
+        entry = trace.as_dict()
+        log_event(
+            "operation",
+            f"{trace.action} de {trace.service}: {trace.outcome} en {entry['total']:.2f} s",
+            level=trace.outcome == "ok" and logging.INFO or logging.WARNING,
+            **entry
+        )
+        try:
+            self._persist(trace)
+        except (OSError, ValueError) as e:
+            logging.error(f"No se pudo guardar la traza de {trace.service}: {e}")
+    
+    def _persist(self, trace):
+        """Suma la traza al archivo de histogramas (compartido por la ventana y la CLI)"""
+        path = self.get_path()
+        with open(path + ".lock", "w") as lock_file:
+            fcntl.flock(lock_file, fcntl.LOCK_EX)
+            data = self.load()
+            key = f"{trace.service}/{trace.action}"
+            entry = data.setdefault(key, {"service": trace.service, "action": trace.action, "outcomes": {}, "phases": {}})
+            entry["outcomes"][trace.outcome] = entry["outcomes"].get(trace.outcome, 0) + 1
+            for phase, seconds in trace.phases.items():
+                histogram = entry["phases"].setdefault(phase, {"buckets": [0] * (len(self.BUCKETS) + 1), "sum": 0.0, "count": 0})
+                index = next((i for i, bound in enumerate(self.BUCKETS) if seconds <= bound), len(self.BUCKETS))
+                histogram["buckets"][index] += 1
+                histogram["sum"] += seconds
+                histogram["count"] += 1
+            with open(path + ".tmp", "w") as f:
+                json.dump(data, f, indent=1)
+            os.replace(path + ".tmp", path)
+    
+    def load(self):
+        """Histogramas acumulados: {"servicio/acción": {"outcomes": {...}, "phases": {fase: histograma}}}"""
+        try:
+            with open(self.get_path()) as f:
+                return json.load(f)
+        except FileNotFoundError:
+            return {}
+    
+    def to_prometheus(self, data=None):
+        """Histogramas en formato de texto de Prometheus"""
+        data = self.load() if data is None else data
+        lines = [
+            "# HELP dragwaysk_operation_phase_seconds Duración de cada fase de las operaciones",
+            "# TYPE dragwaysk_operation_phase_seconds histogram",
+        ]
+        for entry in data.values():
+            for phase, histogram in entry["phases"].items():
+                labels = f'service="{entry["service"]}",action="{entry["action"]}",phase="{phase}"'
+                cumulative = 0
+                for bound, count in zip(self.BUCKETS + ("+Inf",), histogram["buckets"]):
+                    cumulative += count
+                    lines.append(f'dragwaysk_operation_phase_seconds_bucket{{{labels},le="{bound}"}} {cumulative}')
+                lines.append(f"dragwaysk_operation_phase_seconds_sum{{{labels}}} {histogram['sum']:.3f}")
+                lines.append(f"dragwaysk_operation_phase_seconds_count{{{labels}}} {histogram['count']}")
+        lines += [
+            "# HELP dragwaysk_operations_total Operaciones por resultado",
+            "# TYPE dragwaysk_operations_total counter",
+        ]
+        for entry in data.values():
+            for outcome, count in entry["outcomes"].items():
+                lines.append(
+                    f'dragwaysk_operations_total{{service="{entry["service"]}",action="{entry["action"]}",outcome="{outcome}"}} {count}'
+                )
+        return "\n".join(lines) + "\n"
+    
+    @classmethod
+    def quantile(cls, histogram, q):
+        """Cota superior del cuantil q según los buckets (None si cae en +Inf)"""
+        target = q * histogram["count"]
+        cumulative = 0
+        for bound, count in zip(cls.BUCKETS + (None,), histogram["buckets"]):
+            cumulative += count
+            if cumulative >= target:
+                return bound
+        return None
+
+TRACER = OperationTracer()
+
+class PrivilegedHelper:
+    """Cliente del ayudante privilegiado: un solo pkexec por sesión para todas las operaciones de systemd"""
+    
+    _shared = None
+    _shared_lock = threading.Lock()
+    
+    def __init__(self, command=None):
+        self.command = command  # None: pkexec sobre dragwaysk-helper.py
+        self.process = None
+        self._lock = threading.Lock()
+        self._next_id = 0
+        self._pending = {}  # id de petición -> [Event, respuesta]
+    
+    @classmethod
+    def shared(cls):
+        """Instancia única compartida por filas, operaciones en lote y orquestador"""
+        with cls._shared_lock:
+            if cls._shared is None:
+                cls._shared = cls()
+            return cls._shared
+    
+    def get_command(self):
+        """Comando para lanzar el ayudante, o None si no está instalado"""
+        if self.command:
+            return self.command
+        helper_path = os.path.join(ServiceValidator.get_scripts_dir(), "dragwaysk-helper.py")
+        if not os.path.isfile(helper_path):
+            return None
+        if os.access(helper_path, os.X_OK):
+            return ["pkexec", helper_path]
+        return ["pkexec", sys.executable, helper_path]
+    
+    def available(self):
+        return self.get_command() is not None
+    
+    def _ensure_started(self):
+        """Lanza el ayudante si no está corriendo (aquí aparece la única petición de contraseña)"""
+        if self.process is not None and self.process.poll() is None:
+            return
+        
+        COUNTERS.add_fork()
+        self.process = subprocess.Popen(
+            self.get_command(),
+            stdin=subprocess.PIPE,
+            stdout=subprocess.PIPE,
+            stderr=subprocess.DEVNULL,
+            text=True,
+            bufsize=1
+        )
+        ready = self.process.stdout.readline()
+        if not ready:
+            returncode = self.process.wait()
+            self.process = None
+            if returncode == 126:
+                raise PermissionError("Operación cancelada por el usuario")
+            raise PermissionError(f"No se pudo iniciar el ayudante privilegiado (código {returncode})")
+        
+        reader = threading.Thread(target=self._read_responses, args=(self.process,))
+        reader.daemon = True
+        reader.start()
+        logging.info(f"Ayudante privilegiado iniciado (pid {json.loads(ready).get('pid')})")
+    
+    def _read_responses(self, process):
+        """Entrega cada respuesta a la petición que la espera"""
+        for line in process.stdout:
+            try:
+                response = json.loads(line)
+            except ValueError:
+                continue
+            with self._lock:
+                waiter = self._pending.pop(response.get("id"), None)
+            if waiter:
+                waiter[1] = response
+                waiter[0].set()
+        
+        # El ayudante terminó: liberar a quien siga esperando
+        logging.warning("El ayudante privilegiado terminó")
+        with self._lock:
+            pending, self._pending = self._pending, {}
+        for waiter in pending.values():
+            waiter[1] = {"ok": False, "error": "El ayudante privilegiado terminó", "units": {}}
+            waiter[0].set()
+    
+    def run(self, action, units, timeout=30):
+        """Envía una petición (un lote de unidades) y espera la confirmación; devuelve (éxito, error)"""
+        success, error_msg, per_unit = self.run_batch(action, units, timeout)
+        return success, error_msg
+    
+    def run_batch(self, action, units, timeout=30):
+        """Como run(), pero devuelve también el resultado por unidad: (éxito, error, {unidad: éxito})"""
+        waiter = [threading.Event(), None]
+        try:
+            start = time.monotonic()
+            with self._lock:
+                self._ensure_started()
+                TRACER.add_authorization(units, time.monotonic() - start)
+                self._next_id += 1
+                request_id = self._next_id
+                self._pending[request_id] = waiter
+                request = {"id": request_id, "action": action, "units": units, "timeout": timeout}
+                self.process.stdin.write(json.dumps(request) + "\n")
+                self.process.stdin.flush()
+        except (OSError, PermissionError) as e:
+            return False, str(e), {}
+        
+        if not waiter[0].wait(timeout + 5):
+            with self._lock:
+                self._pending.pop(request_id, None)
+            return False, "La operación tardó demasiado tiempo", {}
+        response = waiter[1]
+        return response.get("ok", False), response.get("error"), response.get("units", {})
+    
+    def close(self):
+        """Cierra stdin para que el ayudante termine"""
+        with self._lock:
+            if self.process is not None and self.process.poll() is None:
+                self.process.stdin.close()
+            self.process = None
+
+class Inotify:
+    """inotify de Linux por ctypes (la biblioteca estándar no lo expone)"""
+    
+    IN_MODIFY = 0x00000002
+    IN_CLOSE_WRITE = 0x00000008
+    IN_MOVED_TO = 0x00000080
+    IN_CREATE = 0x00000100
+    IN_DELETE = 0x00000200
+    IN_CLOEXEC = 0o2000000
+    EVENT_HEADER = struct.Struct("iIII")
+    
+    def __init__(self):
+        self._libc = ctypes.CDLL(None, use_errno=True)
+        self.fd = self._libc.inotify_init1(self.IN_CLOEXEC)
+        if self.fd < 0:
+            raise OSError(ctypes.get_errno(), "inotify_init1")
+    
+    def add_watch(self, path, mask):
+        wd = self._libc.inotify_add_watch(self.fd, os.fsencode(path), mask)
+        if wd < 0:
+            raise OSError(ctypes.get_errno(), f"inotify_add_watch {path}")
+        return wd
+    
+    def read_events(self):
+        """Lee los eventos pendientes: [(wd, máscara, nombre)]"""
+        data = os.read(self.fd, 65536)
+        events = []
+        offset = 0
+        while offset + self.EVENT_HEADER.size <= len(data):
+            wd, mask, cookie, length = self.EVENT_HEADER.unpack_from(data, offset)
+            offset += self.EVENT_HEADER.size
+            name = data[offset:offset + length].rstrip(b"\0").decode(errors="replace")
+            offset += length
+            events.append((wd, mask, name))
+        return events
+    
+    def close(self):
+        os.close(self.fd)
+
+class PM2Client:
+    """Habla con el demonio de PM2 por su socket RPC (axon/amp) en lugar de lanzar el CLI de Node"""
+    
+    _shared = None
+    _shared_lock = threading.Lock()
+    
+    def __init__(self, pm2_home=None):
+        self.pm2_home = pm2_home or os.environ.get("PM2_HOME") or os.path.expanduser("~/.pm2")
+        self.rpc_path = os.path.join(self.pm2_home, "rpc.sock")
+        self.pub_path = os.path.join(self.pm2_home, "pub.sock")
+        self._sock = None
+        self._buffer = b""
+        self._lock = threading.Lock()
+        self._next_id = 0
+        self._identity = f"dragwaysk-{os.getpid()}"
+    
+    @classmethod
+    def shared(cls):
+        with cls._shared_lock:
+            if cls._shared is None:
+                cls._shared = cls()
+            return cls._shared
+    
+    @staticmethod
+    def pack(args):
+        """Codifica un mensaje amp: cabecera (versión 1, nº de argumentos) y cada argumento con su longitud"""
+        parts = []
+        for arg in args:
+            if isinstance(arg, bytes):
+                data = arg
+            elif isinstance(arg, str):
+                data = b"s:" + arg.encode()
+            else:
+                data = b"j:" + json.dumps(arg).encode()
+            parts.append(struct.pack(">I", len(data)) + data)
+        return bytes([0x10 | len(args)]) + b"".join(parts)
+    
+    @staticmethod
+    def unpack(buffer):
+        """Separa los mensajes completos del buffer; devuelve (mensajes con argumentos crudos, resto)"""
+        messages = []
+        while buffer:
+            argc = buffer[0] & 0x0f
+            offset = 1
+            args = []
+            for _ in range(argc):
+                if len(buffer) < offset + 4:
+                    return messages, buffer
+                length = struct.unpack_from(">I", buffer, offset)[0]
+                offset += 4
+                if len(buffer) < offset + length:
+                    return messages, buffer
+                args.append(buffer[offset:offset + length])
+                offset += length
+            messages.append(args)
+            buffer = buffer[offset:]
+        return messages, buffer
+    
+    @staticmethod
+    def decode(arg):
+        """Decodifica un argumento amp ('s:' texto, 'j:' JSON, o bytes)"""
+        if arg[:2] == b"s:":
+            return arg[2:].decode()
+        if arg[:2] == b"j:":
+            return json.loads(arg[2:].decode())
+        return arg
+    
+    def daemon_running(self):
+        return os.path.exists(self.rpc_path)
+    
+    def call(self, method, *args, timeout=5):
+        """Invoca un método remoto del demonio y devuelve su resultado"""
+        with self._lock:
+            try:
+                return self._call(method, list(args), timeout)
+            except (OSError, ValueError):
+                self._close()
+                raise
+    
+    def _call(self, method, args, timeout):
+        if self._sock is None:
+            sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+            sock.settimeout(timeout)
+            sock.connect(self.rpc_path)
+            self._sock = sock
+            self._buffer = b""
+        self._sock.settimeout(timeout)
+        
+        self._next_id += 1
+        request_id = f"{self._identity}:{self._next_id}"
+        self._sock.sendall(self.pack([{"type": "call", "method": method, "args": args}, request_id]))
+        
+        while True:
+            messages, self._buffer = self.unpack(self._buffer)
+            for message in messages:
+                # Las respuestas llevan el id al final; las de peticiones ya abandonadas se descartan
+                if len(message) < 2 or self.decode(message[-1]) != request_id:
+                    continue
+                reply = self.decode(message[0]) or {}
+                if reply.get("error"):
+                    raise RuntimeError(f"PM2: {reply['error']}")
+                return (reply.get("args") or [None])[0]
+            chunk = self._sock.recv(65536)
+            if not chunk:
+                raise ConnectionError("PM2 cerró la conexión")
+            self._buffer += chunk
+    
+    def _close(self):
+        if self._sock is not None:
+            self._sock.close()
+        self._sock = None
+    
+    def find_process(self, name):
+        """Devuelve la descripción de un proceso de PM2 o None"""
+        for proc in self.call("getMonitorData", {}) or []:
+            if proc.get("name") == name:
+                return proc
+        return None
+    
+    def get_status(self, name):
+        """Estado del proceso traducido a los estados del panel"""
+        return self.get_statuses([name])[name]
+    
+    def get_statuses(self, names):
+        """Estados de varios procesos con una sola llamada al demonio"""
+        if not self.daemon_running():
+            # Sin demonio no hay procesos (y no lo arrancamos solo para consultar)
+            return {name: "inactive" for name in names}
+        return self.statuses_from_processes(self.call("getMonitorData", {}) or [], names)
+    
+    @staticmethod
+    def statuses_from_processes(processes, names):
+        """Traduce la lista de procesos de PM2 (getMonitorData o 'pm2 jlist') a estados del panel"""
+        statuses = {name: "inactive" for name in names}
+        for proc in processes:
+            name = proc.get("name")
+            if name not in statuses:
+                continue
+            pm2_status = proc.get("pm2_env", {}).get("status")
+            if pm2_status == "online":
+                statuses[name] = "active"
+            elif pm2_status == "stopped":
+                statuses[name] = "inactive"
+            else:
+                statuses[name] = "failed"
+        return statuses
+    
+    def operate(self, name, action, save=True):
+        """Inicia, detiene o reinicia un proceso ya registrado; False si PM2 no lo conoce"""
+        if not self.daemon_running():
+            return False
+        proc = self.find_process(name)
+        if proc is None:
+            return False
+        pm_id = proc["pm_id"]
+        if action == "start":
+            self.call("startProcessId", pm_id, timeout=30)
+        elif action == "stop":
+            self.call("stopProcessId", pm_id, timeout=30)
+        else:
+            self.call("restartProcessId", {"id": pm_id}, timeout=30)
+        if save:
+            self.call("dumpProcessList")  # Equivalente a 'pm2 save'
+        return True
+
+class PM2Watcher:
+    """Escucha los eventos de proceso del bus de PM2 (pub.sock) para no tener que sondear"""
+    
+    RETRY_SECONDS = 10  # Reintento de conexión mientras el demonio no está corriendo
+    
+    def __init__(self, process_names, on_event, on_state=None, client=None):
+        self.process_names = set(process_names)
+        self.on_event = on_event  # (nombre, evento); se llama desde el hilo del watcher
+        self.on_state = on_state  # Conectado/desconectado; también desde el hilo
+        self.client = client or PM2Client.shared()
+        self.connected = False
+        self._sock = None
+        self._stopped = threading.Event()
+        self._thread = None
+    
+    def watched_services(self):
+        return set(self.process_names) if self.connected else set()
+    
+    def start(self):
+        if self._thread is None:
+            self._thread = threading.Thread(target=self._run, name="pm2-events")
+            self._thread.daemon = True
+            self._thread.start()
+    
+    def stop(self):
+        self._stopped.set()
+        if self._sock is not None:
+            try:
+                self._sock.shutdown(socket.SHUT_RDWR)
+            except OSError:
+                pass
+    
+    def _set_connected(self, connected):
+        self.connected = connected
+        if self.on_state:
+            self.on_state()
+    
+    def _run(self):
+        while not self._stopped.is_set():
+            sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+            try:
+                sock.connect(self.client.pub_path)
+            except OSError:
+                sock.close()
+                self._stopped.wait(self.RETRY_SECONDS)
+                COUNTERS.add_wakeup()
+                continue
+            
+            self._sock = sock
+            self._set_connected(True)
+            # Al reconectar el estado pudo cambiar sin eventos
+            for name in self.process_names:
+                self.on_event(name, "connected")
+            buffer = b""
+            try:
+                while True:
+                    chunk = sock.recv(65536)
+                    if not chunk:
+                        break
+                    messages, buffer = PM2Client.unpack(buffer + chunk)
+                    for message in messages:
+                        # Solo se decodifica el JSON de los eventos de proceso (los logs se ignoran)
+                        if len(message) < 2 or message[0] != b"s:process:event":
+                            continue
+                        data = PM2Client.decode(message[1])
+                        name = data.get("process", {}).get("name")
+                        if name in self.process_names:
+                            self.on_event(name, data.get("event"))
+            except OSError:
+                pass
+            finally:
+                sock.close()
+                self._sock = None
+                self._set_connected(False)
+
+BACKENDS = {}
+
+def register_backend(cls):
+    """Registra un backend por su nombre (clave "backend" en SERVICES_CONFIG)"""
+    BACKENDS[cls.name] = cls()
+    return cls
+
+class ServiceBackend:
+    """Tipo de servicio (systemd, PM2, docker-compose, proceso); consulta y opera siempre en lote"""
+    
+    name = None
+    required = ()  # Claves obligatorias de la entrada (las comprueba ServiceConfig.validate)
+    
+    def exists(self, services):
+        """Devuelve {servicio: bool} para las entradas de SERVICES_CONFIG indicadas"""
+        raise NotImplementedError
+    
+    def get_statuses(self, services):
+        """Devuelve {servicio: estado} con una sola consulta para todas las entradas"""
+        raise NotImplementedError
+    
+    def run(self, action, services, timeout=30):
+        """Ejecuta la acción sobre todas las entradas; devuelve {servicio: (éxito, error)}"""
+        raise NotImplementedError
+    
+    def resource_targets(self, services):
+        """Dónde leer el consumo: {servicio: ("cgroup", ruta) o ("pids", [pids])}; sin entrada, no se mide"""
+        return {}
+    
+    def log_sources(self, services):
+        """Dónde leer el registro: {servicio: ("journal", unidad) o ("files", [(ruta, prioridad)])}"""
+        return {}
+    
+    @staticmethod
+    def run_command(cmd, timeout, cwd=None):
+        """Ejecuta un comando y devuelve (éxito, mensaje de error)"""
+        try:
+            result = run_process(
+                cmd,
+                capture_output=True,
+                text=True,
+                timeout=timeout,
+                cwd=cwd
+            )
+            if result.returncode == 0:
+                return True, None
+            return False, result.stderr or "Operación cancelada por el usuario"
+        except subprocess.TimeoutExpired:
+            return False, "La operación tardó demasiado tiempo"
+        except Exception as e:
+            return False, str(e)
+
+@register_backend
+class SystemdBackend(ServiceBackend):
+    """Unidades de systemd: 'systemctl show' en lote y operaciones por el ayudante privilegiado"""
+    
+    name = "systemd"
+    
+    # Caché de 'systemctl list-unit-files' (se invalida por TTL o por señales de systemd)
+    UNIT_FILES_TTL = 60  # segundos
+    _unit_files = None
+    _unit_files_loaded_at = 0.0
+    _unit_files_lock = threading.Lock()
+    
+    def exists(self, services):
+        # Lista de unidades de systemd en caché
+        unit_files = self.get_unit_files()
+        return {
+            s["service"]: unit_files is not None and s["service"] + ".service" in unit_files
+            for s in services
+        }
+    
+    @classmethod
+    def get_unit_files(cls):
+        """Devuelve el conjunto de unidades instaladas, recargándolo con una sola llamada si caducó"""
+        with cls._unit_files_lock:
+            expired = time.monotonic() - cls._unit_files_loaded_at > cls.UNIT_FILES_TTL
+            if cls._unit_files is None or expired:
+                try:
+                    result = run_process(
+                        ["systemctl", "list-unit-files", "--no-legend", "--plain"],
+                        capture_output=True,
+                        text=True,
+                        timeout=5
+                    )
+                    cls._unit_files = {
+                        line.split()[0] for line in result.stdout.splitlines() if line.strip()
+                    }
+                    cls._unit_files_loaded_at = time.monotonic()
+                except Exception as e:
+                    logging.error(f"Error listando unidades de systemd: {e}")
+                    return None
+            return cls._unit_files
+    
+    @classmethod
+    def invalidate_unit_files(cls):
+        """Descarta la caché de unidades (systemd recargó o cambiaron los archivos de unidad)"""
+        with cls._unit_files_lock:
+            cls._unit_files = None
+    
+    def get_statuses(self, services):
+        service_names = [s["service"] for s in services]
+        statuses = {}
+        try:
+            result = run_process(
+                ["systemctl", "show", "--property=Id,LoadState,ActiveState,SubState"]
+                + [name + ".service" for name in service_names],
+                capture_output=True,
+                text=True,
+                timeout=5
+            )
+            units = self.parse_systemctl_show(result.stdout)
+        except Exception as e:
+            logging.error(f"Error obteniendo estado de {', '.join(service_names)}: {e}")
+            units = []
+        
+        # systemctl show devuelve un bloque por unidad en el mismo orden de los argumentos
+        if len(units) != len(service_names):
+            return {name: "error" for name in service_names}
+        
+        for service_name, props in zip(service_names, units):
+            status = props.get("ActiveState", "")
+            statuses[service_name] = status if status in ["active", "inactive", "failed"] else "unknown"
+        return statuses
+    
+    @staticmethod
+    def parse_systemctl_show(output):
+        """Convierte la salida de 'systemctl show' en una lista de diccionarios por unidad"""
+        units = []
+        props = {}
+        for line in output.splitlines():
+            if not line.strip():
+                if props:
+                    units.append(props)
+                    props = {}
+                continue
+            key, _, value = line.partition("=")
+            props[key] = value
+        if props:
+            units.append(props)
+        return units
+    
+    def run(self, action, services, timeout=30):
+        service_names = [s["service"] for s in services]
+        # Un solo systemctl para todo el lote, por el ayudante privilegiado (un pkexec por sesión)
+        helper = PrivilegedHelper.shared()
+        if helper.available():
+            success, error_msg, per_unit = helper.run_batch(action, service_names, timeout)
+            return {
+                name: (per_unit.get(name, success), None if per_unit.get(name, success) else error_msg)
+                for name in service_names
+            }
+        success, error_msg = self.run_command(["pkexec", "systemctl", action] + service_names, timeout)
+        return {name: (success, error_msg) for name in service_names}
+    
+    def log_sources(self, services):
+        return {s["service"]: ("journal", s["service"] + ".service") for s in services}
+    
+    def resource_targets(self, services):
+        # cgroup v2: cada unidad del sistema tiene su grupo bajo system.slice
+        return {
+            s["service"]: ("cgroup", os.path.join(ResourceMonitor.CGROUP_ROOT, "system.slice", s["service"] + ".service"))
+            for s in services
+        }
+
+@register_backend
+class PM2Backend(ServiceBackend):
+    """Procesos de PM2 por el socket RPC del demonio, con los scripts o el CLI como respaldo"""
+    
+    name = "pm2"
+    
+    def exists(self, services):
+        # Con "path" basta con que exista el directorio de la aplicación; si no, que PM2 la conozca
+        existing = {}
+        for s in services:
+            if "path" in s:
+                existing[s["service"]] = os.path.isdir(s["path"])
+            else:
+                try:
+                    existing[s["service"]] = PM2Client.shared().find_process(s["service"]) is not None
+                except Exception:
+                    existing[s["service"]] = False
+        return existing
+    
+    def get_statuses(self, services):
+        service_names = [s["service"] for s in services]
+        try:
+            return PM2Client.shared().get_statuses(service_names)
+        except Exception as e:
+            logging.warning(f"Socket de PM2 no disponible ({e}), usando 'pm2 jlist'")
+        try:
+            result = run_process(
+                ["pm2", "jlist"],
+                capture_output=True,
+                text=True,
+                timeout=5
+            )
+            return PM2Client.statuses_from_processes(json.loads(result.stdout), service_names)
+        except Exception as e:
+            logging.error(f"Error obteniendo estado PM2 de {', '.join(service_names)}: {e}")
+            return {name: "error" for name in service_names}
+    
+    def run(self, action, services, timeout=30):
+        results = {}
+        client = PM2Client.shared()
+        saved = False
+        for s in services:
+            name = s["service"]
+            # Procesos ya registrados en PM2 se manejan por el socket; si no, con script o CLI
+            try:
+                if client.operate(name, action, save=False):
+                    results[name] = (True, None)
+                    saved = True
+                    continue
+            except Exception as e:
+                logging.warning(f"Socket de PM2 falló en {action} de {name}: {e}")
+            
+            script = s.get("scripts", {}).get(action)
+            if script:
+                cmd = ["bash", os.path.join(ServiceValidator.get_scripts_dir(), script)]
+            else:
+                cmd = ["pm2", action, name]
+            results[name] = self.run_command(cmd, timeout, cwd=s.get("path"))
+        
+        if saved:
+            try:
+                client.call("dumpProcessList")  # Un solo 'pm2 save' para todo el lote
+            except Exception as e:
+                logging.warning(f"No se pudo guardar la lista de PM2: {e}")
+        return results
+    
+    def log_sources(self, services):
+        # Las rutas reales vienen en pm2_env; si el demonio no responde, las de por defecto de PM2
+        client = PM2Client.shared()
+        sources = {}
+        for s in services:
+            name = s["service"]
+            env = {}
+            try:
+                env = (client.daemon_running() and client.find_process(name) or {}).get("pm2_env", {})
+            except Exception as e:
+                logging.debug(f"PM2 no disponible para ubicar los logs de {name}: {e}")
+            logs_dir = os.path.join(client.pm2_home, "logs")
+            sources[name] = ("files", [
+                (env.get("pm_out_log_path") or os.path.join(logs_dir, f"{name}-out.log"), 6),
+                (env.get("pm_err_log_path") or os.path.join(logs_dir, f"{name}-error.log"), 3),
+            ])
+        return sources
+    
+    def resource_targets(self, services):
+        # El pid de cada proceso sale de la misma llamada al demonio que usa el estado
+        names = {s["service"] for s in services}
+        try:
+            processes = PM2Client.shared().call("getMonitorData", {}) or []
+        except Exception as e:
+            logging.debug(f"PM2 no disponible para medir consumo: {e}")
+            return {}
+        targets = {}
+        for proc in processes:
+            if proc.get("name") in names and proc.get("pid"):
+                targets.setdefault(proc["name"], ("pids", []))[1].append(proc["pid"])
+        return targets
+
+@register_backend
+class DockerComposeBackend(ServiceBackend):
+    """Proyectos de docker compose ("compose_file" y opcionalmente "compose_services")"""
+    
+    name = "docker-compose"
+    required = ("compose_file",)
+    
+    def exists(self, services):
+        has_docker = shutil.which("docker") is not None
+        return {s["service"]: has_docker and os.path.isfile(s.get("compose_file", "")) for s in services}
+    
+    def _compose(self, compose_file, *args):
+        return ["docker", "compose", "-f", compose_file] + list(args)
+    
+    def get_statuses(self, services):
+        statuses = {}
+        # Una consulta por archivo compose, compartida por las entradas que lo usan
+        for compose_file, entries in self._group_by_file(services).items():
+            try:
+                result = run_process(
+                    self._compose(compose_file, "ps", "--all", "--format", "json"),
+                    capture_output=True,
+                    text=True,
+                    timeout=10
+                )
+                containers = self.parse_ps(result.stdout)
+            except Exception as e:
+                logging.error(f"Error consultando {compose_file}: {e}")
+                for s in entries:
+                    statuses[s["service"]] = "error"
+                continue
+            for s in entries:
+                selected = s.get("compose_services")
+                own = [c for c in containers if not selected or c.get("Service") in selected]
+                statuses[s["service"]] = self.summarize(own)
+        return statuses
+    
+    @staticmethod
+    def parse_ps(output):
+        """'docker compose ps --format json' devuelve un arreglo o un objeto por línea según la versión"""
+        output = output.strip()
+        if not output:
+            return []
+        if output.startswith("["):
+            return json.loads(output)
+        return [json.loads(line) for line in output.splitlines() if line.strip()]
+    
+    @staticmethod
+    def summarize(containers):
+        """Resume el estado de los contenedores de una entrada"""
+        if not containers:
+            return "inactive"
+        states = [c.get("State") for c in containers]
+        if all(state == "running" for state in states):
+            return "active"
+        if any(state in ["dead", "restarting"] or (state == "exited" and c.get("ExitCode")) for state, c in zip(states, containers)):
+            return "failed"
+        if not any(state == "running" for state in states):
+            return "inactive"
+        return "unknown"
+    
+    def run(self, action, services, timeout=30):
+        verbs = {"start": ["up", "-d"], "stop": ["stop"], "restart": ["restart"]}
+        results = {}
+        for compose_file, entries in self._group_by_file(services).items():
+            # Si alguna entrada usa el proyecto completo, se opera sobre todo el archivo
+            selected = []
+            for s in entries:
+                if not s.get("compose_services"):
+                    selected = []
+                    break
+                selected += s["compose_services"]
+            outcome = self.run_command(self._compose(compose_file, *(verbs[action] + selected)), timeout)
+            for s in entries:
+                results[s["service"]] = outcome
+        return results
+    
+    @staticmethod
+    def _group_by_file(services):
+        groups = {}
+        for s in services:
+            groups.setdefault(s.get("compose_file", ""), []).append(s)
+        return groups
+
+@register_backend
+class ProcessBackend(ServiceBackend):
+    """Procesos sueltos: "command" para arrancar; se reconocen por su "command" completo o por "match"
+    
+    Solo se miran los procesos del usuario actual, y los que inició este backend se siguen por su pid
+    (y se detienen con todo su grupo) en lugar de buscarlos en /proc.
+    """
+    
+    name = "process"
+    required = ("command",)
+    
+    def __init__(self):
+        self.spawned = {}  # servicio -> Popen del proceso que inició este backend
+        self._lock = threading.Lock()
+    
+    def exists(self, services):
+        return {
+            s["service"]: bool(s.get("command")) and (
+                shutil.which(s["command"][0]) is not None or os.path.isfile(s["command"][0])
+            )
+            for s in services
+        }
+    
+    @staticmethod
+    def matches(service, argv):
+        """Con "match", texto contenido en la línea de comandos; sin él, el "command" entero al final
+        de argv (un script con #! aparece detrás de su intérprete) y el programa comparado por su nombre"""
+        if service.get("match"):
+            return service["match"] in " ".join(argv)
+        command = service["command"]
+        tail = argv[-len(command):]
+        return (
+            len(argv) >= len(command) and tail[1:] == command[1:]
+            and os.path.basename(tail[0]) == os.path.basename(command[0])
+        )
+    
+    @staticmethod
+    def scan_processes():
+        """Una sola pasada por /proc: {pid: argv} de los procesos del usuario actual"""
+        processes, uid = {}, os.getuid()
+        for entry in os.listdir("/proc"):
+            if not entry.isdigit():
+                continue
+            try:
+                if os.stat(f"/proc/{entry}").st_uid != uid:
+                    continue  # Nunca se señalan procesos de otros usuarios
+                with open(f"/proc/{entry}/cmdline", "rb") as f:
+                    cmdline = f.read()
+            except OSError:
+                continue
+            if cmdline:
+                processes[int(entry)] = [arg.decode(errors="replace") for arg in cmdline.rstrip(b"\0").split(b"\0")]
+        return processes
+    
+    def spawned_pid(self, service_name):
+        """Pid del proceso que inició este backend si sigue vivo (poll() además recoge al que terminó)"""
+        with self._lock:
+            process = self.spawned.get(service_name)
+            if process is not None and process.poll() is None:
+                return process.pid
+            self.spawned.pop(service_name, None)
+            return None
+    
+    def is_alive(self, service_name, pid):
+        # spawned_pid() recoge al proceso propio cuando termina, si no quedaría como zombi en /proc
+        return pid == self.spawned_pid(service_name) or os.path.exists(f"/proc/{pid}")
+    
+    def find_pids(self, services, processes=None):
+        """Devuelve {servicio: [pids]} para las entradas indicadas"""
+        ignored = {os.getpid(), os.getppid()}
+        pids = {}
+        for s in services:
+            own = self.spawned_pid(s["service"])
+            if own is not None:
+                pids[s["service"]] = [own]
+                continue
+            if processes is None:
+                processes = self.scan_processes()
+            pids[s["service"]] = [
+                pid for pid, argv in processes.items() if pid not in ignored and self.matches(s, argv)
+            ]
+        return pids
+    
+    def get_statuses(self, services):
+        return {name: pids and "active" or "inactive" for name, pids in self.find_pids(services).items()}
+    
+    def resource_targets(self, services):
+        return {name: ("pids", pids) for name, pids in self.find_pids(services).items() if pids}
+    
+    def run(self, action, services, timeout=30):
+        results = {}
+        running = self.find_pids(services)
+        for s in services:
+            name = s["service"]
+            try:
+                if action in ["stop", "restart"]:
+                    own = self.spawned_pid(name)
+                    for pid in running[name]:
+                        if pid == own:
+                            os.killpg(pid, signal.SIGTERM)  # Inició su propia sesión: se lleva a sus hijos
+                        else:
+                            os.kill(pid, signal.SIGTERM)
+                    deadline = time.monotonic() + timeout
+                    # Se espera a los señalados, no a otro proceso igual que aparezca entretanto
+                    while any(self.is_alive(name, pid) for pid in running[name]):
+                        if time.monotonic() > deadline:
+                            raise TimeoutError("La operación tardó demasiado tiempo")
+                        time.sleep(0.2)
+                if action == "start" and running[name]:
+                    results[name] = (True, None)  # Ya corre: no se lanza otra copia
+                    continue
+                if action in ["start", "restart"]:
+                    COUNTERS.add_fork()
+                    process = subprocess.Popen(
+                        s["command"],
+                        cwd=s.get("cwd"),
+                        stdin=subprocess.DEVNULL,
+                        stdout=subprocess.DEVNULL,
+                        stderr=subprocess.DEVNULL,
+                        start_new_session=True
+                    )
+                    with self._lock:
+                        self.spawned[name] = process
+                results[name] = (True, None)
+            except Exception as e:
+                results[name] = (False, str(e))
+        return results
+
+READINESS_PROBES = {}
+
+def register_probe(kind):
+    """Registra una sonda de disponibilidad para la clave "kind" de "ready" en SERVICES_CONFIG"""
+    def decorator(probe):
+        READINESS_PROBES[kind] = probe
+        return probe
+    return decorator
+
+def probe_address(value):
+    """5432 o "host:5432" -> (host, puerto)"""
+    if isinstance(value, int):
+        return "127.0.0.1", value
+    host, _, port = str(value).rpartition(":")
+    return host or "127.0.0.1", int(port)
+
+@register_probe("tcp")
+def probe_tcp(spec, timeout):
+    """El puerto acepta conexiones"""
+    with socket.create_connection(probe_address(spec["tcp"]), timeout=timeout):
+        return True
+
+@register_probe("unix")
+def probe_unix(spec, timeout):
+    """El socket Unix existe y acepta conexiones (un archivo huérfano no cuenta)
+    
+    Sin permiso para conectar (p. ej. /var/run/docker.sock fuera del grupo docker) no se puede saber
+    si escucha: vale lo que diga el backend, que is_ready() ya comprobó que está activo.
+    """
+    sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+    sock.settimeout(timeout)
+    try:
+        sock.connect(spec["unix"])
+        return True
+    except PermissionError:
+        return True
+    finally:
+        sock.close()
+
+@register_probe("http")
+def probe_http(spec, timeout):
+    """La URL responde con el código esperado (200 por defecto)"""
+    import urllib.error
+    import urllib.request  # Solo la cargan los servicios que la usan
+    try:
+        with urllib.request.urlopen(spec["http"], timeout=timeout) as response:
+            return response.status == spec.get("status", 200)
+    except urllib.error.HTTPError as e:
+        return e.code == spec.get("status", 200)
+
+@register_probe("postgres")
+def probe_postgres(spec, timeout):
+    """Saludo de PostgreSQL como pg_isready: el servidor contesta a un SSLRequest con 'S' o 'N'"""
+    with socket.create_connection(probe_address(spec["postgres"]), timeout=timeout) as sock:
+        sock.sendall(struct.pack(">II", 8, 80877103))
+        return sock.recv(1) in (b"S", b"N")
+
+@register_probe("mysql")
+def probe_mysql(spec, timeout):
+    """Saludo de MySQL/MariaDB: el primer paquete es el handshake (10) o un error del servidor (0xff)"""
+    with socket.create_connection(probe_address(spec["mysql"]), timeout=timeout) as sock:
+        header = sock.recv(5)
+        return len(header) == 5 and header[4] in (10, 0xff)
+
+@register_probe("command")
+def probe_command(spec, timeout):
+    """El comando termina con código 0"""
+    return run_process(spec["command"], capture_output=True, timeout=timeout).returncode == 0
+
+class ServiceValidator:
+    """Valida y obtiene información de servicios a través del backend de cada entrada"""
+    
+    @staticmethod
+    def get_config(service_name):
+        """Entrada de SERVICES_CONFIG para el servicio (systemd por defecto si no está configurado)"""
+        for service in SERVICES_CONFIG:
+            if service["service"] == service_name:
+                return service
+        return {"service": service_name}
+    
+    @staticmethod
+    def backend_name(service_name):
+        return ServiceValidator.get_config(service_name).get("backend", "systemd")
+    
+    @staticmethod
+    def get_backend(service):
+        """Backend de una entrada de SERVICES_CONFIG, o None si no está registrado"""
+        return BACKENDS.get(service.get("backend", "systemd"))
+    
+    @staticmethod
+    def group_by_backend(service_names):
+        """Agrupa los servicios por backend: {backend: [entradas de SERVICES_CONFIG]}"""
+        groups = {}
+        for service_name in service_names:
+            service = ServiceValidator.get_config(service_name)
+            backend = ServiceValidator.get_backend(service)
+            if backend is None:
+                logging.error(f"Backend desconocido para {service_name}: {service.get('backend')}")
+                continue
+            groups.setdefault(backend, []).append(service)
+        return groups
+    
+    @staticmethod
+    def get_scripts_dir():
+        """Directorio de los scripts de gestión (Shinobi, ayudante privilegiado)"""
+        # Buscar scripts en /usr/share/dragwaysk-panel (instalado) o en directorio actual (dev)
+        if os.path.isdir("/usr/share/dragwaysk-panel"):
+            return "/usr/share/dragwaysk-panel"
+        return os.path.dirname(os.path.abspath(__file__))
+    
+    @staticmethod
+    def service_exists(service_name):
+        """Verifica si un servicio existe según su backend"""
+        return ServiceValidator.services_exist([service_name]).get(service_name, False)
+    
+    @staticmethod
+    def services_exist(service_names):
+        """Verifica la existencia de varios servicios con una consulta por backend"""
+        existing = {name: False for name in service_names}
+        for backend, services in ServiceValidator.group_by_backend(service_names).items():
+            try:
+                existing.update(backend.exists(services))
+            except Exception as e:
+                logging.error(f"Error verificando existencia en {backend.name}: {e}")
+        return existing
+    
+    @staticmethod
+    def get_service_status(service_name):
+        """Obtiene el estado detallado de un servicio"""
+        return ServiceValidator.get_services_status([service_name]).get(service_name, "error")
+    
+    @staticmethod
+    def get_services_status(service_names):
+        """Obtiene el estado de varios servicios con una sola consulta por backend"""
+        statuses = {}
+        for backend, services in ServiceValidator.group_by_backend(service_names).items():
+            statuses.update(backend.get_statuses(services))
+        return statuses
+    
+    @staticmethod
+    def is_ready(service_name, action):
+        """El servicio ya está en el estado pedido y, si se inició, pasa sus sondas de disponibilidad"""
+        status = ServiceValidator.get_service_status(service_name)
+        if action == "stop":
+            return status in ("inactive", "failed")
+        if status != "active":
+            return False
+        probes = ServiceValidator.get_config(service_name).get("ready") or []
+        for spec in isinstance(probes, dict) and [probes] or probes:
+            kind = next((key for key in spec if key in READINESS_PROBES), None)
+            if kind is None:
+                logging.error(f"Sonda de disponibilidad desconocida para {service_name}: {spec}")
+                continue
+            try:
+                if not READINESS_PROBES[kind](spec, 1.0):
+                    return False
+            except (OSError, ValueError, subprocess.TimeoutExpired):
+                return False
+        return True
+    
+    @staticmethod
+    def wait_ready(service_name, action, cancel=None, timeout=None):
+        """Espera con backoff a que la operación surta efecto; devuelve (listo, segundos esperados)
+        
+        listo es None si se activó el evento cancel antes de confirmar o agotar el tiempo.
+        """
+        if timeout is None:
+            timeout = ServiceValidator.get_config(service_name).get("ready_timeout", 60)
+        cancel = cancel or threading.Event()
+        start = time.monotonic()
+        delay = 0.1
+        while True:
+            if ServiceValidator.is_ready(service_name, action):
+                return True, time.monotonic() - start
+            elapsed = time.monotonic() - start
+            if elapsed + delay > timeout:
+                return False, elapsed
+            if cancel.wait(delay):
+                return None, time.monotonic() - start
+            delay = min(delay * 1.5, 2.0)
+    
+    @staticmethod
+    def run_operation(service_name, action, timeout=30):
+        """Ejecuta la operación y devuelve (éxito, mensaje de error)"""
+        return ServiceValidator.run_bulk([service_name], action, timeout)[service_name]
+    
+    @staticmethod
+    def run_bulk(service_names, action, timeout=30):
+        """Ejecuta la acción con una llamada por backend, los backends en paralelo"""
+        results = {name: (False, "Backend desconocido") for name in service_names}
+        groups = ServiceValidator.group_by_backend(service_names)
+        
+        def run_group(backend, services):
+            try:
+                return backend.run(action, services, timeout)
+            except Exception as e:
+                return {s["service"]: (False, str(e)) for s in services}
+        
+        with ThreadPoolExecutor(max_workers=max(len(groups), 1)) as executor:
+            futures = [executor.submit(run_group, backend, services) for backend, services in groups.items()]
+            for future in futures:
+                results.update(future.result())
+        
+        for name, (success, error_msg) in results.items():
+            if success:
+                logging.info(f"Operación {action} exitosa para {name}")
+            else:
+                logging.error(f"Error en {action} de {name}: {error_msg}")
+        return results
+
+class OperationQueue:
+    """Cola central de operaciones: en serie para cada servicio, en paralelo entre servicios
+    
+    Cada servicio tiene como mucho una operación en curso y una pendiente. Una petición nueva
+    reemplaza a la pendiente (start → stop → start queda en un solo start) y, si contradice a la
+    que está en curso, deja de esperar su confirmación para pasar cuanto antes a la nueva. Las
+    peticiones que llegan juntas y encuentran su servicio libre van en una llamada por backend.
+    El comando en sí no se interrumpe: cancelar corta la espera de disponibilidad y descarta lo pendiente.
+    """
+    
+    SUPERSEDED = "Reemplazada por una petición posterior"
+    CANCELLED = "Cancelada"
+    
+    def __init__(self, run_batch=None, wait_ready=None, group_key=None, max_workers=32):
+        self.run_batch = run_batch or ServiceValidator.run_bulk  # (servicios, acción) -> {servicio: (éxito, error)}
+        self.wait_ready = wait_ready or ServiceValidator.wait_ready  # (servicio, acción, cancel) -> (listo, segundos)
+        self.group_key = group_key or ServiceValidator.backend_name
+        self.executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="operations")
+        self.listeners = []  # (servicios, acción) por cada petición, p. ej. Reconciler.record
+        self._units = {}  # servicio -> operación en curso y pendiente (ver submit)
+        self._lock = threading.Lock()
+    
+    def is_busy(self, service_name):
+        with self._lock:
+            return service_name in self._units
+    
+    def submit(self, service_names, action, on_progress=None):
+        """Encola la acción sin bloquear; devuelve {servicio: Future con (éxito, error, segundos)}
+        
+        on_progress(servicio, acción, fase, segundos) se llama desde hilos con las fases
+        running, waiting, done, failed y cancelled de la operación que resuelve cada Future.
+        """
+        for listener in self.listeners:
+            listener(service_names, action)
+        futures, launch, dropped = {}, [], []
+        with self._lock:
+            for name in service_names:
+                future = Future()
+                futures[name] = future
+                waiter = (future, on_progress)
+                unit = self._units.get(name)
+                if unit is None:
+                    self._units[name] = {
+                        "action": action, "waiters": [waiter], "cancel": threading.Event(), "cancelled": False,
+                        "pending": None, "pending_waiters": [],
+                    }
+                    launch.append(name)
+                elif action == unit["action"]:
+                    # Se vuelve a pedir lo que ya está en curso: lo pendiente sobra y se sigue esperando
+                    dropped.append((name, unit["pending"], unit["pending_waiters"]))
+                    unit.update(pending=None, pending_waiters=[], cancelled=False)
+                    unit["waiters"].append(waiter)
+                    unit["cancel"].clear()
+                elif action == unit["pending"]:
+                    unit["pending_waiters"].append(waiter)
+                else:
+                    dropped.append((name, unit["pending"], unit["pending_waiters"]))
+                    unit.update(pending=action, pending_waiters=[waiter])
+                    unit["cancel"].set()  # La confirmación de la operación en curso ya no interesa
+        self._drop(dropped, self.SUPERSEDED)
+        self._launch(launch, action)
+        return futures
+    
+    def run(self, service_names, action, on_progress=None):
+        """Como submit pero bloquea hasta que terminan todas; devuelve {servicio: (éxito, error, segundos)}"""
+        futures = self.submit(service_names, action, on_progress)
+        return {name: future.result() for name, future in futures.items()}
+    
+    def cancel(self, service_names=None):
+        """Descarta lo pendiente y corta la espera de lo que está en curso (todos si no se indican)"""
+        dropped = []
+        with self._lock:
+            for name, unit in self._units.items():
+                if service_names is not None and name not in service_names:
+                    continue
+                dropped.append((name, unit["pending"], unit["pending_waiters"]))
+                unit.update(pending=None, pending_waiters=[], cancelled=True)
+                unit["cancel"].set()
+        self._drop(dropped, self.CANCELLED)
+    
+    def _drop(self, dropped, reason):
+        """Resuelve las peticiones pendientes que ya no se van a ejecutar"""
+        for name, action, waiters in dropped:
+            self._notify(waiters, name, action, "cancelled", 0.0)
+            for future, _ in waiters:
+                future.set_result((False, reason, 0.0))
+    
+    def _notify(self, waiters, name, action, phase, elapsed=None):
+        for _, on_progress in waiters:
+            if on_progress:
+                on_progress(name, action, phase, elapsed)
+    
+    def _waiters(self, name):
+        with self._lock:
+            return list(self._units[name]["waiters"])
+    
+    def _launch(self, names, action):
+        groups = {}
+        for name in names:
+            groups.setdefault(self.group_key(name), []).append(name)
+        for group in groups.values():
+            for name in group:
+                self._notify(self._waiters(name), name, action, "running")
+            self.executor.submit(self._execute, group, action)
+    
+    def _execute(self, group, action):
+        start = time.monotonic()
+        for name in group:
+            TRACER.begin(name, action)
+        try:
+            batch = self.run_batch(group, action)
+        except Exception as e:
+            batch = {name: (False, str(e)) for name in group}
+        elapsed = time.monotonic() - start
+        for name in group:
+            success, error_msg = batch.get(name, (False, "Sin respuesta del backend"))
+            TRACER.executed(name, success, error_msg)
+            if success:
+                self._notify(self._waiters(name), name, action, "waiting")
+                self.executor.submit(self._settle, name, action, start)
+            else:
+                self._finish(name, action, (False, error_msg, elapsed))
+    
+    def _settle(self, name, action, start):
+        """Espera a que el servicio responda; si se vuelve a pedir lo mismo tras cancelar, se sigue esperando"""
+        with self._lock:
+            cancel = self._units[name]["cancel"]
+        while True:
+            try:
+                ready, waited = self.wait_ready(name, action, cancel)
+            except Exception as e:
+                logging.error(f"Error esperando a {name}: {e}")
+                ready, waited = False, time.monotonic() - start
+            if ready is not None:
+                break
+            with self._lock:
+                unit = self._units[name]
+                if unit["pending"] is not None or unit["cancelled"]:
+                    reason = unit["cancelled"] and self.CANCELLED or self.SUPERSEDED
+                    break
+                cancel.clear()
+        elapsed = time.monotonic() - start
+        if ready is None:
+            TRACER.discard(name)
+            self._finish(name, action, (False, reason, elapsed))
+            return
+        TRACER.confirmed(name, ready)
+        self._finish(name, action, (ready, None if ready else f"No respondió en {waited:.0f} s", elapsed))
+    
+    def _finish(self, name, action, result):
+        """Entrega el resultado y pasa a la petición pendiente del servicio, si la hay"""
+        with self._lock:
+            unit = self._units[name]
+            waiters = unit["waiters"]
+            next_action = unit["pending"]
+            if next_action is None:
+                del self._units[name]
+            else:
+                unit.update(
+                    action=next_action, waiters=unit["pending_waiters"], cancel=threading.Event(), cancelled=False,
+                    pending=None, pending_waiters=[],
+                )
+        success, error_msg, elapsed = result
+        if success:
+            phase = "done"
+        elif error_msg in (self.SUPERSEDED, self.CANCELLED):
+            phase = "cancelled"
+        else:
+            phase = "failed"
+        self._notify(waiters, name, action, phase, elapsed)
+        for future, _ in waiters:
+            future.set_result(result)
+        if next_action is not None:
+            self._launch([name], next_action)
+
+OPERATIONS = OperationQueue()
+
+class ServiceOrchestrator:
+    """Inicia o detiene servicios en paralelo respetando las dependencias de SERVICES_CONFIG"""
+    
+    def __init__(self, services_config, run_batch=None, on_progress=None, group_key=None, wait_ready=None, queue=None):
+        self.requires = {s["service"]: list(s.get("requires", [])) for s in services_config}
+        self.on_progress = on_progress  # (servicio, acción, fase, segundos); se llama desde hilos
+        if queue is None and (run_batch or group_key or wait_ready):
+            queue = OperationQueue(run_batch, wait_ready, group_key)  # Backend propio (p. ej. simulado)
+        self.queue = queue or OPERATIONS  # Compartida con los switches de cada fila: en serie por servicio
+    
+    def plan(self, service_names, action):
+        """Devuelve {servicio: servicios que deben terminar antes} para la acción indicada"""
+        selected = set(service_names)
+        after = {name: set() for name in service_names}
+        for name in service_names:
+            for dependency in self.requires.get(name, []):
+                if dependency not in selected:
+                    continue  # Dependencia no instalada o no seleccionada
+                if action == "stop":
+                    after[dependency].add(name)  # Al detener, primero los que dependen
+                else:
+                    after[name].add(dependency)
+        
+        # Detectar ciclos antes de lanzar nada
+        visiting, done = set(), set()
+        def visit(name, chain):
+            if name in done:
+                return
+            if name in visiting:
+                raise ValueError(f"Dependencias circulares: {' -> '.join(chain + [name])}")
+            visiting.add(name)
+            for previous in after[name]:
+                visit(previous, chain + [name])
+            visiting.discard(name)
+            done.add(name)
+        for name in service_names:
+            visit(name, [])
+        return after
+    
+    def profile_diff(self, profile, statuses):
+        """Cambios mínimos para pasar al perfil: (a detener, a iniciar) según los estados actuales
+        
+        El perfil se completa con sus dependencias, así que nada de lo que se detiene hace falta
+        para lo que se inicia y ambas listas pueden ejecutarse a la vez.
+        """
+        wanted, pending = set(), list(profile)
+        while pending:
+            name = pending.pop()
+            if name not in wanted:
+                wanted.add(name)
+                pending += self.requires.get(name, [])
+        installed = [name for name in self.requires if name in statuses and statuses[name] != "not-found"]
+        to_stop = [name for name in installed if name not in wanted and statuses[name] == "active"]
+        to_start = [name for name in installed if name in wanted and statuses[name] != "active"]
+        return to_stop, to_start
+    
+    def run_many(self, actions):
+        """Ejecuta {acción: servicios} a la vez (p. ej. detener y arrancar al cambiar de perfil)"""
+        results = {}
+        errors = []
+        
+        def run_action(action, service_names):
+            try:
+                results.update(self.run(service_names, action))
+            except ValueError as e:
+                errors.append(e)
+        
+        threads = [
+            threading.Thread(target=run_action, args=(action, names), name=f"orchestrator-{action}")
+            for action, names in actions.items() if names
+        ]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        if errors:
+            raise errors[0]
+        return results
+    
+    def run(self, service_names, action):
+        """Ejecuta la acción y devuelve {servicio: (éxito, error, segundos)}; bloquea hasta terminar
+        
+        Un servicio cuenta como terminado cuando wait_ready lo confirma, no cuando vuelve el comando.
+        Si otra petición lo reemplaza en la cola (p. ej. un switch) cuenta como fallido.
+        """
+        after = self.plan(service_names, action)
+        results = {}
+        lock = threading.Lock()
+        finished = threading.Event()
+        
+        if not service_names:
+            return results
+        
+        def progress(name, phase, elapsed=None):
+            if self.on_progress:
+                self.on_progress(name, action, phase, elapsed)
+        
+        def launch(names):
+            # Los que quedan listos a la vez entran juntos: la cola hace una llamada por backend
+            if not names:
+                return
+            for name, future in self.queue.submit(names, action, self.on_progress).items():
+                future.add_done_callback(lambda future, name=name: launch(complete(name, future.result())))
+        
+        def complete(name, result):
+            """Registra el resultado y devuelve los servicios cuyas dependencias ya terminaron"""
+            ready, skipped = [], []
+            with lock:
+                results[name] = result
+                for other, previous in after.items():
+                    if other in results or name not in previous:
+                        continue
+                    if not result[0]:
+                        # Se omiten los que dependían de un fallo
+                        results[other] = (False, f"Dependencia {name} falló", 0.0)
+                        skipped.append(other)
+                    elif all(p in results and results[p][0] for p in previous):
+                        ready.append(other)
+                all_done = len(results) == len(after)
+            for other in skipped:
+                progress(other, "skipped", 0.0)
+                ready += complete(other, results[other])
+            if all_done:
+                finished.set()
+            return ready
+        
+        for name in service_names:
+            progress(name, "pending")
+        launch([name for name in service_names if not after[name]])
+        
+        finished.wait()
+        return results
+
+class ResourceMonitor:
+    """Memoria, CPU y E/S de cada servicio leídos de su cgroup o de /proc/<pid>, sin lanzar procesos
+    
+    sample() lee una vez los archivos de todos los servicios pedidos y calcula las tasas respecto a la
+    lectura anterior; history() guarda las últimas HISTORY muestras de CPU para el minigráfico.
+    """
+    
+    CGROUP_ROOT = "/sys/fs/cgroup"
+    HISTORY = 20
+    SPARK = "▁▂▃▄▅▆▇█"
+    CLOCK_TICKS = os.sysconf("SC_CLK_TCK")
+    PAGE_SIZE = os.sysconf("SC_PAGE_SIZE")
+    
+    def __init__(self):
+        self._previous = {}  # servicio -> (instante, segundos de CPU, bytes de E/S)
+        self._history = {}   # servicio -> deque de % de CPU
+        self._lock = threading.Lock()
+    
+    def sample(self, service_names):
+        """Devuelve {servicio: {"memory": bytes, "cpu": %, "io": bytes/s}}; cpu/io son None en la primera lectura"""
+        samples = {}
+        now = time.monotonic()
+        for backend, services in ServiceValidator.group_by_backend(service_names).items():
+            try:
+                targets = backend.resource_targets(services)
+            except Exception as e:
+                logging.error(f"Error localizando procesos de {backend.name}: {e}")
+                continue
+            for name, (kind, target) in targets.items():
+                counters = self.read_cgroup(target) if kind == "cgroup" else self.read_pids(target)
+                if counters is not None:
+                    samples[name] = self._rates(name, now, *counters)
+        return samples
+    
+    def _rates(self, name, now, memory, cpu_seconds, io_bytes):
+        """Convierte los contadores acumulados en tasas y los guarda para la próxima lectura"""
+        with self._lock:
+            previous = self._previous.get(name)
+            self._previous[name] = (now, cpu_seconds, io_bytes)
+            sample = {"memory": memory, "cpu": None, "io": None}
+            if previous is None or now <= previous[0]:
+                return sample
+            elapsed = now - previous[0]
+            sample["cpu"] = max(cpu_seconds - previous[1], 0.0) / elapsed * 100
+            if io_bytes is not None and previous[2] is not None:
+                sample["io"] = max(io_bytes - previous[2], 0) / elapsed
+            history = self._history.setdefault(name, collections.deque(maxlen=self.HISTORY))
+            history.append(sample["cpu"])
+            return sample
+    
+    def history(self, name):
+        with self._lock:
+            return list(self._history.get(name, ()))
+    
+    def forget(self, name):
+        """Descarta contadores e historial (el servicio se detuvo)"""
+        with self._lock:
+            self._previous.pop(name, None)
+            self._history.pop(name, None)
+    
+    @classmethod
+    def read_cgroup(cls, path):
+        """(bytes de memoria, segundos de CPU, bytes de E/S) del cgroup v2, o None si no existe"""
+        try:
+            with open(os.path.join(path, "memory.current")) as f:
+                memory = int(f.read())
+            with open(os.path.join(path, "cpu.stat")) as f:
+                cpu_usec = next((int(line.split()[1]) for line in f if line.startswith("usage_usec ")), 0)
+        except (OSError, ValueError):
+            return None
+        io_bytes = None
+        try:
+            with open(os.path.join(path, "io.stat")) as f:
+                # "8:0 rbytes=... wbytes=... rios=... wios=..." por dispositivo
+                io_bytes = sum(
+                    int(value)
+                    for line in f
+                    for key, _, value in (field.partition("=") for field in line.split()[1:])
+                    if key in ("rbytes", "wbytes")
+                )
+        except (OSError, ValueError):
+            pass  # Sin el controlador io habilitado
+        return memory, cpu_usec / 1e6, io_bytes
+    
+    @classmethod
+    def read_pids(cls, pids):
+        """Suma de RSS, CPU y E/S de los procesos indicados, o None si ya no existe ninguno"""
+        memory, cpu_seconds, io_bytes, found = 0, 0.0, 0, False
+        for pid in pids:
+            try:
+                with open(f"/proc/{pid}/stat") as f:
+                    # El nombre del proceso puede llevar espacios: los campos se cuentan desde el ')'
+                    fields = f.read().rpartition(")")[2].split()
+            except OSError:
+                continue
+            found = True
+            cpu_seconds += (int(fields[11]) + int(fields[12])) / cls.CLOCK_TICKS  # utime + stime
+            memory += int(fields[21]) * cls.PAGE_SIZE  # rss en páginas
+            if io_bytes is None:
+                continue
+            try:
+                with open(f"/proc/{pid}/io") as f:
+                    io = dict(line.split(": ") for line in f.read().splitlines())
+                io_bytes += int(io["read_bytes"]) + int(io["write_bytes"])
+            except (OSError, KeyError, ValueError):
+                io_bytes = None  # Procesos de otro usuario: sin E/S
+        return found and (memory, cpu_seconds, io_bytes) or None
+    
+    @classmethod
+    def sparkline(cls, values):
+        """Minigráfico de texto escalado al máximo de la serie"""
+        top = max(values, default=0) or 1
+        return "".join(cls.SPARK[min(int(value / top * (len(cls.SPARK) - 1)), len(cls.SPARK) - 1)] for value in values)
+    
+    @staticmethod
+    def format_bytes(value):
+        for unit in ("B", "KB", "MB", "GB"):
+            if value < 1024 or unit == "GB":
+                return unit == "B" and f"{value:.0f} {unit}" or f"{value:.1f} {unit}"
+            value /= 1024
+
+class BootAnalyzer:
+    """Cuánto añadiría cada servicio al arranque del sistema, según systemd-analyze
+    
+    blame da lo que tardó cada unidad en iniciarse; critical-chain dice si además está en la ruta
+    crítica del target por defecto (ahí su tiempo retrasa el arranque entero). Para los servicios
+    que systemd no conoce (PM2, procesos) se estima con las trazas de start del panel.
+    """
+    
+    STARTUP_PHASES = ("execution", "confirmation")  # Fases de OperationTracer que cuestan al servicio
+    ONDEMAND_SECONDS = 1.0  # A partir de aquí se sugiere dejarlo bajo demanda
+    TIMESPAN_UNITS = {"d": 86400, "h": 3600, "min": 60, "s": 1, "ms": 1e-3, "us": 1e-6, "µs": 1e-6}
+    
+    @classmethod
+    def parse_timespan(cls, text):
+        """'1min 2.345s', '345ms' o '2h 3min' -> segundos (None si no es un intervalo)"""
+        total = 0.0
+        parts = text.split()
+        if not parts:
+            return None
+        for part in parts:
+            number = part.rstrip("abcdefghijklmnopqrstuvwxyzµ")
+            unit = part[len(number):]
+            if not number or unit not in cls.TIMESPAN_UNITS:
+                return None
+            try:
+                total += float(number) * cls.TIMESPAN_UNITS[unit]
+            except ValueError:
+                return None
+        return total
+    
+    @classmethod
+    def parse_blame(cls, output):
+        """Salida de 'systemd-analyze blame' -> {unidad: segundos}"""
+        units = {}
+        for line in output.splitlines():
+            timespan, _, unit = line.strip().rpartition(" ")
+            seconds = cls.parse_timespan(timespan)
+            if unit and seconds is not None:
+                units[unit] = seconds
+        return units
+    
+    @classmethod
+    def parse_critical_chain(cls, output):
+        """Salida de 'systemd-analyze critical-chain' -> {unidad: {"at": s, "took": s}}
+        
+        Cada línea es '└─docker.service @8.123s +4.220s'; "+" solo aparece en las unidades que
+        tardaron en iniciarse y las cabeceras explicativas no llevan "@".
+        """
+        chain = {}
+        for line in output.splitlines():
+            fields = line.lstrip(" │├└─").split()
+            if len(fields) < 2 or not fields[1].startswith("@"):
+                continue
+            at, _, took = " ".join(fields[1:]).partition(" +")
+            chain.setdefault(fields[0], {
+                "at": cls.parse_timespan(at[1:]),
+                "took": took and cls.parse_timespan(took) or 0.0,
+            })
+        return chain
+    
+    @staticmethod
+    def parse_is_enabled(output, units):
+        """'systemctl is-enabled' imprime una línea por unidad en el orden pedido"""
+        lines = output.splitlines()
+        if len(lines) != len(units):
+            return {}
+        return dict(zip(units, (line.strip() for line in lines)))
+    
+    @staticmethod
+    def _systemd(cmd):
+        try:
+            return run_process(cmd, capture_output=True, text=True, timeout=15).stdout
+        except Exception as e:
+            logging.error(f"Error ejecutando {' '.join(cmd)}: {e}")
+            return ""
+    
+    def analyze(self, service_names):
+        """Lista de {"service", "seconds", "critical", "enabled", "source", "suggestion"}"""
+        systemd = [name for name in service_names if ServiceValidator.backend_name(name) == "systemd"]
+        units = [name + ".service" for name in systemd]
+        blame, chain, enabled = {}, {}, {}
+        if units:
+            blame = self.parse_blame(self._systemd(["systemd-analyze", "blame", "--no-pager"]))
+            chain = self.parse_critical_chain(self._systemd(["systemd-analyze", "critical-chain", "--no-pager"]))
+            enabled = self.parse_is_enabled(self._systemd(["systemctl", "is-enabled"] + units), units)
+        traces = TRACER.load()
+        
+        report = []
+        for name in service_names:
+            unit = name + ".service"
+            entry = {"service": name, "seconds": None, "critical": unit in chain, "enabled": enabled.get(unit), "source": None}
+            if unit in blame:
+                entry["seconds"], entry["source"] = blame[unit], "blame"
+            elif unit in chain and chain[unit]["took"]:
+                entry["seconds"], entry["source"] = chain[unit]["took"], "critical-chain"
+            else:
+                # Sin datos de systemd (no arrancó desde el inicio o no es una unidad): trazas del panel.
+                # "authorization" es lo que tarda el usuario en escribir la contraseña, no el servicio
+                phases = traces.get(f"{name}/start", {}).get("phases", {})
+                counted = [phases[p] for p in self.STARTUP_PHASES if phases.get(p, {}).get("count")]
+                if counted:
+                    entry["seconds"] = sum(h["sum"] / h["count"] for h in counted)
+                    entry["source"] = "panel"
+            entry["suggestion"] = self.suggest(entry)
+            report.append(entry)
+        return report
+    
+    @classmethod
+    def suggest(cls, entry):
+        if entry["seconds"] is None:
+            return "sin datos"
+        if entry["critical"] or entry["seconds"] >= cls.ONDEMAND_SECONDS:
+            return entry["enabled"] == "enabled" and "deshabilitar y usar bajo demanda" or "mantener bajo demanda"
+        return "puede arrancar con el sistema"
+
+ACTIVITY_PROBES = {}
+
+def register_activity(kind):
+    """Registra una sonda de actividad para la clave "kind" de "idle": {"activity": ...}"""
+    def decorator(probe):
+        ACTIVITY_PROBES[kind] = probe
+        return probe
+    return decorator
+
+class ActivitySnapshot:
+    """Lo que leen las sondas de actividad en una pasada; cada archivo se lee como mucho una vez"""
+    
+    TCP_ESTABLISHED = "01"
+    UNIX_CONNECTED = "03"
+    
+    def __init__(self, samples):
+        self.samples = samples  # {servicio: muestra de ResourceMonitor}
+        self._tcp = None
+        self._unix = None
+    
+    def tcp_clients(self):
+        """{puerto local: conexiones establecidas} de /proc/net/tcp y tcp6"""
+        if self._tcp is None:
+            self._tcp = collections.Counter()
+            for path in ("/proc/net/tcp", "/proc/net/tcp6"):
+                try:
+                    with open(path) as f:
+                        next(f)  # Cabecera
+                        for line in f:
+                            fields = line.split()
+                            if len(fields) > 3 and fields[3] == self.TCP_ESTABLISHED:
+                                self._tcp[int(fields[1].rpartition(":")[2], 16)] += 1
+                except (OSError, StopIteration, ValueError):
+                    continue
+        return self._tcp
+    
+    def unix_clients(self):
+        """{ruta: conexiones} de /proc/net/unix (los sockets aceptados heredan la ruta del servidor)"""
+        if self._unix is None:
+            self._unix = collections.Counter()
+            try:
+                with open("/proc/net/unix") as f:
+                    next(f)
+                    for line in f:
+                        fields = line.split()
+                        if len(fields) > 7 and fields[5] == self.UNIX_CONNECTED:
+                            self._unix[fields[7]] += 1
+            except (OSError, StopIteration):
+                pass
+        return self._unix
+
+@register_activity("connections")
+def activity_connections(value, service, snapshot):
+    """Hay clientes conectados al puerto"""
+    return snapshot.tcp_clients()[probe_address(value)[1]] > 0
+
+@register_activity("unix")
+def activity_unix(value, service, snapshot):
+    """Hay clientes conectados al socket Unix"""
+    return snapshot.unix_clients()[value] > 0
+
+# Dónde crea Docker el cgroup de cada contenedor: (directorio bajo CGROUP_ROOT, nombre del contenedor).
+# El driver "systemd" usa system.slice/docker-<id>.scope y "cgroupfs" docker/<id>; en cgroups v1
+# cuelgan del controlador (memory/...)
+CONTAINER_CGROUPS = (
+    ("system.slice", lambda name: name.startswith("docker-") and name.endswith(".scope")),
+    ("docker", lambda name: len(name) == 64),
+    ("memory/system.slice", lambda name: name.startswith("docker-") and name.endswith(".scope")),
+    ("memory/docker", lambda name: len(name) == 64),
+)
+
+@register_activity("containers")
+def activity_containers(value, service, snapshot):
+    """Algún contenedor corriendo, con cualquiera de los drivers de cgroups (ver CONTAINER_CGROUPS)"""
+    readable = False
+    for directory, is_container in CONTAINER_CGROUPS:
+        try:
+            entries = os.listdir(os.path.join(ResourceMonitor.CGROUP_ROOT, directory))
+        except OSError:
+            continue
+        readable = True
+        if any(is_container(entry) for entry in entries):
+            return True
+    return not readable  # Sin forma de saberlo: cuenta como activo y no se detiene
+
+@register_activity("cpu")
+def activity_cpu(value, service, snapshot):
+    """El servicio usó más del % de CPU indicado desde la revisión anterior"""
+    sample = snapshot.samples.get(service)
+    return sample is None or sample["cpu"] is None or sample["cpu"] >= value
+
+class IdleMonitor:
+    """Detiene en segundo plano los servicios con política "idle" que llevan demasiado sin actividad
+    
+    Cada CHECK_SECONDS consulta el estado de esos servicios y corre sus sondas de actividad (lecturas
+    de /proc y del cgroup, sin procesos). El reloj de inactividad empieza cuando se ve el servicio
+    activo y se reinicia con cualquier actividad; cada parada queda en el log con la memoria liberada.
+    """
+    
+    CHECK_SECONDS = 60
+    
+    def __init__(self, services_config, on_stop=None, is_busy=None):
+        self.policies = {s["service"]: s["idle"] for s in services_config if s.get("idle")}
+        self.on_stop = on_stop    # (servicio, bytes liberados); se llama desde el hilo del monitor
+        self.is_busy = is_busy    # () -> servicios con una operación en curso (no se tocan)
+        self.resources = ResourceMonitor()
+        self.last_activity = {}   # servicio -> instante de la última actividad observada
+        self._stopped = threading.Event()
+        self._thread = None
+    
+    def set_services(self, services_config):
+        """Nuevas políticas tras recargar la configuración; el hilo se lanza si antes no hacía falta"""
+        self.policies = {s["service"]: s["idle"] for s in services_config if s.get("idle")}
+        self.start()
+    
+    def start(self):
+        """Lanza el hilo solo si algún servicio tiene política de inactividad"""
+        if self.policies and self._thread is None:
+            self._thread = threading.Thread(target=self._run, name="idle-monitor")
+            self._thread.daemon = True
+            self._thread.start()
+    
+    def stop(self):
+        self._stopped.set()
+    
+    def _run(self):
+        while not self._stopped.wait(self.CHECK_SECONDS):
+            COUNTERS.add_wakeup()
+            try:
+                self.check()
+            except Exception as e:
+                logging.error(f"Error revisando servicios inactivos: {e}")
+    
+    def check(self, now=None):
+        """Una revisión: devuelve los servicios detenidos por inactividad"""
+        now = time.monotonic() if now is None else now
+        busy = set(self.is_busy() if self.is_busy else ())
+        policies = self.policies  # set_services puede reemplazarlas desde otro hilo
+        names = [name for name in policies if name not in busy and not OPERATIONS.is_busy(name)]
+        statuses = ServiceValidator.get_services_status(names)
+        active = [name for name in names if statuses.get(name) == "active"]
+        for name in names:
+            if name not in active:
+                self.last_activity.pop(name, None)
+                self.resources.forget(name)
+        
+        snapshot = ActivitySnapshot(self.resources.sample(active))
+        idle = []
+        for name in active:
+            if name not in self.last_activity or self.is_active(name, snapshot):
+                self.last_activity[name] = now
+            elif now - self.last_activity[name] >= policies[name].get("minutes", 30) * 60:
+                idle.append(name)
+        
+        for name in idle:
+            self.stop_idle(name, snapshot.samples.get(name), now)
+        return idle
+    
+    def is_active(self, name, snapshot):
+        """Alguna sonda ve actividad (una sonda desconocida cuenta como actividad, por prudencia)"""
+        policy = self.policies.get(name)
+        if policy is None:
+            return True  # Quitado de la configuración mientras se revisaba: no se toca
+        for kind, value in policy.get("activity", {}).items():
+            probe = ACTIVITY_PROBES.get(kind)
+            if probe is None:
+                logging.error(f"Sonda de actividad desconocida para {name}: {kind}")
+                return True
+            try:
+                if probe(value, name, snapshot):
+                    return True
+            except (OSError, ValueError) as e:
+                logging.warning(f"Sonda de actividad {kind} de {name} falló: {e}")
+                return True
+        return False
+    
+    def stop_idle(self, name, sample, now):
+        minutes = (now - self.last_activity.pop(name)) / 60
+        reclaimed = sample and sample["memory"] or 0
+        success, error_msg, seconds = OPERATIONS.run([name], "stop")[name]
+        if not success:
+            logging.error(f"No se pudo detener {name} por inactividad: {error_msg}")
+            return
+        self.resources.forget(name)
+        log_event(
+            "idle-stop",
+            f"Detenido por inactividad: {name} tras {minutes:.0f} min sin uso, "
+            f"{ResourceMonitor.format_bytes(reclaimed)} liberados",
+            service=name, idle_minutes=round(minutes, 1), reclaimed_bytes=reclaimed
+        )
+        if self.on_stop:
+            self.on_stop(name, reclaimed)
+
+class Reconciler:
+    """Mantiene los servicios en el último estado pedido (switches, lotes, perfiles, paradas por inactividad)
+    
+    Cada petición de la cola de operaciones fija el estado deseado del servicio. Con el modo activado,
+    observe() compara con él los estados que ya llegan (D-Bus, PM2, broker o sondeo), sin sondear por su
+    cuenta: lo que debía estar activo y cayó (DOWN) se reinicia con backoff (BACKOFF_BASE·2^n hasta
+    BACKOFF_MAX) y como mucho BURST veces en BURST_WINDOW segundos. Después se abandona hasta que el
+    servicio pase STABLE_SECONDS activo o se pida iniciarlo a mano. Lo que está activo sin pedirlo solo
+    se avisa; un estado que no se pudo consultar ("error", "unknown") o en transición no cuenta como caída.
+    El estado deseado se guarda en state_dir() y lo comparten la ventana y 'dragwaysk-panel reconcile'.
+    """
+    
+    BACKOFF_BASE = 5
+    BACKOFF_MAX = 300
+    BURST = 5
+    BURST_WINDOW = 600
+    STABLE_SECONDS = 120  # Activo este tiempo: se olvidan los reinicios anteriores y el abandono
+    DOWN = ("failed", "inactive")
+    
+    def __init__(self, queue=None, on_drift=None, on_progress=None, path=None):
+        self.queue = queue or OPERATIONS
+        self.on_drift = on_drift  # (servicio, deseado, real, qué se hizo); se llama desde hilos
+        self.on_progress = on_progress  # Avance de los reinicios, como en OperationQueue.submit
+        self.path = path  # None: $XDG_STATE_HOME/dragwaysk-panel/desired-state.json
+        self.enabled = False
+        self.desired = {}    # servicio -> "active" o "inactive"
+        self.restarts = {}   # servicio -> deque con los instantes de sus reinicios recientes
+        self.retry_at = {}   # servicio -> instante en que se vuelve a comprobar
+        self.active_since = {}  # servicio -> instante en que se lo vio activo (para STABLE_SECONDS)
+        self.gave_up = set()    # Servicios abandonados tras BURST reinicios
+        self.reported = {}   # servicio -> última desviación avisada (un aviso por cambio)
+        self._restarting = set()
+        self._mtime = None
+        self._lock = threading.Lock()
+        self.enabled = bool(self.load().get("enabled"))
+    
+    def attach(self):
+        """Escucha las peticiones de la cola para seguir el estado deseado"""
+        self.queue.listeners.append(self.record)
+        return self
+    
+    def get_path(self):
+        return self.path or os.path.join(state_dir(), "desired-state.json")
+    
+    def load(self):
+        """Relee el estado deseado si otro proceso lo cambió (p. ej. 'dragwaysk-panel up')"""
+        path = self.get_path()
+        try:
+            mtime = os.stat(path).st_mtime_ns
+            if mtime == self._mtime:
+                return {}
+            with open(path) as f:
+                data = json.load(f)
+        except (OSError, ValueError):
+            return {}
+        with self._lock:
+            self._mtime = mtime
+            self.desired = dict(data.get("desired", {}))
+        return data
+    
+    def save(self):
+        path = self.get_path()
+        with self._lock:
+            data = {"enabled": self.enabled, "desired": dict(self.desired)}
+        try:
+            with open(path + ".tmp", "w") as f:
+                json.dump(data, f, indent=1)
+            os.replace(path + ".tmp", path)
+            self._mtime = os.stat(path).st_mtime_ns
+        except OSError as e:
+            logging.error(f"No se pudo guardar el estado deseado: {e}")
+    
+    def set_enabled(self, enabled):
+        with self._lock:
+            self.enabled = enabled
+            self.retry_at.clear()
+            self.reported.clear()
+        self.save()
+    
+    def record(self, service_names, action):
+        """Escucha de la cola: una petición que no viene del reconciliador fija el estado deseado"""
+        state = OperationTrace.DESIRED.get(action)
+        if state is None:
+            return
+        with self._lock:
+            for name in service_names:
+                self.desired[name] = state
+                if name not in self._restarting:
+                    # Pedido a mano: se vuelve a empezar el backoff y el límite de reinicios
+                    self.restarts.pop(name, None)
+                    self.retry_at.pop(name, None)
+                    self.reported.pop(name, None)
+                    self.gave_up.discard(name)
+        self.save()
+    
+    def observe(self, statuses, now=None):
+        """Compara los estados recibidos con los deseados; devuelve los servicios que reinicia
+        
+        enabled es el modo de la ventana (guardado con el estado deseado); quien llama decide si observar.
+        """
+        now = time.monotonic() if now is None else now
+        self.load()
+        restart, drifts = [], []
+        with self._lock:
+            for name, actual in statuses.items():
+                wanted = self.desired.get(name)
+                if wanted is None or actual in (None, "not-found"):
+                    self.retry_at.pop(name, None)
+                    continue
+                if actual == "active":
+                    self.active_since.setdefault(name, now)
+                    since = None
+                elif actual in ("error", "unknown"):
+                    since = None  # Sin dato: no se sabe si sigue activo
+                else:
+                    since = self.active_since.pop(name, None)
+                if self.queue.is_busy(name):
+                    if name in self.retry_at:
+                        self.retry_at[name] = now + self.BACKOFF_BASE  # Se revisa cuando termine
+                    continue
+                if actual == wanted or (wanted == "inactive" and actual != "active"):
+                    self.retry_at.pop(name, None)
+                    self.reported.pop(name, None)
+                    continue
+                if wanted == "inactive":
+                    drifts.append((name, wanted, actual, "drift"))  # Lo inició otro: solo se avisa
+                    continue
+                if actual not in self.DOWN:
+                    # Consulta fallida o en transición: no es una caída, se revisa más tarde
+                    if name in self.retry_at:
+                        self.retry_at[name] = now + self.BACKOFF_BASE
+                    continue
+                if since is not None and now - since >= self.STABLE_SECONDS:
+                    # Estuvo estable: la caída empieza un historial nuevo
+                    self.restarts.pop(name, None)
+                    self.gave_up.discard(name)
+                what, wait = self._next_restart(name, now)
+                if what == "restart":
+                    restart.append(name)
+                    self._restarting.add(name)
+                    self.retry_at[name] = now + wait  # Si el reinicio no cambia el estado, se revisa entonces
+                elif what == "backoff":
+                    self.retry_at[name] = now + wait
+                else:
+                    self.retry_at.pop(name, None)
+                drifts.append((name, wanted, actual, what))
+            drifts = [d for d in drifts if d[3] == "restart" or self.reported.get(d[0]) != d[2:]]
+            for name, wanted, actual, what in drifts:
+                self.reported[name] = (actual, what)
+        
+        for name, wanted, actual, what in drifts:
+            self._report(name, wanted, actual, what)
+        if restart:
+            try:
+                self.queue.submit(restart, "start", self.on_progress)
+            finally:
+                with self._lock:
+                    self._restarting.difference_update(restart)
+        return restart
+    
+    def _next_restart(self, name, now):
+        """("restart" | "backoff" | "gave-up", segundos hasta la próxima revisión)"""
+        if name in self.gave_up:
+            return "gave-up", None
+        recent = self.restarts.setdefault(name, collections.deque())
+        while recent and now - recent[0] > self.BURST_WINDOW:
+            recent.popleft()
+        if len(recent) >= self.BURST:
+            self.gave_up.add(name)
+            return "gave-up", None
+        wait = recent and min(self.BACKOFF_BASE * 2 ** (len(recent) - 1), self.BACKOFF_MAX) or 0
+        if recent and now < recent[-1] + wait:
+            return "backoff", recent[-1] + wait - now
+        recent.append(now)
+        return "restart", min(self.BACKOFF_BASE * 2 ** (len(recent) - 1), self.BACKOFF_MAX)
+    
+    def _report(self, name, wanted, actual, what):
+        messages = {
+            "restart": f"{name} debía estar activo y está {actual}: reiniciando",
+            "backoff": f"{name} sigue {actual}: se reintentará tras el backoff",
+            "gave-up": f"{name} cayó {self.BURST} veces en {self.BURST_WINDOW // 60} min: no se reintenta más",
+            "drift": f"{name} está activo pero se pidió detenido",
+        }
+        log_event(
+            "drift", messages[what], level=what == "restart" and logging.INFO or logging.WARNING,
+            service=name, desired=wanted, actual=actual, action=what
+        )
+        if self.on_drift:
+            self.on_drift(name, wanted, actual, what)
+    
+    def due(self, now=None):
+        """Servicios cuyo reintento ya venció (para revisarlos con el último estado conocido)"""
+        now = time.monotonic() if now is None else now
+        with self._lock:
+            return [name for name, at in self.retry_at.items() if at <= now]
+    
+    def next_retry(self, now=None):
+        """Segundos hasta el próximo reintento, o None si no hay ninguno pendiente"""
+        now = time.monotonic() if now is None else now
+        with self._lock:
+            if not self.retry_at:
+                return None
+            return max(min(self.retry_at.values()) - now, 0)
+
+class ConfigError(ValueError):
+    """Archivo de configuración inválido; el mensaje dice qué entrada y qué clave"""
+
+class ServiceConfig:
+    """SERVICES_CONFIG y PROFILES desde ~/.config/dragwaysk-panel/services.toml (o services.json)
+    
+    El archivo tiene una lista "services" con las mismas claves que SERVICES_CONFIG y una tabla
+    "profiles"; sin archivo se usan los valores de este módulo. Se valida entero antes de aplicar
+    nada: un archivo con errores deja la configuración anterior. apply() cambia las listas en su
+    sitio (todos los módulos las comparten) y devuelve qué servicios se agregaron, quitaron o cambiaron.
+    Borrar el archivo no vuelve a los valores por defecto hasta reiniciar.
+    """
+    
+    NAMES = ("services.toml", "services.json")
+    NUMBER = (int, float)
+    SCHEMA = {  # clave -> tipos aceptados o una de las formas de KINDS
+        "service": str, "label": str, "icon": str, "backend": str, "requires": "names",
+        "poll_interval": "positive", "max_poll_interval": "positive",
+        "ready": (dict, list), "ready_timeout": "positive", "idle": dict, "on_demand": dict,
+        "path": str, "scripts": "texts",                   # pm2
+        "compose_file": str, "compose_services": "names",  # docker-compose
+        "command": "argv", "match": str, "cwd": str,       # process
+    }
+    KINDS = {  # forma -> cómo se nombra en los mensajes
+        "address": "un puerto (1-65535) o \"host:puerto\"",
+        "names": "una lista de textos",
+        "argv": "una lista no vacía de textos",
+        "positive": "un número mayor que 0",
+        "texts": "una tabla de textos",
+    }
+    PROBE_VALUES = {"tcp": "address", "postgres": "address", "mysql": "address", "unix": str, "http": str, "command": "argv"}
+    ACTIVITY_VALUES = {"connections": "address", "unix": str, "containers": bool, "cpu": NUMBER}
+    
+    @staticmethod
+    def config_dir():
+        base = os.environ.get("XDG_CONFIG_HOME") or os.path.expanduser("~/.config")
+        return os.path.join(base, "dragwaysk-panel")
+    
+    @classmethod
+    def find(cls):
+        """Ruta del archivo de configuración, o None si no hay ninguno"""
+        for name in cls.NAMES:
+            path = os.path.join(cls.config_dir(), name)
+            if os.path.isfile(path):
+                return path
+        return None
+    
+    @staticmethod
+    def parse(path):
+        if path.endswith(".toml"):
+            try:
+                import tomllib  # Python 3.11+; antes solo se admite JSON
+            except ImportError:
+                raise ConfigError(f"{path}: TOML necesita Python 3.11 o posterior, usa services.json")
+            with open(path, "rb") as f:
+                try:
+                    return tomllib.load(f)
+                except tomllib.TOMLDecodeError as e:
+                    raise ConfigError(f"{path}: {e}")
+        with open(path) as f:
+            try:
+                return json.load(f)
+            except ValueError as e:
+                raise ConfigError(f"{path}: {e}")
+    
+    @classmethod
+    def is_valid(cls, value, kind):
+        """value tiene la forma kind (clave de KINDS) o es de los tipos kind (un bool no es un número)"""
+        if kind == "address":
+            if isinstance(value, str):
+                host, _, port = value.rpartition(":")
+                if not port.isdigit():
+                    return False
+                value = int(port)
+            return isinstance(value, int) and not isinstance(value, bool) and 1 <= value <= 65535
+        if kind == "names":
+            return isinstance(value, list) and all(isinstance(item, str) and item for item in value)
+        if kind == "argv":
+            return cls.is_valid(value, "names") and len(value) > 0
+        if kind == "positive":
+            return cls.is_valid(value, cls.NUMBER) and value > 0
+        if kind == "texts":
+            return isinstance(value, dict) and all(isinstance(item, str) for item in value.values())
+        return isinstance(value, kind) and (kind is bool or not isinstance(value, bool))
+    
+    @classmethod
+    def check(cls, where, key, value, kind):
+        if not cls.is_valid(value, kind):
+            expected = cls.KINDS.get(kind) if isinstance(kind, str) else None
+            raise ConfigError(f"{where}: \"{key}\" " + (expected and f"debe ser {expected}" or "tiene un tipo inválido"))
+    
+    @classmethod
+    def validate(cls, data):
+        """Comprueba el archivo ya leído y devuelve (servicios, perfiles); ConfigError con el primer fallo"""
+        if not isinstance(data, dict) or not isinstance(data.get("services"), list):
+            raise ConfigError("Falta la lista \"services\"")
+        services, seen = [], set()
+        for index, entry in enumerate(data["services"]):
+            where = f"services[{index}]"
+            if not isinstance(entry, dict):
+                raise ConfigError(f"{where}: debe ser una tabla")
+            if not isinstance(entry.get("service"), str) or not entry["service"]:
+                raise ConfigError(f"{where}: falta \"service\"")
+            where = f"{where} ({entry['service']})"
+            if entry["service"] in seen:
+                raise ConfigError(f"{where}: servicio repetido")
+            seen.add(entry["service"])
+            for key, value in entry.items():
+                if key not in cls.SCHEMA:
+                    raise ConfigError(f"{where}: clave desconocida \"{key}\"")
+                cls.check(where, key, value, cls.SCHEMA[key])
+            backend = BACKENDS.get(entry.get("backend", "systemd"))
+            if backend is None:
+                raise ConfigError(f"{where}: backend desconocido \"{entry['backend']}\" (hay: {', '.join(BACKENDS)})")
+            for key in backend.required:
+                if key not in entry:
+                    raise ConfigError(f"{where}: el backend {backend.name} necesita \"{key}\"")
+            cls._validate_probes(where, entry)
+            services.append(dict({"label": entry["service"], "icon": "system-run"}, **entry))
+        
+        names = {entry["service"] for entry in services}
+        for entry in services:
+            for dependency in entry.get("requires", []):
+                if dependency not in names:
+                    raise ConfigError(f"{entry['service']}: \"requires\" nombra un servicio no configurado: {dependency}")
+        profiles = data.get("profiles", {})
+        if not isinstance(profiles, dict):
+            raise ConfigError("\"profiles\" debe ser una tabla de listas de servicios")
+        for name, members in profiles.items():
+            if not cls.is_valid(members, "names") or any(member not in names for member in members):
+                raise ConfigError(f"profiles.{name}: debe listar servicios configurados")
+        try:
+            ServiceOrchestrator(services).plan(list(names), "start")
+        except ValueError as e:  # Dependencias circulares
+            raise ConfigError(str(e))
+        return services, {name: list(members) for name, members in profiles.items()}
+    
+    @classmethod
+    def _validate_probes(cls, where, entry):
+        ready = entry.get("ready", [])
+        for spec in isinstance(ready, dict) and [ready] or ready:
+            kind = isinstance(spec, dict) and next((key for key in spec if key in READINESS_PROBES), None)
+            if not kind:
+                raise ConfigError(f"{where}: \"ready\" necesita una sonda de: {', '.join(READINESS_PROBES)}")
+            if kind in cls.PROBE_VALUES:
+                cls.check(where, f"ready.{kind}", spec[kind], cls.PROBE_VALUES[kind])
+            if "status" in spec:
+                cls.check(where, "ready.status", spec["status"], int)
+        idle = entry.get("idle")
+        if idle is not None:
+            cls.check(where, "idle.minutes", idle.get("minutes", 30), "positive")
+            activity = idle.get("activity", {})
+            cls.check(where, "idle.activity", activity, dict)
+            unknown = [str(kind) for kind in activity if kind not in ACTIVITY_PROBES]
+            if unknown:
+                raise ConfigError(f"{where}: sonda de actividad desconocida: {', '.join(unknown)}")
+            for kind, value in activity.items():
+                if kind in cls.ACTIVITY_VALUES:
+                    cls.check(where, f"idle.activity.{kind}", value, cls.ACTIVITY_VALUES[kind])
+        on_demand = entry.get("on_demand")
+        if on_demand is not None:
+            for key in ("listen", "target"):
+                if key not in on_demand:
+                    raise ConfigError(f"{where}: \"on_demand\" necesita \"listen\" y \"target\"")
+                cls.check(where, f"on_demand.{key}", on_demand[key], "address")
+            if "idle_timeout" in on_demand:
+                cls.check(where, "on_demand.idle_timeout", on_demand["idle_timeout"], "positive")
+    
+    @classmethod
+    def load(cls, path=None):
+        """(servicios, perfiles) validados del archivo, o None si no hay archivo"""
+        path = path or cls.find()
+        if path is None:
+            return None
+        try:
+            data = cls.parse(path)
+        except OSError as e:
+            raise ConfigError(f"{path}: {e}")
+        try:
+            return cls.validate(data)
+        except ConfigError as e:
+            raise ConfigError(f"{path}: {e}")
+        except Exception as e:  # Un valor que validate() no prevé tampoco debe tumbar a quien carga
+            raise ConfigError(f"{path}: valor inválido ({type(e).__name__}: {e})")
+    
+    @staticmethod
+    def diff(old, new):
+        """(agregados, quitados, cambiados) entre dos listas de entradas, por nombre de servicio"""
+        before = {entry["service"]: entry for entry in old}
+        after = {entry["service"]: entry for entry in new}
+        added = [name for name in after if name not in before]
+        removed = [name for name in before if name not in after]
+        changed = [name for name in after if name in before and after[name] != before[name]]
+        return added, removed, changed
+    
+    @classmethod
+    def apply(cls, services, profiles):
+        """Reemplaza SERVICES_CONFIG y PROFILES en su sitio; devuelve (agregados, quitados, cambiados)"""
+        added, removed, changed = cls.diff(SERVICES_CONFIG, services)
+        SERVICES_CONFIG[:] = services
+        PROFILES.clear()
+        PROFILES.update(profiles)
+        if added or removed or changed:
+            log_event(
+                "config", f"Configuración aplicada: +{len(added)} -{len(removed)} ~{len(changed)}",
+                added=added, removed=removed, changed=changed
+            )
+        return added, removed, changed
+    
+    @classmethod
+    def load_user(cls):
+        """Aplica el archivo del usuario al arrancar; si es inválido se avisa y quedan los valores por defecto"""
+        try:
+            loaded = cls.load()
+        except ConfigError as e:
+            logging.error(f"Configuración ignorada: {e}")
+            return None
+        except Exception as e:
+            logging.exception(f"Configuración ignorada: {e}")
+            return None
+        if loaded is not None:
+            cls.apply(*loaded)
+        return loaded
+
+class ConfigWatcher:
+    """Vigila el directorio de configuración con inotify y entrega cada versión válida del archivo
+    
+    Se vigila el directorio y no el archivo porque los editores suelen guardar con un archivo nuevo
+    y un rename. Los eventos de un mismo guardado se agrupan (DEBOUNCE_SECONDS) y solo se relee si
+    cambió el archivo (inodo, tamaño y fecha). Sin inotify se comprueba cada POLL_SECONDS.
+    """
+    
+    DEBOUNCE_SECONDS = 0.2
+    POLL_SECONDS = 5.0  # Solo si inotify no está disponible
+    
+    def __init__(self, on_change, on_error=None):
+        self.on_change = on_change  # (servicios, perfiles); se llama desde el hilo del watcher
+        self.on_error = on_error    # (ConfigError); ídem
+        self._signature = self.signature()
+        self._stop_read, self._stop_write = os.pipe()
+        self._thread = None
+    
+    @staticmethod
+    def signature():
+        path = ServiceConfig.find()
+        try:
+            info = os.stat(path) if path else None
+        except OSError:
+            info = None
+        return path, info and (info.st_ino, info.st_size, info.st_mtime_ns)
+    
+    def start(self):
+        if self._thread is None:
+            self._thread = threading.Thread(target=self._run, name="config-watcher")
+            self._thread.daemon = True
+            self._thread.start()
+    
+    def stop(self):
+        os.write(self._stop_write, b"x")
+    
+    def _run(self):
+        directory = ServiceConfig.config_dir()
+        inotify = None
+        try:
+            os.makedirs(directory, exist_ok=True)
+            inotify = Inotify()
+            inotify.add_watch(directory, Inotify.IN_CLOSE_WRITE | Inotify.IN_MOVED_TO | Inotify.IN_DELETE)
+        except (OSError, AttributeError) as e:
+            logging.warning(f"inotify no disponible, la configuración se revisará cada {self.POLL_SECONDS:g} s: {e}")
+            if inotify is not None:
+                inotify.close()
+            inotify = None
+        watched = [self._stop_read] + (inotify and [inotify.fd] or [])
+        try:
+            while True:
+                readable, _, _ = select.select(watched, [], [], inotify is None and self.POLL_SECONDS or None)
+                if self._stop_read in readable:
+                    return
+                if inotify is not None:
+                    names = {name for wd, mask, name in inotify.read_events()}
+                    if not names.intersection(ServiceConfig.NAMES):
+                        continue
+                    # Un guardado puede llegar en varios eventos: se espera a que termine
+                    while select.select([inotify.fd], [], [], self.DEBOUNCE_SECONDS)[0]:
+                        inotify.read_events()
+                COUNTERS.add_wakeup()
+                try:
+                    self.check()
+                except Exception as e:  # El watcher sigue vivo para el próximo guardado
+                    logging.exception(f"Error aplicando la configuración: {e}")
+        finally:
+            if inotify is not None:
+                inotify.close()
+    
+    def check(self):
+        """Relee el archivo si cambió y avisa; un archivo inválido no se aplica"""
+        signature = self.signature()
+        if signature == self._signature:
+            return
+        self._signature = signature
+        try:
+            loaded = ServiceConfig.load(signature[0]) if signature[0] else None
+        except ConfigError as e:
+            logging.error(f"Configuración no aplicada: {e}")
+            if self.on_error:
+                self.on_error(e)
+            return
+        if loaded is not None:
+            self.on_change(*loaded)
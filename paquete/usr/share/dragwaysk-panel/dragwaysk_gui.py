@@ -0,0 +1,1335 @@
+#!/usr/bin/env python3
+"""Ventana GTK del Dragwaysk Control Center"""
+import gi
+import os
+import signal
+import sys
+import threading
+import time
+import logging
+from concurrent.futures import ThreadPoolExecutor
+
+gi.require_version('Gtk', '3.0')
+from gi.repository import Gtk, GLib, Gdk, Gio
+
+from dragwaysk_broker import BrokerClient
+from dragwaysk_logs import LogStreamer, MAX_LINES, PRIORITY_ERROR, PRIORITY_WARNING
+from dragwaysk_core import (
+    PROFILES,
+    SERVICES_CONFIG,
+    COUNTERS,
+    ServiceValidator,
+    SystemdBackend,
+    PM2Watcher,
+    PrivilegedHelper,
+    ServiceOrchestrator,
+    ResourceMonitor,
+    IdleMonitor,
+    OPERATIONS,
+    OperationQueue,
+    Reconciler,
+    ConfigWatcher,
+    ServiceConfig,
+    log_transitions
+)
+
+RESOURCE_INTERVAL = 2  # Segundos entre lecturas de consumo de los servicios activos
+
+class StatusPoller:
+    """Consulta estados fuera del hilo de GTK y entrega solo los cambios con GLib.idle_add"""
+    
+    def __init__(self, on_changes, max_workers=4, on_probed=None, broker=None):
+        self.on_changes = on_changes
+        self.on_probed = on_probed  # (servicios consultados, servicios que cambiaron de verdad)
+        self.broker = broker        # BrokerClient: si está conectado, él hace las consultas
+        self.executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="status")
+        self.last_statuses = {}
+        self._lock = threading.Lock()
+        self._in_flight = set()  # Servicios con una consulta en curso
+        self._queued = {}        # Servicios pedidos mientras su consulta estaba en curso
+    
+    def request(self, service_names, force=False):
+        """Encola la consulta de los servicios indicados sin bloquear al llamador"""
+        # Con broker la respuesta llega por su hilo lector (ver ControlPanelWindow.on_broker_statuses)
+        if self.broker is not None and self.broker.connected:
+            if self.broker.refresh(service_names, max_age=force and 0 or None):
+                return
+        
+        with self._lock:
+            names = []
+            for name in service_names:
+                if name in self._in_flight:
+                    self._queued[name] = self._queued.get(name, False) or force
+                else:
+                    names.append(name)
+            self._in_flight.update(names)
+        
+        # Una consulta en lote por backend, cada una en su hilo: un 'pm2 jlist' colgado no retrasa a systemd
+        for backend, services in ServiceValidator.group_by_backend(names).items():
+            self.executor.submit(self._probe, [s["service"] for s in services], force)
+    
+    def _probe(self, service_names, force):
+        """Ejecuta la consulta en un hilo del pool y publica las diferencias"""
+        try:
+            statuses = ServiceValidator.get_services_status(service_names)
+        except Exception as e:
+            logging.error(f"Error consultando {', '.join(service_names)}: {e}")
+            statuses = {name: "error" for name in service_names}
+        
+        with self._lock:
+            changed = {name for name, status in statuses.items() if self.last_statuses.get(name) != status}
+            changes = {name: status for name, status in statuses.items() if force or name in changed}
+            log_transitions(self.last_statuses, statuses)
+            self.last_statuses.update(statuses)
+            self._in_flight.difference_update(service_names)
+            requeued = {name: self._queued.pop(name) for name in service_names if name in self._queued}
+        
+        if changes:
+            GLib.idle_add(self.on_changes, changes)
+        if self.on_probed:
+            GLib.idle_add(self.on_probed, service_names, changed)
+        for name, requeued_force in requeued.items():
+            self.request([name], requeued_force)
+    
+    def remember(self, statuses):
+        """Registra estados obtenidos por otra vía (p. ej. D-Bus) y devuelve los que cambiaron"""
+        with self._lock:
+            changes = {
+                name: status for name, status in statuses.items()
+                if self.last_statuses.get(name) != status
+            }
+            log_transitions(self.last_statuses, statuses)
+            self.last_statuses.update(statuses)
+        return changes
+    
+    def shutdown(self):
+        """Detiene el pool sin esperar consultas colgadas"""
+        self.executor.shutdown(wait=False)
+
+class RefreshScheduler:
+    """Decide cuándo sondear cada servicio: rápido tras una operación y con backoff mientras no cambia"""
+    
+    FAST_INTERVAL = 1       # segundos tras una operación
+    DEFAULT_INTERVAL = 5    # "poll_interval" por defecto
+    MAX_INTERVAL = 120      # "max_poll_interval" por defecto
+    
+    def __init__(self, on_due):
+        self.on_due = on_due  # Recibe la lista de servicios a sondear
+        self.entries = {}     # servicio -> {"base", "max", "interval", "due"}
+        self.paused = False
+        self.source = None
+    
+    def set_services(self, services):
+        """Define qué entradas de SERVICES_CONFIG se sondean (conserva el ritmo de las que siguen)"""
+        now = time.monotonic()
+        names = {s["service"] for s in services}
+        for name in list(self.entries):
+            if name not in names:
+                del self.entries[name]
+        for service in services:
+            if service["service"] in self.entries:
+                continue
+            base = service.get("poll_interval", self.DEFAULT_INTERVAL)
+            self.entries[service["service"]] = {
+                "base": base,
+                "max": max(service.get("max_poll_interval", self.MAX_INTERVAL), base),
+                "interval": base,
+                "due": now + base,
+            }
+        self._reschedule()
+    
+    def record(self, service_names, changed):
+        """Ajusta el intervalo según el resultado: vuelve al base si cambió, se duplica si no"""
+        for name in service_names:
+            entry = self.entries.get(name)
+            if entry is None:
+                continue
+            if name in changed:
+                entry["interval"] = min(entry["interval"], entry["base"])
+            else:
+                entry["interval"] = min(entry["interval"] * 2, entry["max"])
+        return False  # No repetir (se llama con GLib.idle_add)
+    
+    def boost(self, service_name):
+        """Sondeo rápido tras una operación; luego vuelve a espaciarse solo"""
+        entry = self.entries.get(service_name)
+        if entry is None:
+            return
+        entry["interval"] = self.FAST_INTERVAL
+        entry["due"] = time.monotonic() + self.FAST_INTERVAL
+        self._reschedule()
+    
+    def pause(self):
+        """Sin sondeo mientras la ventana está minimizada u oculta"""
+        self.paused = True
+        self._reschedule()
+    
+    def resume(self, catch_up=True):
+        """Reanuda el sondeo; con catch_up consulta de inmediato lo que haya quedado pendiente"""
+        self.paused = False
+        if catch_up:
+            now = time.monotonic()
+            for entry in self.entries.values():
+                entry["interval"] = entry["base"]
+                entry["due"] = min(entry["due"], now)
+        self._reschedule()
+    
+    def _reschedule(self):
+        """Un solo temporizador, armado para el próximo vencimiento"""
+        if self.source is not None:
+            GLib.source_remove(self.source)
+            self.source = None
+        if self.paused or not self.entries:
+            return
+        delay = max(0.0, min(entry["due"] for entry in self.entries.values()) - time.monotonic())
+        self.source = GLib.timeout_add(int(delay * 1000), self._on_timeout)
+    
+    def _on_timeout(self):
+        COUNTERS.add_wakeup()
+        self.source = None
+        now = time.monotonic()
+        # Se agrupan los vencidos y los que vencerían enseguida para despertar menos veces
+        due = [name for name, entry in self.entries.items() if entry["due"] <= now + 0.5]
+        for name in due:
+            self.entries[name]["due"] = now + self.entries[name]["interval"]
+        if due:
+            self.on_due(due)
+        self._reschedule()
+        return False  # El próximo temporizador lo arma _reschedule
+
+class SystemdWatcher:
+    """Recibe los cambios de estado de systemd por D-Bus (PropertiesChanged) en lugar de sondear
+    
+    La conexión, Subscribe y cada LoadUnit son asíncronos: las respuestas llegan al bucle principal
+    y nunca lo bloquean. Hasta que se resuelve la ruta de una unidad, esta sigue en el sondeo.
+    """
+    
+    BUS_NAME = "org.freedesktop.systemd1"
+    MANAGER_PATH = "/org/freedesktop/systemd1"
+    MANAGER_IFACE = "org.freedesktop.systemd1.Manager"
+    UNIT_IFACE = "org.freedesktop.systemd1.Unit"
+    TIMEOUT_MS = 5000
+    
+    def __init__(self, on_changes, on_watched_changed=None, on_unit_files_changed=None):
+        self.on_changes = on_changes
+        self.on_watched_changed = on_watched_changed  # Cambió qué llega por señales (p. ej. el sondeo)
+        self.on_unit_files_changed = on_unit_files_changed
+        self.bus = None
+        self.connecting = False
+        self.wanted = set()   # Servicios pedidos; los que llegan de LoadUnit después de unwatch() se descartan
+        self.unit_paths = {}  # Ruta D-Bus de la unidad -> nombre del servicio
+        self.subscription_id = None
+        self.manager_subscription_id = None
+        self.closed_handler = None
+    
+    @property
+    def active(self):
+        return self.subscription_id is not None
+    
+    def watched_services(self):
+        """Servicios cuyo estado llega por señales y no necesita sondeo"""
+        return set(self.unit_paths.values()) if self.active else set()
+    
+    def start(self, service_names):
+        """Conecta y se suscribe en segundo plano; si D-Bus no está disponible se sigue sondeando"""
+        if self.bus is not None or self.connecting:
+            self.watch(service_names)
+            return
+        self.wanted.update(service_names)
+        # DRAGWAYSK_SYSTEMD_BUS=session permite apuntar a un systemd simulado en el bus de sesión
+        if os.environ.get("DRAGWAYSK_SYSTEMD_BUS") == "session":
+            bus_type = Gio.BusType.SESSION
+        else:
+            bus_type = Gio.BusType.SYSTEM
+        self.connecting = True
+        Gio.bus_get(bus_type, None, self._on_bus_ready)
+    
+    def watch(self, service_names):
+        """Agrega unidades a la suscripción (p. ej. tras recargar la configuración)"""
+        self.wanted.update(service_names)
+        if not self.active:
+            return  # Se cargan todas las pedidas al terminar la suscripción
+        for service_name in service_names:
+            self._call("LoadUnit", GLib.Variant("(s)", (service_name + ".service",)), self._on_unit_loaded, service_name)
+    
+    def unwatch(self, service_names):
+        """Deja de seguir las unidades indicadas (sus señales se ignoran)"""
+        self.wanted.difference_update(service_names)
+        self.unit_paths = {path: name for path, name in self.unit_paths.items() if name not in service_names}
+    
+    def stop(self):
+        """Cancela la suscripción a las señales (las respuestas pendientes se descartan)"""
+        self.connecting = False
+        if self.active:
+            self.bus.signal_unsubscribe(self.subscription_id)
+            self.bus.signal_unsubscribe(self.manager_subscription_id)
+            self.subscription_id = None
+            self.manager_subscription_id = None
+        if self.bus is not None and self.closed_handler is not None:
+            self.bus.disconnect(self.closed_handler)
+        self.closed_handler = None
+        self.bus = None
+    
+    def _call(self, method, params, callback, user_data=None):
+        self.bus.call(
+            self.BUS_NAME, self.MANAGER_PATH, self.MANAGER_IFACE,
+            method, params, None, Gio.DBusCallFlags.NONE, self.TIMEOUT_MS, None, callback, user_data
+        )
+    
+    def _on_bus_ready(self, source, result, user_data=None):
+        try:
+            bus = Gio.bus_get_finish(result)
+        except GLib.Error as e:
+            logging.warning(f"D-Bus de systemd no disponible, se usará sondeo: {e.message}")
+            self.connecting = False
+            return
+        if not self.connecting:
+            return  # stop() mientras se conectaba
+        bus.set_exit_on_close(False)  # Si el bus cae se vuelve al sondeo en lugar de terminar el proceso
+        self.bus = bus
+        self.closed_handler = bus.connect("closed", self._on_bus_closed)
+        self._call("Subscribe", None, self._on_subscribed)
+    
+    def _on_subscribed(self, bus, result, user_data=None):
+        if bus is not self.bus:
+            return
+        self.connecting = False
+        try:
+            bus.call_finish(result)
+        except GLib.Error as e:
+            logging.warning(f"D-Bus de systemd no disponible, se usará sondeo: {e.message}")
+            self.stop()
+            return
+        
+        self.subscription_id = bus.signal_subscribe(
+            self.BUS_NAME,
+            "org.freedesktop.DBus.Properties",
+            "PropertiesChanged",
+            None,
+            self.UNIT_IFACE,
+            Gio.DBusSignalFlags.NONE,
+            self._on_properties_changed
+        )
+        # Reloading / UnitFilesChanged invalidan la caché de existencia
+        self.manager_subscription_id = bus.signal_subscribe(
+            self.BUS_NAME,
+            self.MANAGER_IFACE,
+            None,
+            self.MANAGER_PATH,
+            None,
+            Gio.DBusSignalFlags.NONE,
+            self._on_manager_signal
+        )
+        logging.info(f"Suscrito a systemd por D-Bus, cargando {len(self.wanted)} unidades")
+        self.watch(sorted(self.wanted))
+    
+    def _on_unit_loaded(self, bus, result, service_name):
+        if bus is not self.bus or not self.active:
+            return
+        try:
+            reply = bus.call_finish(result)
+        except GLib.Error as e:
+            logging.warning(f"No se pudo seguir {service_name} por D-Bus: {e.message}")
+            return
+        if service_name not in self.wanted:
+            return  # Se quitó mientras esperaba la respuesta
+        self.unit_paths[reply.unpack()[0]] = service_name
+        if self.on_watched_changed:
+            self.on_watched_changed()
+    
+    def _on_properties_changed(self, connection, sender, path, interface, signal, params):
+        """Traduce ActiveState a los estados del panel y lo entrega a la ventana"""
+        service_name = self.unit_paths.get(path)
+        if service_name is None:
+            return
+        iface_name, changed, invalidated = params.unpack()
+        state = changed.get("ActiveState")
+        # Los estados transitorios (activating, deactivating...) se ignoran hasta que se asiente
+        if state in ["active", "inactive", "failed"]:
+            self.on_changes({service_name: state})
+    
+    def _on_manager_signal(self, connection, sender, path, interface, signal, params):
+        """Invalida la caché de unidades cuando systemd termina de recargar"""
+        if signal == "UnitFilesChanged" or (signal == "Reloading" and not params.unpack()[0]):
+            SystemdBackend.invalidate_unit_files()
+            if self.on_unit_files_changed:
+                self.on_unit_files_changed()
+    
+    def _on_bus_closed(self, connection, remote_peer_vanished, error):
+        logging.warning("Conexión D-Bus cerrada, volviendo al sondeo")
+        self.subscription_id = None
+        self.manager_subscription_id = None
+        self.unit_paths = {}
+        connection.disconnect(self.closed_handler)
+        self.closed_handler = None
+        self.bus = None  # La próxima comprobación de existencia vuelve a suscribir todas las unidades
+        if self.on_watched_changed:
+            self.on_watched_changed()
+
+class StartupProfiler:
+    """Registra el tiempo hasta el primer frame y hasta tener todas las filas pobladas"""
+    
+    def __init__(self, echo=False, t0=None, exit_when_populated=False):
+        self.echo = echo  # --profile-startup: además del log, imprimir en stderr
+        self.t0 = t0 if t0 is not None else time.monotonic()  # Inicio del proceso (ver dragwaysk-panel.py)
+        self.exit_when_populated = exit_when_populated  # Para benchmarks: cerrar al terminar el arranque
+        self.marks = {}
+    
+    def mark(self, name):
+        """Anota un hito de arranque (solo la primera vez)"""
+        if name in self.marks:
+            return
+        elapsed_ms = (time.monotonic() - self.t0) * 1000
+        self.marks[name] = elapsed_ms
+        message = f"Arranque: {name} a los {elapsed_ms:.0f} ms"
+        logging.info(message)
+        if self.echo:
+            print(message, file=sys.stderr)
+        if name == "filas pobladas" and self.exit_when_populated:
+            GLib.idle_add(Gtk.main_quit)
+
+class LogPane(Gtk.Box):
+    """Registro en vivo de un servicio con búsqueda incremental y filtro por nivel"""
+    
+    REFRESH_MS = 500  # Solo mientras el panel está abierto
+    LEVELS = (("7", "Todo"), (str(PRIORITY_WARNING), "Avisos"), (str(PRIORITY_ERROR), "Errores"))
+    
+    def __init__(self, service_name, parent_window):
+        super().__init__(orientation=Gtk.Orientation.VERTICAL, spacing=6)
+        self.service_name = service_name
+        self.parent_window = parent_window
+        self.log_buffer = None  # LogBuffer del servicio (al abrir)
+        self.seq = 0            # Última línea mostrada del LogBuffer
+        self.source = None
+        self.set_margin_start(20)
+        self.set_margin_end(20)
+        self.set_margin_bottom(15)
+        
+        filters = Gtk.Box(orientation=Gtk.Orientation.HORIZONTAL, spacing=6)
+        self.search_entry = Gtk.SearchEntry()
+        self.search_entry.connect("search-changed", lambda w: self.render())
+        filters.pack_start(self.search_entry, True, True, 0)
+        self.level_combo = Gtk.ComboBoxText()
+        for level, label in self.LEVELS:
+            self.level_combo.append(level, label)
+        self.level_combo.set_active_id("7")
+        self.level_combo.connect("changed", lambda w: self.render())
+        filters.pack_start(self.level_combo, False, False, 0)
+        self.pack_start(filters, False, False, 0)
+        
+        self.text_view = Gtk.TextView()
+        self.text_view.set_editable(False)
+        self.text_view.set_cursor_visible(False)
+        self.text_view.set_monospace(True)
+        self.text_view.set_wrap_mode(Gtk.WrapMode.WORD_CHAR)
+        self.text_view.get_style_context().add_class("log-view")
+        self.text_buffer = self.text_view.get_buffer()
+        self.text_buffer.create_tag("error", foreground="#ef5350")
+        self.text_buffer.create_tag("warning", foreground="#ffa726")
+        scrolled = Gtk.ScrolledWindow()
+        scrolled.set_size_request(-1, 160)
+        scrolled.add(self.text_view)
+        self.pack_start(scrolled, True, True, 0)
+    
+    def open(self):
+        """Empieza a seguir el registro (la resolución de fuentes corre en el pool)"""
+        streamer = self.parent_window.logs
+        self.log_buffer = streamer.buffer(self.service_name)
+        self.parent_window.poller.executor.submit(streamer.watch, self.service_name)
+        self.render()
+        if self.source is None:
+            self.source = GLib.timeout_add(self.REFRESH_MS, self.pull)
+    
+    def close(self):
+        if self.source is not None:
+            GLib.source_remove(self.source)
+            self.source = None
+        self.parent_window.poller.executor.submit(self.parent_window.logs.unwatch, self.service_name)
+    
+    def filters(self):
+        return self.search_entry.get_text(), int(self.level_combo.get_active_id() or 7)
+    
+    def render(self):
+        """Vuelve a pintar todo lo que cumple los filtros (al abrir o al cambiar la búsqueda)"""
+        if self.log_buffer is None:
+            return
+        text, level = self.filters()
+        self.text_buffer.set_text("")
+        lines = self.log_buffer.search(text, level)
+        self.seq = self.log_buffer.seq
+        self._append(lines)
+    
+    def pull(self):
+        """Añade las líneas nuevas que cumplen los filtros"""
+        COUNTERS.add_wakeup()
+        new = self.log_buffer.since(self.seq)
+        if new:
+            self.seq = new[-1][0]
+            self._append(self.log_buffer.search(*self.filters(), lines=new))
+        return True  # Mantener el temporizador mientras esté abierto
+    
+    def _append(self, lines):
+        if not lines:
+            return
+        adjustment = self.text_view.get_parent().get_vadjustment()
+        at_bottom = adjustment.get_value() >= adjustment.get_upper() - adjustment.get_page_size() - 5
+        for seq, timestamp, priority, message in lines:
+            tag = priority <= PRIORITY_ERROR and "error" or priority == PRIORITY_WARNING and "warning" or None
+            line = f"{time.strftime('%H:%M:%S', time.localtime(timestamp))} {message}\n"
+            if tag:
+                self.text_buffer.insert_with_tags_by_name(self.text_buffer.get_end_iter(), line, tag)
+            else:
+                self.text_buffer.insert(self.text_buffer.get_end_iter(), line)
+        # La vista tampoco guarda más que el buffer
+        excess = self.text_buffer.get_line_count() - 1 - MAX_LINES
+        if excess > 0:
+            self.text_buffer.delete(self.text_buffer.get_start_iter(), self.text_buffer.get_iter_at_line(excess))
+        if at_bottom:
+            self.text_view.scroll_to_iter(self.text_buffer.get_end_iter(), 0, False, 0, 1)
+
+class ServiceRow(Gtk.ListBoxRow):
+    def __init__(self, service_data, parent_window):
+        super().__init__()
+        self.service_name = service_data["service"]
+        self.service_label = service_data["label"]
+        self.backend = ServiceValidator.get_backend(service_data)
+        self.parent_window = parent_window
+        self.is_operating = False
+        self.status_known = False  # Ya se mostró un estado real (para el perfil de arranque)
+        
+        # La existencia se verifica en segundo plano; mientras tanto la fila es un marcador
+        self.service_exists = None
+        
+        # Contenedor principal con estilo de tarjeta
+        main_box = Gtk.Box(orientation=Gtk.Orientation.VERTICAL, spacing=0)
+        main_box.get_style_context().add_class("service-card")
+        
+        # Contenedor horizontal interno
+        box = Gtk.Box(orientation=Gtk.Orientation.HORIZONTAL, spacing=15)
+        box.set_margin_top(15)
+        box.set_margin_bottom(15)
+        box.set_margin_start(20)
+        box.set_margin_end(20)
+        
+        # 1. Icono del servicio con contenedor circular
+        icon_box = Gtk.Box(orientation=Gtk.Orientation.VERTICAL)
+        icon_box.set_size_request(48, 48)
+        icon_box.get_style_context().add_class("icon-container")
+        
+        self.service_icon = Gtk.Image.new_from_icon_name(
+            service_data["icon"], 
+            Gtk.IconSize.LARGE_TOOLBAR
+        )
+        icon_box.pack_start(self.service_icon, True, True, 0)
+        box.pack_start(icon_box, False, False, 0)
+        
+        # 2. Contenedor de etiqueta y estado
+        label_box = Gtk.Box(orientation=Gtk.Orientation.VERTICAL, spacing=4)
+        
+        self.label = Gtk.Label(label=service_data["label"], xalign=0)
+        # La etiqueta viene del services.toml del usuario: & o < no deben romper ni inyectar marcado
+        label = GLib.markup_escape_text(service_data["label"])
+        self.label.set_markup(f"<span size='large' weight='bold'>{label}</span>")
+        label_box.pack_start(self.label, False, False, 0)
+        
+        # Etiqueta de estado
+        self.status_label = Gtk.Label(xalign=0)
+        self.status_label.set_markup("<span size='small' alpha='70%'>Verificando...</span>")
+        label_box.pack_start(self.status_label, False, False, 0)
+        
+        # Consumo en vivo (solo mientras el servicio está activo)
+        self.resource_label = Gtk.Label(xalign=0)
+        self.resource_label.set_no_show_all(True)
+        label_box.pack_start(self.resource_label, False, False, 0)
+        
+        box.pack_start(label_box, True, True, 0)
+        
+        # 3. Spinner de carga
+        self.spinner = Gtk.Spinner()
+        box.pack_end(self.spinner, False, False, 10)
+        
+        # 4. El Switch moderno
+        self.switch = Gtk.Switch()
+        self.switch.set_valign(Gtk.Align.CENTER)
+        self.switch.connect("state-set", self.on_switch_activated)
+        box.pack_end(self.switch, False, False, 0)
+        
+        # 5. Botón del registro en vivo
+        self.log_button = Gtk.ToggleButton()
+        self.log_button.set_image(Gtk.Image.new_from_icon_name("utilities-terminal", Gtk.IconSize.BUTTON))
+        self.log_button.set_tooltip_text("Ver registro")
+        self.log_button.set_valign(Gtk.Align.CENTER)
+        self.log_button.get_style_context().add_class("log-toggle")
+        self.log_button.connect("toggled", self.on_log_toggled)
+        box.pack_end(self.log_button, False, False, 0)
+        
+        main_box.pack_start(box, True, True, 0)
+        
+        # Panel de registro desplegable (se construye al abrirlo por primera vez)
+        self.log_pane = None
+        self.log_revealer = Gtk.Revealer()
+        main_box.pack_start(self.log_revealer, False, False, 0)
+        self.add(main_box)
+        
+        # Sin interacción hasta saber si el servicio existe
+        self.set_sensitive(False)
+
+    def set_service_exists(self, exists):
+        """Actualiza la fila según el servicio esté instalado o no (el estado lo pide la ventana)"""
+        self.service_exists = exists
+        self.set_sensitive(exists)
+        if not exists:
+            self.status_known = True
+            self.set_tooltip_text(f"⚠️ El servicio '{self.service_name}' no está instalado en el sistema")
+            self.status_label.set_markup("<span size='small' foreground='#ef5350'>● No disponible</span>")
+            logging.warning(f"Servicio no encontrado: {self.service_name}")
+
+    def check_status(self, status=None):
+        """Verifica el estado actual del servicio (o aplica uno ya consultado en segundo plano)"""
+        if not self.service_exists:
+            return
+        
+        if status is None:
+            # La consulta corre en el pool; el resultado vuelve por apply_statuses
+            self.parent_window.poller.request([self.service_name], force=True)
+            return
+        self.status_known = True
+        is_active = status == "active"
+        
+        # Actualizar switch sin disparar eventos
+        self.switch.handler_block_by_func(self.on_switch_activated)
+        self.switch.set_active(is_active)
+        self.switch.handler_unblock_by_func(self.on_switch_activated)
+        
+        # Actualizar indicadores visuales
+        self.update_visual_status(status)
+        if not is_active:
+            self.set_resources(None)
+            self.parent_window.resources.forget(self.service_name)
+        self.parent_window.update_resource_timer()
+        
+        # Actualizar tooltip
+        self.set_tooltip_text(f"{self.service_label}\nEstado: {status}")
+
+    def update_visual_status(self, status):
+        """Actualiza los indicadores visuales según el estado"""
+        if status == "active":
+            self.status_label.set_markup("<span size='small' foreground='#66bb6a'>● Activo</span>")
+        elif status == "inactive":
+            self.status_label.set_markup("<span size='small' alpha='50%'>○ Inactivo</span>")
+        elif status == "failed":
+            self.status_label.set_markup("<span size='small' foreground='#ef5350'>✗ Fallido</span>")
+        else:
+            self.status_label.set_markup("<span size='small' foreground='#ffa726'>? Desconocido</span>")
+
+    def set_resources(self, sample, history=()):
+        """Muestra memoria, CPU y E/S con el minigráfico de CPU; sin muestra oculta la línea"""
+        if sample is None:
+            self.resource_label.hide()
+            return
+        parts = [ResourceMonitor.format_bytes(sample["memory"])]
+        if sample["cpu"] is not None:
+            parts.append(f"CPU {sample['cpu']:.1f} %")
+        if sample["io"] is not None:
+            parts.append(f"E/S {ResourceMonitor.format_bytes(sample['io'])}/s")
+        spark = len(history) > 1 and f"  {ResourceMonitor.sparkline(history)}" or ""
+        self.resource_label.set_markup(f"<span size='small' alpha='60%'>{' · '.join(parts)}{spark}</span>")
+        self.resource_label.show()
+
+    def on_log_toggled(self, button):
+        """Despliega u oculta el registro; solo se sigue mientras está abierto"""
+        if button.get_active():
+            if self.log_pane is None:
+                self.log_pane = LogPane(self.service_name, self.parent_window)
+                self.log_revealer.add(self.log_pane)
+                self.log_pane.show_all()
+            self.log_pane.open()
+        elif self.log_pane is not None:
+            self.log_pane.close()
+        self.log_revealer.set_reveal_child(button.get_active())
+
+    def on_switch_activated(self, switch, state):
+        """Maneja el cambio de estado del switch"""
+        action = "start" if state else "stop"
+        logging.info(f"Usuario solicitó {action} para {self.service_name}")
+        
+        # La cola fusiona los cambios rápidos: solo se ejecuta el último estado pedido
+        self.is_operating = True
+        self.spinner.start()
+        future = OPERATIONS.submit([self.service_name], action, self.on_operation_progress)[self.service_name]
+        future.add_done_callback(lambda future: GLib.idle_add(self._operation_completed, action, *future.result()))
+        
+        return False  # Permitir el cambio visual del switch
+
+    def on_operation_progress(self, service_name, action, phase, elapsed):
+        """Avance de la cola de operaciones (desde sus hilos)"""
+        GLib.idle_add(self.set_operation_progress, action, phase, elapsed)
+
+    def set_operation_progress(self, action, phase, elapsed=None):
+        """Refleja en la fila el avance de una operación (pending/running/waiting/done/failed/skipped/cancelled)"""
+        verb = action == "start" and "Iniciando" or "Deteniendo"
+        if phase == "waiting":
+            waiting = action == "stop" and "Esperando a que se detenga..." or "Esperando a que responda..."
+            self.status_label.set_markup(f"<span size='small' alpha='70%'>{waiting}</span>")
+        elif phase == "pending":
+            self.is_operating = True
+            self.status_label.set_markup("<span size='small' alpha='70%'>⏳ En espera de dependencias...</span>")
+        elif phase == "running":
+            self.is_operating = True
+            self.spinner.start()
+            self.status_label.set_markup(f"<span size='small' alpha='70%'>{verb}...</span>")
+        else:
+            self.is_operating = OPERATIONS.is_busy(self.service_name)
+            if self.is_operating:
+                return False  # Ya corre la siguiente petición del mismo servicio
+            self.spinner.stop()
+            if phase == "skipped":
+                self.set_tooltip_text(f"{self.service_label}\nOmitido: falló una dependencia")
+            elif phase == "cancelled":
+                self.set_tooltip_text(f"{self.service_label}\n{action} cancelado")
+            else:
+                result = phase == "done" and "completado" or "fallido"
+                self.set_tooltip_text(f"{self.service_label}\n{action} {result} en {elapsed:.1f} s")
+            if phase == "done":
+                self.check_status(action == "stop" and "inactive" or "active")  # wait_ready ya lo confirmó
+            else:
+                self.check_status()
+                self.parent_window.scheduler.boost(self.service_name)
+        return False  # No repetir
+
+    def _operation_completed(self, action, success, error_msg, elapsed):
+        """Callback ejecutado en el hilo principal al completar la operación pedida con el switch"""
+        if error_msg == OperationQueue.SUPERSEDED:
+            return False  # Un cambio posterior del switch la reemplazó: solo cuenta el último
+        
+        if success:
+            self.parent_window.show_notification(
+                f"✓ Servicio {self.service_label} {action == 'start' and 'iniciado' or 'detenido'} correctamente",
+                Gtk.MessageType.INFO
+            )
+        elif error_msg == OperationQueue.CANCELLED:
+            self.parent_window.show_notification(f"Operación cancelada: {self.service_label}", Gtk.MessageType.WARNING)
+        else:
+            self.parent_window.show_notification(
+                f"✗ Error al {action == 'start' and 'iniciar' or 'detener'} {self.service_label}: {error_msg}",
+                Gtk.MessageType.ERROR
+            )
+            # El motivo suele estar en el registro del servicio, no en el stderr de systemctl
+            self.log_button.set_active(True)
+        
+        return False  # No repetir
+
+class ControlPanelWindow(Gtk.Window):
+    _css_provider = None  # Tema ya analizado (compartido si se abre otra ventana)
+    
+    def __init__(self, profiler=None):
+        super().__init__(title="Dragwaysk Control Center")
+        self.profiler = profiler or StartupProfiler()
+        self.set_border_width(0)
+        self.set_default_size(500, 650)
+        self.set_size_request(500, 650)  # Tamaño mínimo y máximo
+        self.set_position(Gtk.WindowPosition.CENTER)
+        self.set_resizable(False)
+        
+        # Activar modo oscuro
+        settings = Gtk.Settings.get_default()
+        settings.set_property("gtk-application-prefer-dark-theme", True)
+        
+        # El CSS se aplica al arrancar el bucle de GTK: antes del primer frame (PRIORITY_HIGH_IDLE
+        # va antes que el redibujado) pero sin retrasar la construcción de la ventana
+        GLib.idle_add(self.apply_custom_css, priority=GLib.PRIORITY_HIGH_IDLE)
+        
+        # Layout Principal
+        vbox = Gtk.Box(orientation=Gtk.Orientation.VERTICAL, spacing=0)
+        self.add(vbox)
+        
+        # Header moderno
+        header_box = Gtk.Box(orientation=Gtk.Orientation.VERTICAL, spacing=0)
+        header_box.get_style_context().add_class("header-box")
+        header_box.set_margin_top(20)
+        header_box.set_margin_bottom(20)
+        header_box.set_margin_start(25)
+        header_box.set_margin_end(25)
+        
+        header = Gtk.Label()
+        header.set_markup("<span size='xx-large' weight='bold'>Control Center</span>")
+        header.set_xalign(0)
+        header_box.pack_start(header, False, False, 0)
+        
+        subtitle = Gtk.Label()
+        subtitle.set_markup("<span size='small' alpha='60%'>Gestión de Servicios de Desarrollo</span>")
+        subtitle.set_xalign(0)
+        subtitle.set_margin_top(5)
+        header_box.pack_start(subtitle, False, False, 0)
+        
+        # Selector de perfil: cambia de stack deteniendo e iniciando solo lo necesario
+        self.profile_combo = Gtk.ComboBoxText()
+        self.profile_combo.set_margin_top(10)
+        self.profile_combo.set_no_show_all(True)  # Solo visible si hay perfiles (ver fill_profiles)
+        self.profile_combo.connect("changed", self.on_profile_selected)
+        header_box.pack_start(self.profile_combo, False, False, 0)
+        self.fill_profiles()
+        
+        # Con el modo activado los switches son el estado deseado: lo que cae se reinicia solo
+        self.reconciler = Reconciler(
+            on_drift=lambda *drift: GLib.idle_add(self.on_drift, *drift),
+            on_progress=self.on_reconcile_progress
+        ).attach()
+        self.reconcile_source = None
+        self.reconcile_check = Gtk.CheckButton(label="Mantener los servicios como se pidieron")
+        self.reconcile_check.set_active(self.reconciler.enabled)
+        self.reconcile_check.set_margin_top(6)
+        self.reconcile_check.connect("toggled", self.on_reconcile_toggled)
+        header_box.pack_start(self.reconcile_check, False, False, 0)
+        
+        vbox.pack_start(header_box, False, False, 0)
+        
+        # Barra de información (para notificaciones)
+        self.info_bar = Gtk.InfoBar()
+        self.info_bar.set_show_close_button(True)
+        self.info_bar.connect("response", lambda w, r: w.set_revealed(False))
+        self.info_label = Gtk.Label()
+        self.info_bar.get_content_area().add(self.info_label)
+        self.info_bar.set_revealed(False)
+        vbox.pack_start(self.info_bar, False, False, 0)
+
+        # ScrolledWindow para la lista de servicios
+        scrolled = Gtk.ScrolledWindow()
+        scrolled.set_policy(Gtk.PolicyType.NEVER, Gtk.PolicyType.AUTOMATIC)
+        scrolled.set_margin_start(15)
+        scrolled.set_margin_end(15)
+        vbox.pack_start(scrolled, True, True, 0)
+
+        # Lista de Servicios
+        self.listbox = Gtk.ListBox()
+        self.listbox.set_selection_mode(Gtk.SelectionMode.NONE)
+        self.listbox.get_style_context().add_class("services-list")
+        scrolled.add(self.listbox)
+        
+        # Almacenar referencias a las filas
+        self.service_rows = []
+        
+        # Consultas de estado en segundo plano, con intervalos adaptativos por servicio
+        # Con el broker de estados, las ventanas abiertas y la CLI comparten un solo sondeo
+        self.scheduler = RefreshScheduler(self.auto_refresh)
+        self.broker = BrokerClient(
+            lambda statuses, full: GLib.idle_add(self.on_broker_statuses, statuses, full),
+            lambda: GLib.idle_add(self.on_broker_closed)
+        )
+        self.poller = StatusPoller(self.apply_statuses, on_probed=self.scheduler.record, broker=self.broker)
+        self.resources = ResourceMonitor()
+        self.logs = LogStreamer()
+        self.connect("destroy", lambda w: self.logs.close())
+        self.resource_source = None  # Temporizador de consumo, armado solo si hay servicios activos
+        self.connect("destroy", lambda w: self.broker.close())
+        self.connect("destroy", lambda w: self.poller.shutdown())
+        self.connect("destroy", lambda w: OPERATIONS.cancel())  # Al cerrar no se esperan confirmaciones
+        self.connect("destroy", lambda w: PrivilegedHelper.shared().close())
+
+        # Crear filas dinámicamente
+        for service in SERVICES_CONFIG:
+            row = ServiceRow(service, self)
+            self.service_rows.append(row)
+            self.listbox.add(row)
+
+        # Contenedor de botones
+        button_box = Gtk.Box(orientation=Gtk.Orientation.HORIZONTAL, spacing=10)
+        button_box.set_margin_top(15)
+        button_box.set_margin_bottom(20)
+        button_box.set_margin_start(20)
+        button_box.set_margin_end(20)
+        
+        # Botón Refrescar
+        btn_refresh = Gtk.Button(label="Refrescar")
+        btn_refresh.get_style_context().add_class("flat")
+        btn_refresh.connect("clicked", self.refresh_all)
+        button_box.pack_start(btn_refresh, True, True, 0)
+        
+        # Botón Detener Todo
+        btn_stop_all = Gtk.Button(label="Detener Todo")
+        btn_stop_all.get_style_context().add_class("destructive-action")
+        btn_stop_all.connect("clicked", self.stop_all)
+        button_box.pack_start(btn_stop_all, True, True, 0)
+        
+        # Botón Activar Todo
+        btn_dev = Gtk.Button(label="Activar Todo")
+        btn_dev.get_style_context().add_class("suggested-action")
+        btn_dev.connect("clicked", self.activate_all)
+        button_box.pack_start(btn_dev, True, True, 0)
+        
+        vbox.pack_end(button_box, False, False, 0)
+        
+        self.broker_source = None  # Conexión al broker pendiente
+        
+        # Estados de systemd por señales D-Bus; el sondeo adaptativo queda para lo demás.
+        # Se arranca cuando se conoce qué servicios existen.
+        self.systemd_watcher = SystemdWatcher(
+            self.on_watcher_changes, self.update_polling, self.on_unit_files_changed
+        )
+        self.connect("destroy", lambda w: self.systemd_watcher.stop())
+        self.pm2_watcher = PM2Watcher(
+            [s["service"] for s in SERVICES_CONFIG if s.get("backend") == "pm2"],
+            lambda name, event: GLib.idle_add(self.poller.request, [name]),
+            lambda: GLib.idle_add(self.update_polling)
+        )
+        self.connect("destroy", lambda w: self.pm2_watcher.stop())
+        
+        # Parada automática de los servicios con política "idle" que nadie usa
+        self.idle_monitor = IdleMonitor(
+            SERVICES_CONFIG,
+            lambda name, reclaimed: GLib.idle_add(self.on_idle_stop, name, reclaimed),
+            lambda: [row.service_name for row in self.service_rows if row.is_operating]
+        )
+        self.idle_monitor.start()
+        self.connect("destroy", lambda w: self.idle_monitor.stop())
+        
+        # El archivo de ~/.config/dragwaysk-panel se aplica al guardarlo, solo con las filas que cambian
+        self.config_watcher = ConfigWatcher(
+            lambda services, profiles: GLib.idle_add(self.on_config_changed, services, profiles),
+            lambda error: GLib.idle_add(self.show_notification, f"✗ Configuración no aplicada: {error}", Gtk.MessageType.ERROR)
+        )
+        self.config_watcher.start()
+        self.connect("destroy", lambda w: self.config_watcher.stop())
+        
+        # Sin sondeo mientras la ventana está minimizada u oculta; al recuperar el foco se pone al día
+        self.connect("window-state-event", self._on_window_state)
+        self.connect("unmap-event", lambda w, e: self.pause_refresh())
+        self.connect("focus-in-event", lambda w, e: self.resume_refresh())
+        self.connect("destroy", lambda w: logging.info(f"Actividad del panel: {COUNTERS.summary()}"))
+        GLib.unix_signal_add(GLib.PRIORITY_DEFAULT, signal.SIGUSR1, self._log_counters)
+        
+        # La ventana se pinta con filas de marcador; existencia y estado llegan en segundo plano
+        self.first_draw_handler = self.connect("draw", self._on_first_draw)
+        self.on_unit_files_changed()
+        self.profiler.mark("ventana construida")
+        
+        logging.info("Panel de control iniciado")
+
+    def apply_custom_css(self):
+        """Aplica el tema oscuro de dragwaysk-panel.css (se analiza una sola vez por proceso)"""
+        provider = ControlPanelWindow._css_provider
+        if provider is None:
+            css_path = os.path.join(ServiceValidator.get_scripts_dir(), "dragwaysk-panel.css")
+            provider = Gtk.CssProvider()
+            try:
+                provider.load_from_path(css_path)
+            except GLib.Error as e:
+                logging.warning(f"No se pudo cargar el tema {css_path}: {e}")
+                return False
+            ControlPanelWindow._css_provider = provider
+        Gtk.StyleContext.add_provider_for_screen(
+            Gdk.Screen.get_default(),
+            provider,
+            Gtk.STYLE_PROVIDER_PRIORITY_APPLICATION
+        )
+        self.profiler.mark("estilos aplicados")
+        return False  # No repetir
+
+    def show_notification(self, message, msg_type=Gtk.MessageType.INFO):
+        """Muestra una notificación en la barra de información"""
+        self.info_label.set_text(message)
+        self.info_bar.set_message_type(msg_type)
+        self.info_bar.set_revealed(True)
+        
+        # Auto-ocultar después de 5 segundos
+        GLib.timeout_add_seconds(5, lambda: self.info_bar.set_revealed(False))
+        
+        logging.info(f"Notificación: {message}")
+
+    def apply_statuses(self, changes):
+        """Aplica en el hilo principal los estados que cambiaron"""
+        for row in self.service_rows:
+            if row.service_name in changes and not row.is_operating:  # No actualizar si está en operación
+                row.check_status(changes[row.service_name])
+        self._check_populated()
+        if self.reconciler.enabled:
+            self.reconcile(changes)
+        return False  # No repetir
+
+    def reconcile(self, statuses):
+        """Compara los estados que llegaron con los deseados y arma el temporizador del próximo reintento"""
+        self.reconciler.observe(statuses)
+        if self.reconcile_source is not None:
+            GLib.source_remove(self.reconcile_source)
+            self.reconcile_source = None
+        wait = self.reconciler.next_retry()
+        if wait is not None:
+            self.reconcile_source = GLib.timeout_add(int(max(wait, 1) * 1000), self.on_reconcile_timer)
+
+    def on_reconcile_timer(self):
+        """Venció un backoff: se revisan esos servicios con su último estado conocido"""
+        self.reconcile_source = None
+        self.reconcile({name: self.poller.last_statuses.get(name) for name in self.reconciler.due()})
+        return False  # reconcile() arma el siguiente
+
+    def on_reconcile_toggled(self, check):
+        self.reconciler.set_enabled(check.get_active())
+        if check.get_active():
+            self.reconcile(dict(self.poller.last_statuses))
+        elif self.reconcile_source is not None:
+            GLib.source_remove(self.reconcile_source)
+            self.reconcile_source = None
+
+    def on_reconcile_progress(self, service_name, action, phase, elapsed):
+        """Avance de un reinicio del reconciliador en su fila (desde los hilos de la cola)"""
+        for row in self.service_rows:
+            if row.service_name == service_name:
+                row.on_operation_progress(service_name, action, phase, elapsed)
+
+    def on_drift(self, service_name, desired, actual, what):
+        """Avisa de un servicio que no está como se pidió"""
+        label = ServiceValidator.get_config(service_name).get("label", service_name)
+        messages = {
+            "restart": (f"↻ {label} cayó ({actual}): reiniciando", Gtk.MessageType.WARNING),
+            "backoff": (f"↻ {label} sigue caído: se reintentará en breve", Gtk.MessageType.WARNING),
+            "gave-up": (f"✗ {label} cae una y otra vez: no se reintenta más", Gtk.MessageType.ERROR),
+            "drift": (f"⚠ {label} está activo pero se pidió detenido", Gtk.MessageType.WARNING),
+        }
+        self.show_notification(*messages[what])
+        return False  # No repetir
+
+    def active_services(self):
+        return [row.service_name for row in self.service_rows if row.service_exists and row.switch.get_active()]
+
+    def update_resource_timer(self):
+        """Arma el temporizador de consumo solo si la ventana se ve y hay algún servicio activo"""
+        wanted = not self.scheduler.paused and bool(self.active_services())
+        if wanted and self.resource_source is None:
+            self.resource_source = GLib.timeout_add_seconds(RESOURCE_INTERVAL, self.sample_resources)
+            self.sample_resources(rearm=False)
+        elif not wanted and self.resource_source is not None:
+            GLib.source_remove(self.resource_source)
+            self.resource_source = None
+
+    def sample_resources(self, rearm=True):
+        """Lee el consumo de los servicios activos en el pool (una pasada por sus archivos)"""
+        COUNTERS.add_wakeup()
+        names = self.active_services()
+        if not names:
+            if rearm:
+                self.resource_source = None
+            return False
+        
+        def run():
+            try:
+                samples = self.resources.sample(names)
+            except Exception as e:
+                logging.error(f"Error midiendo consumo: {e}")
+                return
+            GLib.idle_add(self.apply_resources, samples)
+        self.poller.executor.submit(run)
+        return rearm
+
+    def apply_resources(self, samples):
+        for row in self.service_rows:
+            if row.service_name in samples and row.switch.get_active():
+                row.set_resources(samples[row.service_name], self.resources.history(row.service_name))
+        return False  # No repetir
+
+    def on_idle_stop(self, service_name, reclaimed):
+        """Avisa de un servicio detenido por inactividad y refresca su fila"""
+        label = ServiceValidator.get_config(service_name).get("label", service_name)
+        self.show_notification(
+            f"⏾ {label} detenido por inactividad ({ResourceMonitor.format_bytes(reclaimed)} liberados)",
+            Gtk.MessageType.INFO
+        )
+        self.poller.request([service_name], force=True)
+        return False  # No repetir
+
+    def refresh_all(self, widget=None):
+        """Refresca el estado de todos los servicios"""
+        self.poller.request(
+            [row.service_name for row in self.service_rows if row.service_exists],
+            force=True
+        )
+        self.show_notification("Actualizando estados...", Gtk.MessageType.INFO)
+        return False
+
+    def on_watcher_changes(self, statuses):
+        """Recibe en el hilo principal los cambios notificados por D-Bus"""
+        changes = self.poller.remember(statuses)
+        if changes:
+            self.apply_statuses(changes)
+
+    def _on_first_draw(self, widget, cr):
+        """Marca el primer frame pintado"""
+        self.disconnect(self.first_draw_handler)
+        self.profiler.mark("primer frame")
+        return False
+
+    def _check_populated(self):
+        """Marca el arranque como completo cuando todas las filas muestran su estado real"""
+        if "filas pobladas" not in self.profiler.marks and all(row.status_known for row in self.service_rows):
+            self.profiler.mark("filas pobladas")
+
+    def on_unit_files_changed(self):
+        """Vuelve a comprobar en segundo plano qué servicios están instalados"""
+        def recheck():
+            existing = ServiceValidator.services_exist([row.service_name for row in self.service_rows])
+            GLib.idle_add(self._apply_existence, existing)
+        self.poller.executor.submit(recheck)
+
+    def _apply_existence(self, existing):
+        """Aplica en el hilo principal los cambios de existencia y pide el estado de los nuevos"""
+        appeared = []
+        for row in self.service_rows:
+            if existing[row.service_name] != row.service_exists:
+                row.set_service_exists(existing[row.service_name])
+                if row.service_exists:
+                    appeared.append(row.service_name)
+        
+        # Sin conexión (la primera vez o tras cerrarse el bus) se suscribe con todos los servicios
+        # systemd existentes; con ella solo se agregan los que aparecieron
+        if self.systemd_watcher.bus is None:
+            units = [row.service_name for row in self.service_rows if row.service_exists]
+            self.systemd_watcher.start([name for name in units if ServiceValidator.backend_name(name) == "systemd"])
+        else:
+            self.systemd_watcher.watch([name for name in appeared if ServiceValidator.backend_name(name) == "systemd"])
+        if any(ServiceValidator.backend_name(name) == "pm2" for name in appeared):
+            self.pm2_watcher.start()
+        if self.broker_source is None and not self.broker.connected:
+            self.broker_source = GLib.idle_add(self.connect_broker)
+        self.update_polling()
+        
+        if appeared:
+            self.poller.request(appeared, force=True)
+        self._check_populated()
+        return False  # No repetir
+
+    def on_config_changed(self, services, profiles):
+        """Aplica el archivo de configuración editado: solo se quitan y crean las filas que cambiaron"""
+        added, removed, changed = ServiceConfig.apply(services, profiles)
+        self.fill_profiles()
+        if not (added or removed or changed):
+            return False  # No repetir
+        
+        gone = set(removed) | set(changed)  # Una entrada cambiada se rehace con su nueva configuración
+        kept = {}
+        for row in self.service_rows:
+            if row.service_name not in gone:
+                kept[row.service_name] = row
+                continue
+            if row.log_pane is not None:
+                row.log_pane.close()
+            self.resources.forget(row.service_name)
+            self.poller.last_statuses.pop(row.service_name, None)
+            self.listbox.remove(row)
+            row.destroy()
+        self.systemd_watcher.unwatch(gone)
+        self.pm2_watcher.process_names = {s["service"] for s in SERVICES_CONFIG if s.get("backend") == "pm2"}
+        self.idle_monitor.set_services(SERVICES_CONFIG)
+        
+        self.service_rows = []
+        for index, service in enumerate(SERVICES_CONFIG):
+            row = kept.get(service["service"])
+            if row is None:
+                row = ServiceRow(service, self)
+                self.listbox.insert(row, index)
+                row.show_all()
+            self.service_rows.append(row)
+        
+        # Una sola comprobación de existencia en lote; solo las filas nuevas se sondean
+        self.on_unit_files_changed()
+        self.show_notification(
+            f"Configuración recargada: {len(added)} nuevos, {len(removed)} quitados, {len(changed)} cambiados",
+            Gtk.MessageType.INFO
+        )
+        return False  # No repetir
+
+    def fill_profiles(self):
+        """Opciones del selector de perfiles (se rehacen al recargar la configuración)"""
+        self.profile_combo.remove_all()
+        self.profile_combo.append("", "Cambiar a perfil...")
+        for name, services in PROFILES.items():
+            self.profile_combo.append(name, f"{name} ({', '.join(services)})")
+        self.profile_combo.set_active_id("")
+        self.profile_combo.set_visible(bool(PROFILES))
+
+    def polled_rows(self):
+        """Filas cuyo estado no llega por D-Bus ni por el bus de PM2 y hay que sondear"""
+        watched = self.systemd_watcher.watched_services() | self.pm2_watcher.watched_services()
+        return [row for row in self.service_rows if row.service_exists and row.service_name not in watched]
+
+    def update_polling(self):
+        """Sondea solo los servicios sin notificaciones (sin temporizador si no queda ninguno)"""
+        rows = self.polled_rows()
+        if self.broker.connected:
+            # El broker sondea y avisa los cambios; aquí no hace falta temporizador. Con la ventana
+            # oculta no se suscribe a nada, para que el broker no siga sondeando por ella
+            self.broker.subscribe(not self.scheduler.paused and [row.service_name for row in rows] or [])
+            rows = []
+        self.scheduler.set_services([ServiceValidator.get_config(row.service_name) for row in rows])
+        return False  # No repetir
+
+    def connect_broker(self):
+        """Se conecta al broker de estados en segundo plano (lo lanza si no está corriendo)"""
+        def run():
+            if self.broker.connect():
+                logging.info("Estados compartidos por el broker")
+            GLib.idle_add(self.update_polling)
+            GLib.idle_add(self._broker_attempt_done)
+        self.poller.executor.submit(run)
+        return False  # No repetir
+
+    def _broker_attempt_done(self):
+        self.broker_source = None
+        return False
+
+    def on_broker_statuses(self, statuses, full):
+        """Estados del broker: completos al responder una consulta, solo cambios en los avisos"""
+        changes = self.poller.remember(statuses)
+        self.apply_statuses(full and statuses or changes)
+        return False  # No repetir
+
+    def on_broker_closed(self):
+        """El broker terminó: se vuelve al sondeo propio y se reintenta más tarde"""
+        logging.warning("Broker de estados desconectado, se usará sondeo propio")
+        self.update_polling()
+        if self.broker_source is None:
+            self.broker_source = GLib.timeout_add_seconds(10, self.connect_broker)
+        return False  # No repetir
+
+    def auto_refresh(self, service_names):
+        """Sondea los servicios que venció el planificador"""
+        operating = {row.service_name for row in self.service_rows if row.is_operating}
+        names = [name for name in service_names if name not in operating]  # No actualizar si está en operación
+        if names:
+            self.poller.request(names)
+
+    def _on_window_state(self, widget, event):
+        """Pausa el sondeo al minimizar y lo reanuda al restaurar"""
+        if event.new_window_state & (Gdk.WindowState.ICONIFIED | Gdk.WindowState.WITHDRAWN):
+            self.pause_refresh()
+        elif self.scheduler.paused:
+            self.resume_refresh()
+        return False
+
+    def pause_refresh(self):
+        """Sin sondeo de estados ni de consumo mientras la ventana no se ve"""
+        self.scheduler.pause()
+        self.update_polling()
+        self.update_resource_timer()
+
+    def resume_refresh(self):
+        self.scheduler.resume()
+        self.update_polling()
+        if self.broker.connected:
+            # Lo que cambió mientras estaba oculta: el broker responde con el estado completo
+            self.poller.request([row.service_name for row in self.polled_rows()])
+        self.update_resource_timer()
+
+    def _log_counters(self):
+        """kill -USR1 <pid> deja en el log los contadores de despertares y procesos"""
+        logging.info(f"Actividad del panel: {COUNTERS.summary()}")
+        return True  # Mantener el manejador
+
+    def run_bulk_action(self, service_names, action):
+        """Lanza la acción en lote con el orquestador, mostrando el avance en cada fila"""
+        verb = action == "start" and "activados" or "detenidos"
+        self.run_bulk_actions({action: service_names}, f"✓ Todos los servicios {verb}")
+
+    def run_bulk_actions(self, actions, done_message, plan=None):
+        """Ejecuta {acción: servicios} a la vez con el orquestador; plan(orquestador) puede calcularlas en el hilo"""
+        rows = {row.service_name: row for row in self.service_rows}
+        
+        def on_progress(service_name, action, phase, elapsed):
+            GLib.idle_add(rows[service_name].set_operation_progress, action, phase, elapsed)
+        
+        orchestrator = ServiceOrchestrator(SERVICES_CONFIG, on_progress=on_progress)
+        
+        def run():
+            start = time.monotonic()
+            try:
+                results = orchestrator.run_many(plan(orchestrator) if plan else actions)
+            except Exception as e:
+                GLib.idle_add(self.show_notification, f"Error operando servicios: {e}", Gtk.MessageType.ERROR)
+                return
+            
+            elapsed = time.monotonic() - start
+            failed = [name for name, (success, error_msg, seconds) in results.items() if not success]
+            if failed:
+                GLib.idle_add(
+                    self.show_notification,
+                    f"✗ Fallaron {len(failed)} servicios: {', '.join(failed)}",
+                    Gtk.MessageType.ERROR
+                )
+            else:
+                GLib.idle_add(
+                    self.show_notification,
+                    f"{done_message} en {elapsed:.1f} s",
+                    Gtk.MessageType.INFO
+                )
+        
+        thread = threading.Thread(target=run)
+        thread.daemon = True
+        thread.start()
+
+    def on_profile_selected(self, combo):
+        """Pasa al perfil elegido: un lote por backend para detener y otro para iniciar, a la vez"""
+        profile = combo.get_active_id()
+        if not profile:
+            return
+        combo.set_active_id("")  # El selector es una acción, no un estado
+        installed = [row.service_name for row in self.service_rows if row.service_exists]
+        
+        def plan(orchestrator):
+            # Estados frescos en el hilo del orquestador, no los de la última actualización de la ventana
+            to_stop, to_start = orchestrator.profile_diff(
+                PROFILES[profile], ServiceValidator.get_services_status(installed)
+            )
+            logging.info(f"Perfil {profile}: detener {to_stop}, iniciar {to_start}")
+            return {"stop": to_stop, "start": to_start}
+        
+        self.show_notification(f"Cambiando al perfil {profile}...", Gtk.MessageType.INFO)
+        self.run_bulk_actions({}, f"✓ Perfil {profile} activo", plan)
+
+    def activate_all(self, widget):
+        """Activa todos los servicios disponibles"""
+        available_services = [row.service_name for row in self.service_rows if row.service_exists]
+        
+        if not available_services:
+            self.show_notification("No hay servicios disponibles para activar", Gtk.MessageType.WARNING)
+            return
+        
+        self.show_notification(f"Activando {len(available_services)} servicios...", Gtk.MessageType.INFO)
+        self.run_bulk_action(available_services, "start")
+
+    def stop_all(self, widget):
+        """Detiene todos los servicios disponibles"""
+        available_services = [row.service_name for row in self.service_rows if row.service_exists]
+        
+        if not available_services:
+            self.show_notification("No hay servicios disponibles para detener", Gtk.MessageType.WARNING)
+            return
+        
+        # Diálogo de confirmación
+        dialog = Gtk.MessageDialog(
+            transient_for=self,
+            flags=0,
+            message_type=Gtk.MessageType.WARNING,
+            buttons=Gtk.ButtonsType.YES_NO,
+            text="¿Detener todos los servicios?"
+        )
+        dialog.format_secondary_text(
+            f"Se detendrán {len(available_services)} servicios. ¿Continuar?"
+        )
+        
+        response = dialog.run()
+        dialog.destroy()
+        
+        if response != Gtk.ResponseType.YES:
+            return
+        
+        self.show_notification(f"Deteniendo {len(available_services)} servicios...", Gtk.MessageType.INFO)
+        self.run_bulk_action(available_services, "stop")
+
+def main(args, t0=None):
+    """Abre la ventana y ejecuta el bucle de GTK hasta cerrarla"""
+    profiler = StartupProfiler(echo=args.profile_startup, t0=t0, exit_when_populated=args.exit_after_startup)
+    profiler.mark("GTK importado")
+    win = ControlPanelWindow(profiler)
+    win.connect("destroy", Gtk.main_quit)
+    win.show_all()
+    profiler.mark("show_all")
+    Gtk.main()
+    return 0
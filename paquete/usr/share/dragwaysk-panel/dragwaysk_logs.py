@@ -0,0 +1,326 @@
+#!/usr/bin/env python3
+"""Registro en vivo de los servicios para el Dragwaysk Control Center
+
+Las unidades de systemd se siguen con un solo 'journalctl -f -o json' para todas las
+filas abiertas (se relanza cuando cambia el conjunto de unidades) y los logs de PM2
+con inotify sobre su directorio, sin sondear. Cada servicio guarda sus líneas en un
+LogBuffer de tamaño fijo: un servicio muy verboso descarta las más viejas en lugar de
+hacer crecer la memoria. No importa GTK.
+"""
+import collections
+import json
+import os
+import select
+import subprocess
+import threading
+import time
+import logging
+
+from dragwaysk_core import COUNTERS, Inotify, ServiceValidator
+
+MAX_LINES = 2000        # Líneas por servicio
+MAX_LINE_LENGTH = 4096  # Caracteres por línea (el resto se corta)
+BACKLOG_LINES = 200     # Historial que se carga al abrir el registro
+BACKLOG_BYTES = 65536   # Ídem para los archivos de PM2
+
+# Prioridades de syslog que usa el journal (0 emerg ... 7 debug)
+PRIORITY_ERROR = 3
+PRIORITY_WARNING = 4
+PRIORITY_INFO = 6
+
+
+class LogBuffer:
+    """Últimas MAX_LINES líneas de un servicio; seq numera las líneas para leer solo las nuevas"""
+
+    def __init__(self, max_lines=MAX_LINES):
+        self.lines = collections.deque(maxlen=max_lines)  # (seq, instante, prioridad, mensaje)
+        self.seq = 0
+        self.last_timestamp = 0.0  # Para descartar el historial repetido al relanzar journalctl
+        self._lock = threading.Lock()
+
+    def append(self, timestamp, priority, message):
+        with self._lock:
+            self.seq += 1
+            self.lines.append((self.seq, timestamp, priority, message[:MAX_LINE_LENGTH]))
+            self.last_timestamp = max(self.last_timestamp, timestamp)
+
+    def since(self, seq):
+        """Líneas posteriores a seq (de la más vieja a la más nueva)"""
+        with self._lock:
+            newer = []
+            for line in reversed(self.lines):
+                if line[0] <= seq:
+                    break
+                newer.append(line)
+        newer.reverse()
+        return newer
+
+    def search(self, text="", max_priority=7, lines=None):
+        """Líneas con prioridad igual o más grave que max_priority que contienen text (sin distinguir mayúsculas)"""
+        if lines is None:
+            with self._lock:
+                lines = list(self.lines)
+        text = text.lower()
+        return [
+            line for line in lines
+            if line[2] <= max_priority and (not text or text in line[3].lower())
+        ]
+
+
+class JournalFollower:
+    """Un solo 'journalctl -f -o json' para todas las unidades que se están mirando"""
+
+    def __init__(self, on_entry):
+        self.on_entry = on_entry  # (unidad, instante, prioridad, mensaje); desde el hilo lector
+        self.units = set()
+        self.process = None
+        self._lock = threading.Lock()
+
+    def follow(self, units):
+        """Reemplaza las unidades seguidas relanzando journalctl (o terminándolo si no queda ninguna)"""
+        with self._lock:
+            units = set(units)
+            if units == self.units and self.process is not None:
+                return
+            self.units = units
+            self._stop_process()
+            if not units:
+                return
+            cmd = ["journalctl", "-f", "-o", "json", "--no-pager", "-n", str(BACKLOG_LINES)]
+            for unit in sorted(units):
+                cmd += ["-u", unit]
+            try:
+                COUNTERS.add_fork()
+                self.process = subprocess.Popen(
+                    cmd,
+                    stdin=subprocess.DEVNULL,
+                    stdout=subprocess.PIPE,
+                    stderr=subprocess.DEVNULL
+                )
+            except OSError as e:
+                logging.error(f"No se pudo seguir el journal: {e}")
+                return
+            reader = threading.Thread(target=self._read, args=(self.process, units), name="journal-follow")
+            reader.daemon = True
+            reader.start()
+
+    def close(self):
+        with self._lock:
+            self.units = set()
+            self._stop_process()
+
+    def _stop_process(self):
+        if self.process is not None and self.process.poll() is None:
+            self.process.terminate()
+        self.process = None
+
+    def _read(self, process, units):
+        for line in process.stdout:
+            entry = self.parse(line)
+            if entry is None:
+                continue
+            unit, timestamp, priority, message = entry
+            if unit not in units:
+                continue
+            self.on_entry(unit, timestamp, priority, message)
+        process.wait()
+
+    @staticmethod
+    def parse(line):
+        """Línea JSON del journal -> (unidad, instante, prioridad, mensaje), o None"""
+        try:
+            entry = json.loads(line)
+        except ValueError:
+            return None
+        message = entry.get("MESSAGE")
+        if isinstance(message, list):
+            message = bytes(message).decode(errors="replace")  # Mensajes binarios llegan como bytes
+        if not isinstance(message, str):
+            return None
+        # Los mensajes de systemd sobre la unidad ("Failed to start ...") llevan UNIT en lugar de _SYSTEMD_UNIT
+        unit = entry.get("UNIT") or entry.get("_SYSTEMD_UNIT")
+        try:
+            priority = int(entry.get("PRIORITY", PRIORITY_INFO))
+            timestamp = int(entry.get("__REALTIME_TIMESTAMP", 0)) / 1e6 or time.time()
+        except ValueError:
+            priority, timestamp = PRIORITY_INFO, time.time()
+        return unit, timestamp, priority, message.rstrip("\n")
+
+
+class FileTailer:
+    """Sigue archivos de log con inotify sobre sus directorios; soporta rotación y truncado"""
+
+    POLL_SECONDS = 1.0  # Solo si inotify no está disponible
+
+    def __init__(self, on_line):
+        self.on_line = on_line  # (ruta, línea); desde el hilo del tailer
+        self.files = {}         # ruta -> {"offset", "inode", "partial"}
+        self.dirs = {}          # wd -> directorio
+        self._lock = threading.Lock()
+        self._thread = None
+        self._stop_read, self._stop_write = os.pipe()
+        try:
+            self.inotify = Inotify()
+        except (OSError, AttributeError) as e:
+            logging.warning(f"inotify no disponible, los logs se leerán cada segundo: {e}")
+            self.inotify = None
+
+    def add(self, path):
+        """Empieza a seguir el archivo con las últimas BACKLOG_BYTES como historial"""
+        with self._lock:
+            if path in self.files:
+                return
+            self.files[path] = {"offset": None, "inode": None, "partial": b""}
+            directory = os.path.dirname(path)
+            if self.inotify is not None and directory not in self.dirs.values():
+                try:
+                    wd = self.inotify.add_watch(directory, Inotify.IN_MODIFY | Inotify.IN_CREATE | Inotify.IN_MOVED_TO)
+                    self.dirs[wd] = directory
+                except OSError as e:
+                    logging.warning(f"No se puede vigilar {directory}: {e}")
+        self._read_new(path)
+        if self._thread is None:
+            self._thread = threading.Thread(target=self._run, name="log-tail")
+            self._thread.daemon = True
+            self._thread.start()
+
+    def remove(self, path):
+        with self._lock:
+            self.files.pop(path, None)
+
+    def close(self):
+        os.write(self._stop_write, b"x")
+
+    def _run(self):
+        watched = [self._stop_read] + ([self.inotify.fd] if self.inotify is not None else [])
+        timeout = None if self.inotify is not None else self.POLL_SECONDS
+        while True:
+            readable, _, _ = select.select(watched, [], [], timeout)
+            COUNTERS.add_wakeup()
+            if self._stop_read in readable:
+                break
+            if self.inotify is None:
+                changed = list(self.files)
+            else:
+                changed = set()
+                for wd, mask, name in self.inotify.read_events():
+                    directory = self.dirs.get(wd)
+                    if directory is not None:
+                        changed.add(os.path.join(directory, name))
+            for path in changed:
+                if path in self.files:
+                    self._read_new(path)
+        if self.inotify is not None:
+            self.inotify.close()
+
+    def _read_new(self, path):
+        """Lee lo añadido desde la última vez; si el archivo rotó o se truncó, empieza de nuevo"""
+        with self._lock:
+            state = self.files.get(path)
+            if state is None:
+                return
+            first = state["offset"] is None
+            try:
+                with open(path, "rb") as f:
+                    stat = os.fstat(f.fileno())
+                    if first:
+                        offset = max(stat.st_size - BACKLOG_BYTES, 0)  # Primera lectura: solo el final
+                    elif stat.st_ino != state["inode"] or stat.st_size < state["offset"]:
+                        offset, state["partial"] = 0, b""
+                    else:
+                        offset = state["offset"]
+                    f.seek(offset)
+                    data = f.read()
+            except OSError:
+                return
+            state["inode"] = stat.st_ino
+            state["offset"] = offset + len(data)
+            chunks = (state["partial"] + data).split(b"\n")
+            state["partial"] = chunks.pop()[-MAX_LINE_LENGTH:]
+            if first and offset > 0 and chunks:
+                chunks.pop(0)  # La primera línea del historial suele estar cortada
+        for chunk in chunks:
+            if chunk:
+                self.on_line(path, chunk.decode(errors="replace"))
+
+
+class LogStreamer:
+    """Registro de cada servicio: resuelve sus fuentes por backend y reparte las líneas en sus LogBuffer"""
+
+    def __init__(self):
+        self.buffers = {}     # servicio -> LogBuffer
+        self.watching = {}    # servicio -> fuente (ver ServiceBackend.log_sources)
+        self.units = {}       # unidad -> servicio
+        self.paths = {}       # ruta -> (servicio, prioridad)
+        self.journal = JournalFollower(self._on_journal)
+        self.tailer = None    # FileTailer, creado al primer archivo
+        self._lock = threading.Lock()
+
+    def buffer(self, service_name):
+        with self._lock:
+            return self.buffers.setdefault(service_name, LogBuffer())
+
+    def watch(self, service_name):
+        """Empieza a seguir el registro del servicio (bloquea: llamar fuera del hilo de la interfaz)"""
+        self.buffer(service_name)
+        config = ServiceValidator.get_config(service_name)
+        backend = ServiceValidator.get_backend(config)
+        source = backend and backend.log_sources([config]).get(service_name)
+        if source is None:
+            return False
+        with self._lock:
+            self.watching[service_name] = source
+        kind, target = source
+        if kind == "journal":
+            with self._lock:
+                self.units[target] = service_name
+            self._follow_units()
+        else:
+            if self.tailer is None:
+                self.tailer = FileTailer(self._on_file_line)
+            for path, priority in target:
+                with self._lock:
+                    self.paths[path] = (service_name, priority)
+                self.tailer.add(path)
+        return True
+
+    def unwatch(self, service_name):
+        """Deja de seguirlo (el buffer se conserva para cuando se vuelva a abrir)"""
+        with self._lock:
+            source = self.watching.pop(service_name, None)
+        if source is None:
+            return
+        kind, target = source
+        if kind == "journal":
+            with self._lock:
+                self.units.pop(target, None)
+            self._follow_units()
+        else:
+            for path, priority in target:
+                with self._lock:
+                    self.paths.pop(path, None)
+                self.tailer.remove(path)
+
+    def close(self):
+        self.journal.close()
+        if self.tailer is not None:
+            self.tailer.close()
+
+    def _follow_units(self):
+        with self._lock:
+            units = set(self.units)
+        self.journal.follow(units)
+
+    def _on_journal(self, unit, timestamp, priority, message):
+        service_name = self.units.get(unit)
+        if service_name is None:
+            return
+        buffer = self.buffer(service_name)
+        if timestamp <= buffer.last_timestamp:
+            return  # Historial ya cargado antes de relanzar journalctl
+        buffer.append(timestamp, priority, message)
+
+    def _on_file_line(self, path, line):
+        service_name, priority = self.paths.get(path, (None, PRIORITY_INFO))
+        if service_name is not None:
+            self.buffer(service_name).append(time.time(), priority, line)
@@ -0,0 +1,174 @@
+#!/usr/bin/env python3
+"""Proxy de arranque bajo demanda del Dragwaysk Control Center
+
+Escucha en un puerto propio por cada servicio con "on_demand" en SERVICES_CONFIG y
+reenvía las conexiones al puerto real. Si el servicio está detenido, la primera
+conexión lo inicia (con el mismo ayudante privilegiado que la ventana) y queda en
+espera hasta que pasa sus sondas de "ready"; las que llegan mientras tanto esperan
+al mismo arranque. Así PostgreSQL o MariaDB no ocupan memoria hasta que alguien los usa.
+
+    {"label": "PostgreSQL", "service": "postgresql", ...,
+     "on_demand": {"listen": 6432, "target": 5432, "idle_timeout": 600}}
+
+Los clientes se configuran contra "listen" (p. ej. 127.0.0.1:6432). Con "idle_timeout"
+se cierran las conexiones que pasan esos segundos sin tráfico en ningún sentido, para que
+un cliente olvidado no mantenga el servicio activo frente a la parada por inactividad.
+Se ejecuta con 'dragwaysk-panel proxy' y termina con Ctrl+C.
+"""
+import select
+import socket
+import threading
+import logging
+
+from dragwaysk_core import COUNTERS, OPERATIONS, PrivilegedHelper, probe_address
+
+BUFFER_SIZE = 65536
+
+
+class OnDemandProxy:
+    """Un puerto de escucha para un servicio; arranca el servicio con la primera conexión"""
+
+    def __init__(self, service_name, listen, target, ensure_started=None, connect_timeout=5, idle_timeout=None):
+        self.service_name = service_name
+        self.listen = probe_address(listen)
+        self.target = probe_address(target)
+        self.ensure_started = ensure_started or self._start_service  # () -> (listo, error)
+        self.connect_timeout = connect_timeout
+        self.idle_timeout = idle_timeout  # Segundos sin tráfico antes de cerrar una conexión (None: sin límite)
+        self.server = None
+        self._start_lock = threading.Lock()  # Las conexiones simultáneas esperan a un solo arranque
+        self._stopped = threading.Event()
+
+    def bind(self):
+        """Abre el puerto de escucha (antes de lanzar el hilo, para fallar pronto si está ocupado)"""
+        server = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+        server.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+        server.bind(self.listen)
+        server.listen(64)
+        server.settimeout(1.0)
+        self.server = server
+        self.listen = server.getsockname()  # Con puerto 0 el sistema elige uno
+        logging.info(f"Proxy de {self.service_name}: {self.listen[0]}:{self.listen[1]} -> {self.target[0]}:{self.target[1]}")
+
+    def serve(self):
+        """Acepta conexiones hasta stop(); cada una se atiende en su propio hilo"""
+        if self.server is None:
+            self.bind()
+        try:
+            while not self._stopped.is_set():
+                try:
+                    client, _ = self.server.accept()
+                except socket.timeout:
+                    continue
+                except OSError:
+                    break
+                thread = threading.Thread(target=self._handle, args=(client,), name=f"proxy-{self.service_name}")
+                thread.daemon = True
+                thread.start()
+        finally:
+            self.server.close()
+
+    def stop(self):
+        self._stopped.set()
+
+    def _connect_target(self):
+        return socket.create_connection(self.target, timeout=self.connect_timeout)
+
+    def _handle(self, client):
+        """Conecta con el servicio (iniciándolo si hace falta) y copia datos en ambos sentidos"""
+        upstream = self._open_upstream()
+        if upstream is None:
+            client.close()
+            return
+        with client, upstream:
+            upstream.settimeout(None)
+            if not self.pipe(client, upstream, self.idle_timeout):
+                logging.info(f"Proxy de {self.service_name}: conexión cerrada tras {self.idle_timeout} s sin tráfico")
+
+    def _open_upstream(self):
+        """Conexión con el servicio; si está detenido el cliente espera aquí hasta que esté listo"""
+        try:
+            return self._connect_target()
+        except OSError:
+            pass
+        with self._start_lock:
+            try:
+                return self._connect_target()  # Otra conexión ya lo inició mientras esperábamos
+            except OSError:
+                pass
+            ready, error_msg = self.ensure_started()
+            if not ready:
+                logging.error(f"Proxy de {self.service_name}: no se pudo iniciar: {error_msg}")
+                return None
+            try:
+                return self._connect_target()
+            except OSError as e:
+                logging.error(f"Proxy de {self.service_name}: sin conexión con {self.target}: {e}")
+                return None
+
+    @staticmethod
+    def pipe(a, b, idle_timeout=None):
+        """Copia datos entre los dos sockets hasta que uno cierra; False si se cortó por idle_timeout"""
+        peers = {a: b, b: a}
+        open_ends = {a, b}
+        while open_ends:
+            readable, _, _ = select.select(list(open_ends), [], [], idle_timeout)
+            if not readable:
+                return False  # Quien llama cierra ambos extremos
+            for sock in readable:
+                try:
+                    data = sock.recv(BUFFER_SIZE)
+                except OSError:
+                    data = b""
+                if data:
+                    try:
+                        peers[sock].sendall(data)
+                        continue
+                    except OSError:
+                        return True
+                # Medio cierre: el otro extremo aún puede terminar de responder
+                open_ends.discard(sock)
+                try:
+                    peers[sock].shutdown(socket.SHUT_WR)
+                except OSError:
+                    return True
+        return True
+
+    def _start_service(self):
+        """Inicia el servicio y espera a sus sondas de disponibilidad"""
+        logging.info(f"Proxy de {self.service_name}: primera conexión, iniciando el servicio")
+        COUNTERS.add_wakeup()
+        ready, error_msg, seconds = OPERATIONS.run([self.service_name], "start")[self.service_name]
+        logging.info(f"Proxy de {self.service_name}: {ready and 'listo' or 'sin respuesta'} tras {seconds:.1f} s")
+        return ready, error_msg
+
+
+def proxies_for(services_config, service_names=None):
+    """Un OnDemandProxy por cada entrada con "on_demand" (opcionalmente solo las indicadas)"""
+    proxies = []
+    for service in services_config:
+        spec = service.get("on_demand")
+        if not spec or (service_names and service["service"] not in service_names):
+            continue
+        proxies.append(OnDemandProxy(service["service"], spec["listen"], spec["target"], idle_timeout=spec.get("idle_timeout")))
+    return proxies
+
+
+def serve_all(proxies):
+    """Atiende todos los proxies hasta KeyboardInterrupt"""
+    for proxy in proxies:
+        if proxy.server is None:
+            proxy.bind()
+    threads = []
+    for proxy in proxies:
+        thread = threading.Thread(target=proxy.serve, name=f"proxy-{proxy.service_name}")
+        thread.daemon = True
+        thread.start()
+        threads.append(thread)
+    try:
+        for thread in threads:
+            thread.join()
+    finally:
+        for proxy in proxies:
+            proxy.stop()
+        PrivilegedHelper.shared().close()
@@ -38,4 +38,6 @@ pm2 save
 
 echo "✅ Shinobi iniciado correctamente"
 echo "📊 Accede a Shinobi en: http://localhost:8080"
-pm2 list
+# La tabla solo se muestra en una terminal (el panel no la necesita y cada 'pm2' arranca Node)
+[ -t 1 ] && pm2 list
+exit 0
@@ -12,7 +12,7 @@ if ! command -v pm2 &> /dev/null; then
 fi
 
 # Verificar si Shinobi está corriendo
-if ! pm2 list | grep -q "shinobi"; then
+if ! pm2 describe shinobi > /dev/null 2>&1; then
     echo "⚠️  Shinobi no está en ejecución"
     exit 0
 fi
@@ -24,4 +24,6 @@ pm2 stop shinobi
 pm2 save
 
 echo "✅ Shinobi detenido correctamente"
-pm2 list
+# La tabla solo se muestra en una terminal (el panel no la necesita y cada 'pm2' arranca Node)
+[ -t 1 ] && pm2 list
+exit 0
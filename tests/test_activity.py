@@ -0,0 +1,56 @@
+"""Sondas de actividad de "idle" contra un árbol de cgroups armado en un directorio temporal"""
+import os
+import sys
+import tempfile
+import unittest
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from dragwaysk_core import ACTIVITY_PROBES, ResourceMonitor
+
+CONTAINER_ID = "4f3c2b1a" * 8
+
+
+class ContainersActivityTest(unittest.TestCase):
+
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.saved_root = ResourceMonitor.CGROUP_ROOT
+        ResourceMonitor.CGROUP_ROOT = self.tmp.name
+
+    def tearDown(self):
+        ResourceMonitor.CGROUP_ROOT = self.saved_root
+        self.tmp.cleanup()
+
+    def make(self, *paths):
+        for path in paths:
+            os.makedirs(os.path.join(self.tmp.name, path))
+
+    def active(self):
+        return ACTIVITY_PROBES["containers"](True, "docker", None)
+
+    def test_systemd_driver(self):
+        self.make("system.slice/docker.service", f"system.slice/docker-{CONTAINER_ID}.scope")
+        self.assertTrue(self.active())
+
+    def test_cgroupfs_driver(self):
+        self.make("system.slice/docker.service", f"docker/{CONTAINER_ID}")
+        self.assertTrue(self.active())
+
+    def test_cgroups_v1(self):
+        self.make("memory/system.slice/docker.service", f"memory/docker/{CONTAINER_ID}")
+        self.assertTrue(self.active())
+
+    def test_no_containers(self):
+        self.make("system.slice/docker.service", "docker")
+        with open(os.path.join(self.tmp.name, "docker", "cgroup.procs"), "w"):
+            pass
+        self.assertFalse(self.active())
+
+    def test_unreadable_counts_as_active(self):
+        self.assertTrue(self.active())  # Ningún directorio conocido: nunca se detiene por error
+
+
+if __name__ == "__main__":
+    unittest.main()
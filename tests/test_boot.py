@@ -0,0 +1,149 @@
+"""BootAnalyzer contra salidas capturadas de systemd-analyze (tests/fixtures)"""
+import json
+import os
+import sys
+import tempfile
+import unittest
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from dragwaysk_core import TRACER, BootAnalyzer
+
+
+def fixture(name):
+    with open(os.path.join(ROOT, "tests", "fixtures", name), encoding="utf-8") as f:
+        return f.read()
+
+
+class FixtureAnalyzer(BootAnalyzer):
+    """Responde con las salidas capturadas en lugar de ejecutar systemd-analyze"""
+
+    def __init__(self, enabled):
+        self.enabled = enabled
+        self.commands = []
+
+    def _systemd(self, cmd):
+        self.commands.append(cmd)
+        if cmd[:2] == ["systemd-analyze", "blame"]:
+            return fixture("systemd-analyze-blame.txt")
+        if cmd[:2] == ["systemd-analyze", "critical-chain"]:
+            return fixture("systemd-analyze-critical-chain.txt")
+        return "".join(self.enabled[unit] + "\n" for unit in cmd[2:])
+
+
+class TimespanTest(unittest.TestCase):
+
+    def test_units(self):
+        cases = {
+            "8.123s": 8.123,
+            "345ms": 0.345,
+            "12us": 12e-6,
+            "12µs": 12e-6,
+            "1min 2.345s": 62.345,
+            "2h 3min": 7380,
+            "1d 1h": 90000,
+        }
+        for text, seconds in cases.items():
+            self.assertAlmostEqual(BootAnalyzer.parse_timespan(text), seconds, msg=text)
+
+    def test_not_a_timespan(self):
+        for text in ("", "@8.1s", "8.1", "s", "abc", "1min x", "1.2.3s"):
+            self.assertIsNone(BootAnalyzer.parse_timespan(text), msg=text)
+
+
+class BlameTest(unittest.TestCase):
+
+    def test_parse(self):
+        blame = BootAnalyzer.parse_blame(fixture("systemd-analyze-blame.txt"))
+        self.assertEqual(
+            sorted(blame),
+            ["apt-daily.service", "docker.service", "mariadb.service", "postgresql.service", "sys-kernel-tracing.mount"]
+        )
+        self.assertAlmostEqual(blame["apt-daily.service"], 62.345)
+        self.assertAlmostEqual(blame["docker.service"], 8.123)
+        self.assertAlmostEqual(blame["postgresql.service"], 0.345)
+        self.assertAlmostEqual(blame["sys-kernel-tracing.mount"], 12e-6)
+
+    def test_ignores_noise(self):
+        self.assertEqual(BootAnalyzer.parse_blame("\nBootup is not yet finished.\n   \n"), {})
+
+
+class CriticalChainTest(unittest.TestCase):
+
+    def setUp(self):
+        self.chain = BootAnalyzer.parse_critical_chain(fixture("systemd-analyze-critical-chain.txt"))
+
+    def test_headers_are_skipped(self):
+        self.assertNotIn("The", self.chain)
+        self.assertEqual(len(self.chain), 9)
+
+    def test_offsets_and_deltas(self):
+        self.assertEqual(self.chain["docker.service"], {"at": 55.9, "took": 8.22})
+        self.assertEqual(self.chain["containerd.service"], {"at": 54.1, "took": 1.8})
+        self.assertAlmostEqual(self.chain["NetworkManager.service"]["took"], 0.48)
+
+    def test_minutes_in_offset(self):
+        self.assertAlmostEqual(self.chain["graphical.target"]["at"], 64.123)
+        self.assertAlmostEqual(self.chain["multi-user.target"]["at"], 64.12)
+
+    def test_units_without_delta(self):
+        self.assertEqual(self.chain["network-online.target"], {"at": 54.0, "took": 0.0})
+        self.assertEqual(self.chain["sysinit.target"]["took"], 0.0)
+
+
+class AnalyzeTest(unittest.TestCase):
+
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.saved_path = TRACER.path
+        TRACER.path = os.path.join(self.tmp.name, "operation-latency.json")
+        with open(TRACER.path, "w") as f:
+            json.dump({"shinobi/start": {"phases": {
+                "authorization": {"count": 2, "sum": 1.0},
+                "execution": {"count": 2, "sum": 3.0},
+                "confirmation": {"count": 2, "sum": 0.6},
+            }}}, f)
+
+    def tearDown(self):
+        TRACER.path = self.saved_path
+        self.tmp.cleanup()
+
+    def test_report(self):
+        analyzer = FixtureAnalyzer({"docker.service": "enabled", "postgresql.service": "disabled", "mariadb.service": "enabled"})
+        report = {entry["service"]: entry for entry in analyzer.analyze(["docker", "postgresql", "mariadb", "shinobi"])}
+
+        docker = report["docker"]
+        self.assertEqual((docker["seconds"], docker["source"], docker["critical"]), (8.123, "blame", True))
+        self.assertEqual(docker["suggestion"], "deshabilitar y usar bajo demanda")
+
+        postgresql = report["postgresql"]
+        self.assertEqual((postgresql["critical"], postgresql["enabled"]), (False, "disabled"))
+        self.assertEqual(postgresql["suggestion"], "puede arrancar con el sistema")
+
+        self.assertEqual(report["mariadb"]["suggestion"], "deshabilitar y usar bajo demanda")
+
+        # PM2: systemd no la conoce, se estima con las trazas del panel (media de ejecución y confirmación;
+        # la autorización es el tiempo de escribir la contraseña y no cuenta)
+        shinobi = report["shinobi"]
+        self.assertEqual((shinobi["source"], shinobi["critical"], shinobi["enabled"]), ("panel", False, None))
+        self.assertAlmostEqual(shinobi["seconds"], 1.8)
+        self.assertEqual(shinobi["suggestion"], "mantener bajo demanda")
+
+        is_enabled = [cmd for cmd in analyzer.commands if cmd[0] == "systemctl"]
+        self.assertEqual(is_enabled, [["systemctl", "is-enabled", "docker.service", "postgresql.service", "mariadb.service"]])
+
+    def test_authorization_alone_is_no_estimate(self):
+        with open(TRACER.path, "w") as f:
+            json.dump({"shinobi/start": {"phases": {"authorization": {"count": 1, "sum": 9.0}}}}, f)
+        (entry,) = FixtureAnalyzer({}).analyze(["shinobi"])
+        self.assertEqual((entry["seconds"], entry["source"]), (None, None))
+
+    def test_critical_chain_delta_without_blame(self):
+        analyzer = FixtureAnalyzer({"containerd.service": "enabled"})
+        (entry,) = analyzer.analyze(["containerd"])
+        self.assertEqual((entry["seconds"], entry["source"]), (1.8, "critical-chain"))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,79 @@
+"""Broker de estados: directorio privado del socket y fin por inactividad sin despertares periódicos"""
+import os
+import sys
+import tempfile
+import threading
+import time
+import unittest
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+import dragwaysk_broker
+from dragwaysk_broker import BrokerClient, StatusBroker
+
+
+class RuntimeDirTest(unittest.TestCase):
+
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.saved = os.environ.get("XDG_RUNTIME_DIR")
+        os.environ["XDG_RUNTIME_DIR"] = self.tmp.name
+        self.path = os.path.join(self.tmp.name, "dragwaysk-panel")
+
+    def tearDown(self):
+        if self.saved is None:
+            del os.environ["XDG_RUNTIME_DIR"]
+        else:
+            os.environ["XDG_RUNTIME_DIR"] = self.saved
+        self.tmp.cleanup()
+
+    def test_created_private(self):
+        self.assertEqual(dragwaysk_broker.runtime_dir(), self.path)
+        self.assertEqual(os.stat(self.path).st_mode & 0o777, 0o700)
+        self.assertEqual(dragwaysk_broker.runtime_dir(), self.path)  # Ya existía y es nuestro
+
+    def test_open_to_others_is_refused(self):
+        os.mkdir(self.path)
+        os.chmod(self.path, 0o777)
+        with self.assertLogs(level="ERROR"):
+            self.assertIsNone(dragwaysk_broker.socket_path())
+        self.assertFalse(BrokerClient().connect())
+        self.assertEqual(StatusBroker().serve(), 1)
+
+    def test_symlink_is_refused(self):
+        target = os.path.join(self.tmp.name, "de-otro")
+        os.mkdir(target, 0o700)
+        os.symlink(target, self.path)
+        with self.assertLogs(level="ERROR"):
+            self.assertIsNone(dragwaysk_broker.runtime_dir())
+
+
+class ServeTest(unittest.TestCase):
+
+    def test_ends_when_idle(self):
+        with tempfile.TemporaryDirectory() as tmp:
+            path = os.path.join(tmp, "broker.sock")
+            broker = StatusBroker(path, idle_seconds=0.3)
+            result = []
+            thread = threading.Thread(target=lambda: result.append(broker.serve()), daemon=True)
+            thread.start()
+
+            client = BrokerClient(path=path)
+            deadline = time.monotonic() + 5
+            while not client.connect(spawn=False):
+                self.assertLess(time.monotonic(), deadline)
+                time.sleep(0.02)
+            self.assertTrue(client.subscribe([]))
+            time.sleep(0.5)  # Con un cliente conectado no termina
+            self.assertTrue(thread.is_alive())
+
+            client.close()
+            thread.join(3)
+            self.assertFalse(thread.is_alive())
+            self.assertEqual(result, [0])
+            self.assertFalse(os.path.exists(path))
+
+
+if __name__ == "__main__":
+    unittest.main()
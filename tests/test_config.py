@@ -0,0 +1,167 @@
+"""ServiceConfig: validación de services.toml/services.json antes de aplicar nada"""
+import json
+import os
+import sys
+import tempfile
+import unittest
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from dragwaysk_core import PROFILES, SERVICES_CONFIG, ConfigError, ServiceConfig
+
+
+def config(*entries, profiles=None):
+    data = {"services": list(entries)}
+    if profiles is not None:
+        data["profiles"] = profiles
+    return data
+
+
+DB = {"service": "postgresql"}
+APP = {"service": "app", "backend": "process", "command": ["node", "server.js"], "requires": ["postgresql"]}
+
+
+class ValidateTest(unittest.TestCase):
+
+    def assertInvalid(self, data, message):
+        with self.assertRaises(ConfigError) as caught:
+            ServiceConfig.validate(data)
+        self.assertIn(message, str(caught.exception))
+
+    def test_valid(self):
+        services, profiles = ServiceConfig.validate(config(
+            dict(DB, ready={"postgres": 5432}, idle={"minutes": 15, "activity": {"connections": "127.0.0.1:5432"}}),
+            dict(APP, label="App & API", on_demand={"listen": 8080, "target": "127.0.0.1:18080"}),
+            profiles={"web": ["postgresql", "app"]}
+        ))
+        self.assertEqual(profiles, {"web": ["postgresql", "app"]})
+        self.assertEqual(services[0]["label"], "postgresql")  # Valores por defecto
+        self.assertEqual(services[0]["icon"], "system-run")
+        self.assertEqual(services[1]["label"], "App & API")
+
+    def test_structure(self):
+        self.assertInvalid({}, "Falta la lista \"services\"")
+        self.assertInvalid(config("postgresql"), "services[0]: debe ser una tabla")
+        self.assertInvalid(config({"label": "Sin nombre"}), "falta \"service\"")
+        self.assertInvalid(config({"service": 5}), "falta \"service\"")
+        self.assertInvalid(config(DB, DB), "servicio repetido")
+        self.assertInvalid(config(dict(DB, colour="red")), "clave desconocida \"colour\"")
+
+    def test_types(self):
+        self.assertInvalid(config(dict(DB, label=5)), "\"label\" tiene un tipo inválido")
+        self.assertInvalid(config(dict(DB, poll_interval=True)), "\"poll_interval\" debe ser un número mayor que 0")
+        self.assertInvalid(config(dict(DB, poll_interval=0)), "\"poll_interval\" debe ser un número mayor que 0")
+        self.assertInvalid(config(dict(DB, requires="mariadb")), "\"requires\" debe ser una lista de textos")
+        self.assertInvalid(config(dict(DB, scripts={"start": 1})), "\"scripts\" debe ser una tabla de textos")
+
+    def test_command(self):
+        self.assertInvalid(config(DB, dict(APP, command=[])), "\"command\" debe ser una lista no vacía de textos")
+        self.assertInvalid(config(DB, dict(APP, command="node server.js")), "\"command\" debe ser una lista no vacía")
+        self.assertInvalid(config(DB, dict(APP, command=["node", 1])), "\"command\" debe ser una lista no vacía")
+        app = dict(APP)
+        del app["command"]
+        self.assertInvalid(config(DB, app), "el backend process necesita \"command\"")
+
+    def test_backend(self):
+        self.assertInvalid(config(dict(DB, backend="launchd")), "backend desconocido \"launchd\"")
+
+    def test_ports(self):
+        for port in (0, 65536, -1, "db:99999", "db:", "5432x", 54.32, True):
+            self.assertInvalid(config(dict(DB, ready={"tcp": port})), "\"ready.tcp\" debe ser un puerto")
+        for port in (1, 65535, "5432", "db.local:5432"):
+            ServiceConfig.validate(config(dict(DB, ready={"tcp": port})))
+        self.assertInvalid(
+            config(dict(DB, on_demand={"listen": 70000, "target": 5432})), "\"on_demand.listen\" debe ser un puerto"
+        )
+
+    def test_ready(self):
+        self.assertInvalid(config(dict(DB, ready={"ping": "db"})), "\"ready\" necesita una sonda de")
+        self.assertInvalid(config(dict(DB, ready=[{"tcp": 5432}, "unix"])), "\"ready\" necesita una sonda de")
+        self.assertInvalid(config(dict(DB, ready={"http": "http://localhost", "status": "200"})), "\"ready.status\"")
+        self.assertInvalid(config(dict(DB, ready={"command": []})), "\"ready.command\" debe ser una lista no vacía")
+        ServiceConfig.validate(config(dict(DB, ready=[{"unix": "/run/postgresql/.s.PGSQL.5432"}, {"postgres": 5432}])))
+
+    def test_idle_and_on_demand(self):
+        self.assertInvalid(config(dict(DB, idle={"minutes": -5})), "\"idle.minutes\"")
+        self.assertInvalid(config(dict(DB, idle={"activity": {"queries": 1}})), "sonda de actividad desconocida: queries")
+        self.assertInvalid(config(dict(DB, idle={"activity": {"cpu": "2"}})), "\"idle.activity.cpu\"")
+        self.assertInvalid(config(dict(DB, on_demand={"listen": 5432})), "necesita \"listen\" y \"target\"")
+        self.assertInvalid(
+            config(dict(DB, on_demand={"listen": 6432, "target": 5432, "idle_timeout": 0})), "\"on_demand.idle_timeout\""
+        )
+
+    def test_dependencies(self):
+        self.assertInvalid(config(APP), "\"requires\" nombra un servicio no configurado: postgresql")
+        self.assertInvalid(config(dict(DB, requires=["app"]), APP), "Dependencias circulares")
+        self.assertInvalid(config(dict(DB, requires=["postgresql"])), "Dependencias circulares")
+
+    def test_profiles(self):
+        self.assertInvalid(config(DB, profiles=["postgresql"]), "\"profiles\" debe ser una tabla")
+        self.assertInvalid(config(DB, profiles={"web": ["nginx"]}), "profiles.web: debe listar servicios configurados")
+        self.assertInvalid(config(DB, profiles={"web": "postgresql"}), "profiles.web")
+
+
+class LoadTest(unittest.TestCase):
+
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.saved = os.environ.get("XDG_CONFIG_HOME")
+        os.environ["XDG_CONFIG_HOME"] = self.tmp.name
+        self.dir = ServiceConfig.config_dir()
+        os.makedirs(self.dir)
+        self.saved_config = (list(SERVICES_CONFIG), dict(PROFILES))
+
+    def tearDown(self):
+        SERVICES_CONFIG[:] = self.saved_config[0]
+        PROFILES.clear()
+        PROFILES.update(self.saved_config[1])
+        if self.saved is None:
+            del os.environ["XDG_CONFIG_HOME"]
+        else:
+            os.environ["XDG_CONFIG_HOME"] = self.saved
+        self.tmp.cleanup()
+
+    def write(self, name, text):
+        path = os.path.join(self.dir, name)
+        with open(path, "w") as f:
+            f.write(text)
+        return path
+
+    def test_without_file(self):
+        self.assertIsNone(ServiceConfig.load())
+        self.assertIsNone(ServiceConfig.load_user())
+        self.assertEqual(SERVICES_CONFIG, self.saved_config[0])
+
+    def test_toml(self):
+        self.write("services.toml", '[[services]]\nservice = "postgresql"\n\n[profiles]\ndb = ["postgresql"]\n')
+        self.assertIsNotNone(ServiceConfig.load_user())
+        self.assertEqual([s["service"] for s in SERVICES_CONFIG], ["postgresql"])
+        self.assertEqual(PROFILES, {"db": ["postgresql"]})
+
+    def test_errors_name_the_file(self):
+        path = self.write("services.toml", "[[services]\n")
+        with self.assertRaisesRegex(ConfigError, "services.toml"):
+            ServiceConfig.load()
+        os.unlink(path)
+        self.write("services.json", json.dumps(config({"service": "postgresql", "ready": {"tcp": 0}})))
+        with self.assertRaisesRegex(ConfigError, "services.json: .*ready.tcp"):
+            ServiceConfig.load()
+
+    def test_invalid_file_keeps_the_defaults(self):
+        self.write("services.json", json.dumps(config(APP)))
+        with self.assertLogs(level="ERROR"):
+            self.assertIsNone(ServiceConfig.load_user())
+        self.assertEqual(SERVICES_CONFIG, self.saved_config[0])
+        self.assertEqual(PROFILES, self.saved_config[1])
+
+    def test_apply_reports_the_diff(self):
+        ServiceConfig.apply([DB, APP], {})
+        changed = dict(APP, command=["node", "worker.js"])
+        self.assertEqual(
+            ServiceConfig.apply([changed, {"service": "redis"}], {}), (["redis"], ["postgresql"], ["app"])
+        )
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,60 @@
+"""EventLog con varios procesos escribiendo y rotando el mismo events-<componente>.jsonl"""
+import os
+import subprocess
+import sys
+import tempfile
+import unittest
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from dragwaysk_core import EventLog
+
+WRITER = """
+import sys
+sys.path.insert(0, {root!r})
+import dragwaysk_core
+dragwaysk_core.EventLog.MAX_BYTES = 4096  # Muchas rotaciones durante la prueba
+dragwaysk_core.EventLog.BACKUPS = 1000    # Sin descartar ninguna: todo registro debe aparecer
+dragwaysk_core.EventLog.setup("cli")
+for n in range({records}):
+    dragwaysk_core.log_event("prueba", "registro " + "x" * 80, writer={writer}, n=n)
+"""
+
+
+class SharedEventLogTest(unittest.TestCase):
+
+    PROCESSES = 6
+    RECORDS = 400
+
+    def test_concurrent_writers_lose_nothing(self):
+        with tempfile.TemporaryDirectory() as tmp:
+            env = dict(os.environ, XDG_STATE_HOME=tmp)
+            writers = [
+                subprocess.Popen(
+                    [sys.executable, "-c", WRITER.format(root=ROOT, records=self.RECORDS, writer=writer)], env=env
+                )
+                for writer in range(self.PROCESSES)
+            ]
+            for writer in writers:
+                self.assertEqual(writer.wait(60), 0)
+
+            saved = os.environ.get("XDG_STATE_HOME")
+            os.environ["XDG_STATE_HOME"] = tmp
+            try:
+                entries = EventLog.read(events={"prueba"})
+            finally:
+                if saved is None:
+                    del os.environ["XDG_STATE_HOME"]
+                else:
+                    os.environ["XDG_STATE_HOME"] = saved
+            files = os.listdir(os.path.join(tmp, "dragwaysk-panel"))
+
+        self.assertGreater(len([name for name in files if name.startswith("events-cli.jsonl.")]), 10)
+        written = sorted((entry["writer"], entry["n"]) for entry in entries)
+        expected = [(writer, n) for writer in range(self.PROCESSES) for n in range(self.RECORDS)]
+        self.assertEqual(written, expected)  # Ni perdidos ni repetidos
+
+
+if __name__ == "__main__":
+    unittest.main()
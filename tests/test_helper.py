@@ -0,0 +1,123 @@
+"""dragwaysk-helper.py a través de PrivilegedHelper con un systemctl simulado: validación de unidades y lotes"""
+import os
+import subprocess
+import sys
+import tempfile
+import threading
+import unittest
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from dragwaysk_core import TRACER, PrivilegedHelper
+
+HELPER_PATH = os.path.join(ROOT, "dragwaysk-helper.py")
+
+# Anota cada llamada en LOG y falla (como systemctl) si el lote incluye la unidad "roto"
+FAKE_SYSTEMCTL = """#!/bin/sh
+echo "$*" >> "{log}"
+for unit in "$@"; do
+    if [ "$unit" = roto ]; then
+        echo "Job for roto.service failed." >&2
+        exit 1
+    fi
+done
+exit 0
+"""
+
+
+class HelperTest(unittest.TestCase):
+
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.saved_path = TRACER.path
+        TRACER.path = os.path.join(self.tmp.name, "operation-latency.json")
+        self.log = os.path.join(self.tmp.name, "calls.log")
+        self.fake = os.path.join(self.tmp.name, "systemctl")
+        with open(self.fake, "w") as f:
+            f.write(FAKE_SYSTEMCTL.format(log=self.log))
+        os.chmod(self.fake, 0o755)
+        # Como root el ayudante rechaza --systemctl: se usa el "systemctl" por defecto encontrado en PATH
+        path = f"{self.tmp.name}{os.pathsep}{os.environ.get('PATH', '')}"
+        self.helper = PrivilegedHelper(["env", f"PATH={path}", sys.executable, HELPER_PATH])
+
+    def tearDown(self):
+        self.helper.close()
+        TRACER.path = self.saved_path
+        self.tmp.cleanup()
+
+    def calls(self):
+        if not os.path.exists(self.log):
+            return []
+        with open(self.log) as f:
+            return f.read().splitlines()
+
+    def test_batch_is_one_systemctl_call(self):
+        result = self.helper.run_batch("start", ["postgresql", "docker.service", "getty@tty1"])
+        self.assertEqual(result, (True, None, {"postgresql": True, "docker.service": True, "getty@tty1": True}))
+        self.assertEqual(self.calls(), ["start -- postgresql docker.service getty@tty1"])
+
+    def test_failed_batch_is_retried_per_unit(self):
+        ok, error, per_unit = self.helper.run_batch("restart", ["postgresql", "roto"])
+        self.assertFalse(ok)
+        self.assertEqual(error, "Job for roto.service failed.")
+        self.assertEqual(per_unit, {"postgresql": True, "roto": False})
+        self.assertEqual(self.calls(), ["restart -- postgresql roto", "restart -- postgresql", "restart -- roto"])
+
+    def test_invalid_units_never_reach_systemctl(self):
+        for units in (["-H", "remoto"], ["--force"], ["a b"], ["postgresql;reboot"], ["../etc/passwd"], [""], [5], []):
+            ok, error, per_unit = self.helper.run_batch("stop", units)
+            self.assertFalse(ok, units)
+            self.assertIn("Unidades no válidas", error)
+            self.assertEqual(per_unit, {})
+        self.assertEqual(self.calls(), [])
+
+    def test_only_allowed_actions(self):
+        for action in ("enable", "mask", "daemon-reload", None):
+            self.assertEqual(self.helper.run(action, ["postgresql"]), (False, f"Acción no permitida: {action}"))
+        self.assertEqual(self.calls(), [])
+
+    def test_concurrent_requests_get_their_own_reply(self):
+        results = {}
+
+        def request(index):
+            units = [f"unidad{index}", index % 2 and "roto" or "postgresql"]
+            results[index] = self.helper.run_batch("start", units)
+
+        threads = [threading.Thread(target=request, args=(index,)) for index in range(6)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join(30)
+        for index, (ok, error, per_unit) in results.items():
+            self.assertEqual(ok, not index % 2)
+            self.assertEqual(per_unit[f"unidad{index}"], True)
+        self.assertEqual(len(results), 6)
+        self.assertEqual(self.helper.process.poll(), None)  # Un solo ayudante para todas
+
+    def test_closing_ends_the_helper(self):
+        self.helper.run("start", ["postgresql"])
+        process = self.helper.process
+        self.helper.close()
+        self.assertEqual(process.wait(5), 0)
+
+    @unittest.skipIf(os.geteuid() == 0, "como root --systemctl se rechaza")
+    def test_custom_systemctl(self):
+        helper = PrivilegedHelper([sys.executable, HELPER_PATH, "--systemctl", self.fake])
+        self.addCleanup(helper.close)
+        self.assertEqual(helper.run("stop", ["postgresql"]), (True, None))
+        self.assertEqual(self.calls(), ["stop -- postgresql"])
+
+    @unittest.skipUnless(os.geteuid() == 0, "solo como root")
+    def test_root_refuses_custom_systemctl(self):
+        result = subprocess.run(
+            [sys.executable, HELPER_PATH, "--systemctl", self.fake], stdin=subprocess.DEVNULL, capture_output=True
+        )
+        self.assertEqual(result.returncode, 2)
+        helper = PrivilegedHelper([sys.executable, HELPER_PATH, "--systemctl", self.fake])
+        self.assertEqual(helper.run("start", ["postgresql"]), (False, "No se pudo iniciar el ayudante privilegiado (código 2)"))
+        self.assertEqual(self.calls(), [])
+
+
+if __name__ == "__main__":
+    unittest.main()
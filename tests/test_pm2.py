@@ -0,0 +1,202 @@
+"""PM2Client y PM2Watcher contra un demonio de PM2 simulado (rpc.sock y pub.sock en un PM2_HOME temporal)"""
+import os
+import queue
+import socket
+import sys
+import tempfile
+import threading
+import time
+import unittest
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from dragwaysk_core import PM2Client, PM2Watcher
+
+pack = PM2Client.pack
+
+
+def process(pm_id, name, status):
+    """Entrada de getMonitorData como la entrega PM2 (solo lo que lee el panel y algo de ruido)"""
+    return {
+        "pm_id": pm_id, "name": name, "pid": status == "online" and 4000 + pm_id or 0,
+        "monit": {"memory": 1024, "cpu": 0},
+        "pm2_env": {"status": status, "restart_time": 0, "pm_exec_path": f"/srv/{name}/app.js"},
+    }
+
+
+class FakePM2Daemon:
+    """rpc.sock responde como pm2-axon-rpc ([{"args": [resultado]} | {"error"}, id]); pub.sock emite eventos"""
+
+    def __init__(self, home):
+        self.processes = [process(0, "shinobi", "online"), process(1, "worker", "stopped"), process(2, "api", "errored")]
+        self.calls = []
+        self.split_replies = False  # Partir cada respuesta en varios envíos
+        self.subscribers = queue.Queue()
+        self.rpc = self._listen(os.path.join(home, "rpc.sock"), self._serve_rpc)
+        self.pub = self._listen(os.path.join(home, "pub.sock"), self.subscribers.put)
+
+    @staticmethod
+    def _listen(path, handler):
+        server = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        server.bind(path)
+        server.listen(8)
+
+        def accept():
+            while True:
+                try:
+                    conn, _ = server.accept()
+                except OSError:
+                    return
+                threading.Thread(target=handler, args=(conn,), daemon=True).start()
+        threading.Thread(target=accept, daemon=True).start()
+        return server
+
+    def _serve_rpc(self, conn):
+        buffer = b""
+        with conn:
+            while True:
+                try:
+                    chunk = conn.recv(65536)
+                except OSError:  # El cliente cerró (p. ej. tras una respuesta de error)
+                    return
+                if not chunk:
+                    return
+                messages, buffer = PM2Client.unpack(buffer + chunk)
+                for message in messages:
+                    request, request_id = PM2Client.decode(message[0]), message[-1]
+                    self.calls.append((request["method"], request["args"]))
+                    # Una respuesta atrasada de otra petición: el cliente debe descartarla
+                    conn.sendall(pack([{"args": ["viejo"]}, b"s:otro:0"]))
+                    reply = pack([self.handle(request["method"], request["args"]), request_id])
+                    if self.split_replies:
+                        for i in range(0, len(reply), 3):
+                            conn.sendall(reply[i:i + 3])
+                            time.sleep(0.001)
+                    else:
+                        conn.sendall(reply)
+
+    def handle(self, method, args):
+        if method == "getMonitorData":
+            return {"args": [self.processes]}
+        if method in ("startProcessId", "stopProcessId", "restartProcessId"):
+            pm_id = args[0]["id"] if isinstance(args[0], dict) else args[0]
+            proc = next((p for p in self.processes if p["pm_id"] == pm_id), None)
+            if proc is None:
+                return {"error": f"Process {pm_id} not found"}
+            proc["pm2_env"]["status"] = method == "stopProcessId" and "stopped" or "online"
+            return {"args": [proc]}
+        if method == "dumpProcessList":
+            return {"args": [{"success": True}]}
+        return {"error": f'method "{method}" does not exist'}
+
+    def emit(self, conn, event, name):
+        conn.sendall(pack(["process:event", {"event": event, "process": {"name": name, "pm_id": 0}, "at": 1}]))
+
+    def close(self):
+        self.rpc.close()
+        self.pub.close()
+
+
+class PM2Test(unittest.TestCase):
+
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.daemon = FakePM2Daemon(self.tmp.name)
+        self.client = PM2Client(self.tmp.name)
+
+    def tearDown(self):
+        self.client._close()
+        self.daemon.close()
+        self.tmp.cleanup()
+
+
+class PM2ClientTest(PM2Test):
+
+    def test_pack_roundtrip(self):
+        data = pack(["process:event", {"a": [1, "ñ"]}, b"crudo"])
+        self.assertEqual(data[0], 0x13)
+        messages, rest = PM2Client.unpack(data + data[:5])
+        self.assertEqual(rest, data[:5])  # Mensaje incompleto: queda para el próximo recv
+        self.assertEqual([PM2Client.decode(arg) for arg in messages[0]], ["process:event", {"a": [1, "ñ"]}, b"crudo"])
+
+    def test_statuses_from_get_monitor_data(self):
+        statuses = self.client.get_statuses(["shinobi", "worker", "api", "missing"])
+        self.assertEqual(statuses, {"shinobi": "active", "worker": "inactive", "api": "failed", "missing": "inactive"})
+        self.assertEqual(self.daemon.calls, [("getMonitorData", [{}])])
+
+    def test_reply_split_across_reads(self):
+        self.daemon.split_replies = True
+        self.assertEqual(self.client.get_status("shinobi"), "active")
+
+    def test_connection_is_reused(self):
+        for _ in range(3):
+            self.client.get_statuses(["shinobi"])
+        self.assertEqual(len(self.daemon.calls), 3)
+        self.assertIsNotNone(self.client._sock)
+
+    def test_operate(self):
+        self.assertTrue(self.client.operate("shinobi", "stop"))
+        self.assertEqual(self.daemon.calls[1:], [("stopProcessId", [0]), ("dumpProcessList", [])])
+        self.assertEqual(self.client.get_status("shinobi"), "inactive")
+        self.assertTrue(self.client.operate("worker", "restart", save=False))
+        self.assertEqual(self.daemon.calls[-1], ("restartProcessId", [{"id": 1}]))
+        self.assertEqual(self.client.get_status("worker"), "active")
+        self.assertFalse(self.client.operate("missing", "start"))
+
+    def test_error_reply(self):
+        with self.assertRaisesRegex(RuntimeError, "does not exist"):
+            self.client.call("noSuchMethod")
+
+    def test_without_daemon(self):
+        client = PM2Client(os.path.join(self.tmp.name, "sin-demonio"))
+        self.assertEqual(client.get_statuses(["shinobi"]), {"shinobi": "inactive"})
+        self.assertFalse(client.operate("shinobi", "start"))
+
+
+class PM2WatcherTest(PM2Test):
+
+    def test_events_become_statuses(self):
+        events = queue.Queue()
+        states = queue.Queue()
+        watcher = PM2Watcher(
+            ["shinobi", "worker"],
+            lambda name, event: events.put((name, event, self.client.get_status(name))),
+            lambda: states.put(watcher.connected),
+            client=self.client
+        )
+        watcher.start()
+        try:
+            pub = self.daemon.subscribers.get(timeout=5)
+            self.assertTrue(states.get(timeout=5))
+            self.assertEqual(watcher.watched_services(), {"shinobi", "worker"})
+            # Al conectar se piden todos, por si cambiaron sin eventos
+            connected = sorted(events.get(timeout=5) for _ in range(2))
+            self.assertEqual(connected, [("shinobi", "connected", "active"), ("worker", "connected", "inactive")])
+
+            self.daemon.processes[0]["pm2_env"]["status"] = "errored"
+            pub.sendall(pack(["log:out", {"process": {"name": "shinobi"}, "data": "hola"}]))  # Se ignora
+            self.daemon.emit(pub, "exit", "otro")  # No es de los vigilados
+            self.daemon.emit(pub, "exit", "shinobi")
+            self.assertEqual(events.get(timeout=5), ("shinobi", "exit", "failed"))
+
+            self.daemon.processes[1]["pm2_env"]["status"] = "online"
+            message = pack(["process:event", {"event": "online", "process": {"name": "worker"}}])
+            pub.sendall(message[:7])  # Un evento partido entre dos lecturas
+            time.sleep(0.01)
+            pub.sendall(message[7:])
+            self.assertEqual(events.get(timeout=5), ("worker", "online", "active"))
+            self.assertTrue(events.empty())
+
+            # El demonio se fue: no hay a dónde reconectar y se vuelve a sondear
+            self.daemon.close()
+            os.unlink(self.client.pub_path)
+            pub.close()
+            self.assertFalse(states.get(timeout=5))
+            self.assertEqual(watcher.watched_services(), set())
+        finally:
+            watcher.stop()
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,160 @@
+"""OnDemandProxy contra un backend TCP de prueba que solo escucha cuando el gancho de arranque lo inicia"""
+import os
+import socket
+import sys
+import threading
+import time
+import unittest
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from dragwaysk_proxy import OnDemandProxy
+
+
+class EchoBackend:
+    """Puerto reservado pero sin escuchar (las conexiones se rechazan) hasta start(); devuelve lo recibido en mayúsculas"""
+
+    def __init__(self, delay=0.0):
+        self.delay = delay
+        self.server = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+        self.server.bind(("127.0.0.1", 0))
+        self.address = self.server.getsockname()
+        self.starts = 0
+        self.fail = None
+
+    def start(self):
+        """Gancho ensure_started del proxy"""
+        self.starts += 1
+        if self.fail:
+            return False, self.fail
+        time.sleep(self.delay)  # Las conexiones que llegan mientras tanto deben esperar a este arranque
+        self.server.listen(16)
+        thread = threading.Thread(target=self.accept_loop)
+        thread.daemon = True
+        thread.start()
+        return True, None
+
+    def accept_loop(self):
+        while True:
+            try:
+                client, _ = self.server.accept()
+            except OSError:
+                return
+            thread = threading.Thread(target=self.echo, args=(client,))
+            thread.daemon = True
+            thread.start()
+
+    @staticmethod
+    def echo(client):
+        with client:
+            while True:
+                data = client.recv(65536)
+                if not data:
+                    return
+                client.sendall(data.upper())
+
+    def close(self):
+        self.server.close()
+
+
+class ProxyTest(unittest.TestCase):
+
+    def setUp(self):
+        self.backend = EchoBackend()
+        self.proxy = None
+
+    def tearDown(self):
+        if self.proxy is not None:
+            self.proxy.stop()
+            self.thread.join(5)
+        self.backend.close()
+
+    def serve(self, **options):
+        self.proxy = OnDemandProxy(
+            "eco", "127.0.0.1:0", f"127.0.0.1:{self.backend.address[1]}", ensure_started=self.backend.start, **options
+        )
+        self.proxy.bind()
+        self.thread = threading.Thread(target=self.proxy.serve)
+        self.thread.daemon = True
+        self.thread.start()
+
+    def connect(self):
+        client = socket.create_connection(self.proxy.listen, timeout=5)
+        self.addCleanup(client.close)
+        return client
+
+    @staticmethod
+    def receive(client, size):
+        data = b""
+        while len(data) < size:
+            chunk = client.recv(65536)
+            if not chunk:
+                break
+            data += chunk
+        return data
+
+    def test_bytes_pass_both_ways(self):
+        self.serve()
+        client = self.connect()
+        client.sendall(b"hola")
+        self.assertEqual(self.receive(client, 4), b"HOLA")
+        payload = b"abc" * 100000  # Más que BUFFER_SIZE en cada sentido
+        client.sendall(payload)
+        self.assertEqual(self.receive(client, len(payload)), payload.upper())
+
+    def test_half_close_lets_the_backend_finish(self):
+        self.serve()
+        client = self.connect()
+        client.sendall(b"fin")
+        client.shutdown(socket.SHUT_WR)
+        self.assertEqual(self.receive(client, 4), b"FIN")  # Y luego el cierre del otro lado
+
+    def test_concurrent_connections_share_one_start(self):
+        self.backend.delay = 0.3
+        self.serve()
+        replies = {}
+
+        def client(index):
+            with socket.create_connection(self.proxy.listen, timeout=5) as sock:
+                sock.sendall(f"cliente{index}".encode())
+                replies[index] = self.receive(sock, len(f"cliente{index}"))
+
+        threads = [threading.Thread(target=client, args=(index,)) for index in range(5)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join(10)
+        self.assertEqual(replies, {index: f"CLIENTE{index}".encode() for index in range(5)})
+        self.assertEqual(self.backend.starts, 1)
+        # Con el servicio ya en marcha no se vuelve a llamar al gancho
+        client(5)
+        self.assertEqual(self.backend.starts, 1)
+
+    def test_failed_start_closes_the_client(self):
+        self.backend.fail = "no arrancó"
+        self.serve()
+        with self.assertLogs(level="ERROR"):
+            self.assertEqual(self.connect().recv(16), b"")
+        self.assertEqual(self.backend.starts, 1)
+
+    def test_idle_timeout_closes_the_connection(self):
+        self.serve(idle_timeout=0.3)
+        client = self.connect()
+        client.sendall(b"ping")
+        self.assertEqual(self.receive(client, 4), b"PING")
+        start = time.monotonic()
+        self.assertEqual(client.recv(16), b"")
+        self.assertLess(time.monotonic() - start, 3)
+
+    def test_traffic_keeps_the_connection_open(self):
+        self.serve(idle_timeout=0.5)
+        client = self.connect()
+        for _ in range(6):  # 1.2 s en total, más que idle_timeout
+            time.sleep(0.2)
+            client.sendall(b"x")
+            self.assertEqual(self.receive(client, 1), b"X")
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,142 @@
+"""OperationQueue contra un backend simulado: fusión de peticiones, sin solapamientos por unidad"""
+import os
+import random
+import sys
+import tempfile
+import threading
+import time
+import unittest
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from dragwaysk_core import TRACER, OperationQueue
+
+
+class FakeBackend:
+    """Ejecuta en memoria y anota cada comando; anota también si una unidad recibe otro sin terminar el anterior"""
+
+    def __init__(self, delay=0.0):
+        self.delay = delay
+        self.state = {}
+        self.busy = set()    # Unidades con comando o confirmación en curso
+        self.overlaps = []
+        self.commands = []   # (servicios, acción) por llamada al backend
+        self.gate = threading.Event()
+        self.gate.set()      # clear() retiene los comandos hasta volver a set()
+        self.lock = threading.Lock()
+
+    def run_batch(self, names, action):
+        with self.lock:
+            self.overlaps.extend(self.busy.intersection(names))
+            self.busy.update(names)
+            self.commands.append((sorted(names), action))
+        self.gate.wait(5)
+        time.sleep(random.uniform(0, self.delay))
+        with self.lock:
+            for name in names:
+                self.state[name] = action == "start" and "active" or "inactive"
+        return {name: (True, None) for name in names}
+
+    def wait_ready(self, name, action, cancel):
+        start = time.monotonic()
+        cancelled = cancel.wait(random.uniform(0, self.delay))
+        with self.lock:
+            self.busy.discard(name)
+        return (None if cancelled else True), time.monotonic() - start
+
+
+class QueueTest(unittest.TestCase):
+
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.saved_path = TRACER.path
+        TRACER.path = os.path.join(self.tmp.name, "operation-latency.json")  # No tocar los histogramas reales
+        self.backend = FakeBackend()
+        self.queue = OperationQueue(self.backend.run_batch, self.backend.wait_ready, lambda name: "simulado")
+
+    def tearDown(self):
+        self.backend.gate.set()
+        self.queue.executor.shutdown(wait=True)
+        TRACER.path = self.saved_path
+        self.tmp.cleanup()
+
+    def test_batch_in_one_call(self):
+        results = self.queue.run(["a", "b", "c"], "start")
+        self.assertEqual(self.backend.commands, [(["a", "b", "c"], "start")])
+        self.assertTrue(all(success for success, error, seconds in results.values()))
+
+    def test_pending_requests_collapse(self):
+        self.backend.gate.clear()
+        first = self.queue.submit(["a"], "start")["a"]
+        toggles = [self.queue.submit(["a"], action)["a"] for action in ("stop", "start", "stop")]
+        self.backend.gate.set()
+        # start → stop → start → stop con el start en curso: solo queda el último stop pendiente, y el
+        # start ya ejecutado no espera su confirmación porque lo contradice
+        self.assertEqual(first.result(5)[:2], (False, OperationQueue.SUPERSEDED))
+        self.assertEqual([f.result(5)[:2] for f in toggles[:2]], [(False, OperationQueue.SUPERSEDED)] * 2)
+        self.assertEqual(toggles[2].result(5)[:2], (True, None))
+        self.assertEqual(self.backend.commands, [(["a"], "start"), (["a"], "stop")])
+        self.assertEqual(self.backend.state["a"], "inactive")
+
+    def test_same_action_joins_the_running_one(self):
+        self.backend.gate.clear()
+        futures = [self.queue.submit(["a"], "start")["a"] for _ in range(3)]
+        self.backend.gate.set()
+        self.assertEqual([f.result(5)[:2] for f in futures], [(True, None)] * 3)
+        self.assertEqual(self.backend.commands, [(["a"], "start")])
+
+    def test_cancel_drops_pending(self):
+        self.backend.gate.clear()
+        running = self.queue.submit(["a"], "start")["a"]
+        pending = self.queue.submit(["a"], "stop")["a"]
+        self.queue.cancel(["a"])
+        self.assertEqual(pending.result(5)[:2], (False, OperationQueue.CANCELLED))
+        self.backend.gate.set()
+        running.result(5)
+        self.assertEqual(self.backend.commands, [(["a"], "start")])
+        self.assertFalse(self.queue.is_busy("a"))
+
+    def test_random_toggles_never_overlap_and_the_last_request_wins(self):
+        self.backend.delay = 0.002
+        units = [f"unidad{i}" for i in range(6)]
+        desired = {}   # unidad -> último estado pedido (None tras cancelar)
+        futures = []
+        submit_lock = threading.Lock()
+
+        def client(seed, count):
+            rng = random.Random(seed)
+            for _ in range(count):
+                roll = rng.random()
+                with submit_lock:  # El orden de envío define cuál es la última petición
+                    if roll < 0.02:
+                        name = rng.choice(units)
+                        desired[name] = None
+                        self.queue.cancel([name])
+                        continue
+                    names = roll < 0.05 and units or [rng.choice(units)]
+                    action = rng.choice(("start", "stop"))
+                    for name in names:
+                        desired[name] = action
+                    futures.extend(self.queue.submit(names, action).values())
+                time.sleep(rng.uniform(0, 0.0002))
+
+        threads = [threading.Thread(target=client, args=(seed, 400)) for seed in range(4)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        results = [future.result(timeout=60) for future in futures]
+
+        self.assertEqual(self.backend.overlaps, [])
+        wrong = [
+            name for name, action in desired.items()
+            if action is not None and self.backend.state.get(name) != (action == "start" and "active" or "inactive")
+        ]
+        self.assertEqual(wrong, [])
+        self.assertLess(len(self.backend.commands), len(results))  # Se fusionó algo
+        self.assertFalse(any(self.queue.is_busy(name) for name in units))
+
+
+if __name__ == "__main__":
+    unittest.main()
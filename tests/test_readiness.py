@@ -0,0 +1,45 @@
+"""Sondas de disponibilidad ("ready" en SERVICES_CONFIG) contra sockets locales"""
+import os
+import socket
+import sys
+import tempfile
+import unittest
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from dragwaysk_core import READINESS_PROBES
+
+
+class UnixProbeTest(unittest.TestCase):
+
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.path = os.path.join(self.tmp.name, "daemon.sock")
+        self.server = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        self.server.bind(self.path)
+        self.server.listen(1)
+
+    def tearDown(self):
+        self.server.close()
+        self.tmp.cleanup()
+
+    def probe(self):
+        return READINESS_PROBES["unix"]({"unix": self.path}, 1.0)
+
+    def test_listening(self):
+        self.assertTrue(self.probe())
+
+    def test_orphan_file_is_not_ready(self):
+        self.server.close()  # El archivo queda, pero nadie escucha
+        with self.assertRaises(ConnectionRefusedError):
+            self.probe()
+
+    @unittest.skipIf(os.getuid() == 0, "root conecta sin mirar los permisos del socket")
+    def test_without_permission_trusts_the_backend(self):
+        os.chmod(self.path, 0)  # Como /var/run/docker.sock para quien no está en el grupo docker
+        self.assertTrue(self.probe())
+
+
+if __name__ == "__main__":
+    unittest.main()
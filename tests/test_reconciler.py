@@ -0,0 +1,185 @@
+"""Reconciler con caídas inyectadas en un backend simulado y un reloj simulado, y 'reconcile' sin broker"""
+import json
+import os
+import signal
+import subprocess
+import sys
+import tempfile
+import time
+import unittest
+import uuid
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from dragwaysk_core import TRACER, OperationQueue, ProcessBackend, Reconciler
+
+
+class CrashingBackend:
+    """Cada start deja la unidad activa; la prueba la tira cambiando state"""
+
+    def __init__(self):
+        self.state = {}
+        self.starts = []
+
+    def run_batch(self, names, action):
+        for name in names:
+            self.state[name] = action == "start" and "active" or "inactive"
+            if action == "start":
+                self.starts.append(name)
+        return {name: (True, None) for name in names}
+
+
+class ReconcilerTest(unittest.TestCase):
+
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.saved_path = TRACER.path
+        TRACER.path = os.path.join(self.tmp.name, "operation-latency.json")
+        self.backend = CrashingBackend()
+        self.queue = OperationQueue(self.backend.run_batch, lambda name, action, cancel: (True, 0.0), lambda name: "simulado")
+        self.drifts = []
+        self.reconciler = Reconciler(
+            self.queue, lambda name, desired, actual, what: self.drifts.append((name, actual, what)),
+            path=os.path.join(self.tmp.name, "desired-state.json")
+        ).attach()
+        self.queue.run(["db"], "start")
+        self.backend.starts.clear()
+
+    def tearDown(self):
+        self.queue.executor.shutdown(wait=True)
+        TRACER.path = self.saved_path
+        self.tmp.cleanup()
+
+    def observe(self, status, now):
+        """Lo que haría la ventana: entrega el estado y espera a que termine el reinicio"""
+        restarted = self.reconciler.observe({"db": status}, now)
+        while self.queue.is_busy("db"):
+            time.sleep(0.001)
+        return restarted
+
+    def crash_loop(self, seconds, start=0):
+        """La unidad cae en cuanto arranca; se revisa cada segundo lo que cambió o venció"""
+        for now in range(start, start + seconds):
+            self.backend.state["db"] = "failed"
+            if now == start or self.reconciler.due(now):
+                self.observe("failed", now)
+
+    def test_restarts_a_crashed_service(self):
+        self.backend.state["db"] = "failed"
+        self.assertEqual(self.observe("failed", 0), ["db"])
+        self.assertEqual(self.backend.state["db"], "active")
+        self.assertEqual(self.drifts, [("db", "failed", "restart")])
+        self.assertEqual(self.observe("active", 1), [])
+
+    def test_backoff_and_burst_limit(self):
+        self.crash_loop(600)
+        self.assertEqual(len(self.backend.starts), Reconciler.BURST)
+        self.assertEqual(self.drifts[-1], ("db", "failed", "gave-up"))
+        self.assertIsNone(self.reconciler.next_retry(600))
+
+    def test_backoff_doubles(self):
+        self.backend.state["db"] = "failed"
+        self.observe("failed", 0)
+        self.assertEqual(self.observe("failed", 1), [])  # Dentro del primer backoff
+        self.assertEqual(self.drifts[-1], ("db", "failed", "backoff"))
+        self.assertEqual(self.reconciler.due(4), [])
+        self.assertEqual(self.reconciler.due(5), ["db"])
+        self.assertEqual(self.observe("failed", 5), ["db"])
+        self.assertEqual(self.reconciler.due(14), [])
+        self.assertEqual(self.reconciler.due(15), ["db"])
+
+    def test_giving_up_is_sticky(self):
+        self.crash_loop(600)
+        starts = len(self.backend.starts)
+        # Ni pasado STABLE_SECONDS ni BURST_WINDOW vuelve a reiniciar algo que sigue cayendo
+        for now in (700, 2000, 5000):
+            self.assertEqual(self.observe("failed", now), [])
+            self.assertEqual(self.observe("inactive", now + 1), [])
+        self.assertEqual(len(self.backend.starts), starts)
+
+    def test_stable_again_forgets_the_give_up(self):
+        self.crash_loop(600)
+        self.observe("active", 700)  # Lo levantó otro y se mantiene
+        self.observe("active", 700 + Reconciler.STABLE_SECONDS)
+        self.assertEqual(self.observe("failed", 701 + Reconciler.STABLE_SECONDS), ["db"])
+
+    def test_manual_start_forgets_the_give_up(self):
+        self.crash_loop(600)
+        self.queue.run(["db"], "start")
+        self.backend.state["db"] = "failed"
+        self.assertEqual(self.observe("failed", 601), ["db"])
+
+    def test_unknown_and_transitional_states_are_not_crashes(self):
+        for now, status in enumerate(("error", "unknown", "activating", "deactivating", "reloading", None, "not-found")):
+            self.assertEqual(self.observe(status, now), [])
+        self.assertEqual(self.backend.starts, [])
+        self.assertEqual(self.drifts, [])
+
+    def test_started_by_someone_else_is_only_reported(self):
+        self.queue.run(["db"], "stop")
+        self.assertEqual(self.observe("active", 0), [])
+        self.assertEqual(self.observe("active", 1), [])
+        self.assertEqual(self.drifts, [("db", "active", "drift")])  # Un aviso por cambio
+        self.assertEqual(self.backend.starts, [])
+
+
+class ReconcileCommandTest(unittest.TestCase):
+    """'dragwaysk-panel reconcile' con DRAGWAYSK_NO_BROKER=1 y un servicio "process" real"""
+
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.marker = f"dragwaysk-prueba-{uuid.uuid4().hex}"
+        self.command = [sys.executable, "-c", "import time; time.sleep(120)", self.marker]
+        config_dir = os.path.join(self.tmp.name, "config", "dragwaysk-panel")
+        os.makedirs(config_dir)
+        with open(os.path.join(config_dir, "services.json"), "w") as f:
+            json.dump({"services": [{"service": "dormilon", "backend": "process", "command": self.command}]}, f)
+        state_dir = os.path.join(self.tmp.name, "state", "dragwaysk-panel")
+        os.makedirs(state_dir)
+        with open(os.path.join(state_dir, "desired-state.json"), "w") as f:
+            json.dump({"enabled": True, "desired": {"dormilon": "active"}}, f)
+        self.env = dict(
+            os.environ, DRAGWAYSK_NO_BROKER="1",
+            XDG_CONFIG_HOME=os.path.join(self.tmp.name, "config"), XDG_STATE_HOME=os.path.join(self.tmp.name, "state")
+        )
+        self.children = []
+
+    def tearDown(self):
+        for pid in self.instances():
+            os.kill(pid, signal.SIGKILL)
+        for child in self.children:
+            child.wait()
+        self.tmp.cleanup()
+
+    def instances(self):
+        return [pid for pid, argv in ProcessBackend.scan_processes().items() if self.marker in argv]
+
+    def reconcile(self, seconds):
+        """Corre 'reconcile --json' unos segundos y devuelve las acciones que informó"""
+        process = subprocess.Popen(
+            [sys.executable, os.path.join(ROOT, "dragwaysk-panel.py"), "reconcile", "--json", "--interval", "1", "dormilon"],
+            env=self.env, stdout=subprocess.PIPE, stderr=subprocess.DEVNULL, text=True
+        )
+        time.sleep(seconds)
+        process.send_signal(signal.SIGINT)
+        output, _ = process.communicate(timeout=10)
+        self.assertEqual(process.returncode, 0)
+        return [json.loads(line)["action"] for line in output.splitlines() if line.startswith("{")]
+
+    def test_running_service_is_left_alone(self):
+        self.children.append(subprocess.Popen(self.command, start_new_session=True))
+        deadline = time.monotonic() + 5
+        while not self.instances() and time.monotonic() < deadline:
+            time.sleep(0.05)
+        self.assertEqual(self.reconcile(3), [])
+        self.assertEqual(len(self.instances()), 1)
+
+    def test_down_service_is_started_once(self):
+        # Tras el reinicio vence el backoff (BACKOFF_BASE): se consulta de nuevo y ya está activo
+        self.assertEqual(self.reconcile(Reconciler.BACKOFF_BASE + 2), ["restart"])
+        self.assertEqual(len(self.instances()), 1)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,242 @@
+"""SystemdWatcher contra un systemd simulado en un bus de sesión privado (DRAGWAYSK_SYSTEMD_BUS=session)
+
+Necesita PyGObject y dbus-daemon; sin ellos las pruebas se omiten.
+"""
+import gc
+import os
+import shutil
+import subprocess
+import sys
+import threading
+import time
+import types
+import unittest
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+try:
+    import gi
+    gi.require_version("Gtk", "3.0")
+    from gi.repository import Gio, GLib
+    import dragwaysk_gui
+except (ImportError, ValueError) as e:
+    dragwaysk_gui = None
+    MISSING = f"PyGObject/GTK no disponible: {e}"
+else:
+    MISSING = shutil.which("dbus-daemon") is None and "dbus-daemon no disponible" or None
+
+
+def iterate_until(condition, timeout=5.0):
+    """Atiende el bucle principal (donde llegan las señales) hasta que se cumpla la condición"""
+    context = GLib.MainContext.default()
+    deadline = time.monotonic() + timeout
+    while not condition() and time.monotonic() < deadline:
+        if not context.iteration(False):
+            time.sleep(0.01)
+    return condition()
+
+
+class FakeSystemd(threading.Thread):
+    """org.freedesktop.systemd1 mínimo: Subscribe, LoadUnit y las señales de las unidades
+
+    Atiende en su propio hilo y contexto, como el proceso aparte que es systemd.
+    """
+
+    XML = """
+    <node>
+      <interface name="org.freedesktop.systemd1.Manager">
+        <method name="Subscribe"/>
+        <method name="LoadUnit">
+          <arg name="name" type="s" direction="in"/>
+          <arg name="unit" type="o" direction="out"/>
+        </method>
+        <signal name="Reloading"><arg name="active" type="b"/></signal>
+        <signal name="UnitFilesChanged"/>
+      </interface>
+    </node>
+    """
+
+    def __init__(self, address):
+        super().__init__(name="fake-systemd", daemon=True)
+        self.address = address
+        self.calls = []
+        self.ready = threading.Event()
+
+    @staticmethod
+    def unit_path(unit):
+        return "/org/freedesktop/systemd1/unit/" + unit.replace("-", "_2d").replace(".", "_2e")
+
+    def run(self):
+        context = GLib.MainContext()
+        context.push_thread_default()
+        self.connection = Gio.DBusConnection.new_for_address_sync(
+            self.address,
+            Gio.DBusConnectionFlags.AUTHENTICATION_CLIENT | Gio.DBusConnectionFlags.MESSAGE_BUS_CONNECTION,
+            None, None
+        )
+        self.connection.set_exit_on_close(False)
+        interface = Gio.DBusNodeInfo.new_for_xml(self.XML).interfaces[0]
+        self.connection.register_object(dragwaysk_gui.SystemdWatcher.MANAGER_PATH, interface, self.on_call, None, None)
+        self.connection.call_sync(
+            "org.freedesktop.DBus", "/org/freedesktop/DBus", "org.freedesktop.DBus", "RequestName",
+            GLib.Variant("(su)", (dragwaysk_gui.SystemdWatcher.BUS_NAME, 0)), None, Gio.DBusCallFlags.NONE, -1, None
+        )
+        self.loop = GLib.MainLoop(context)
+        self.ready.set()
+        self.loop.run()
+
+    def on_call(self, connection, sender, path, interface, method, params, invocation):
+        self.calls.append(method)
+        if method == "LoadUnit":
+            invocation.return_value(GLib.Variant("(o)", (self.unit_path(params.unpack()[0]),)))
+        else:
+            invocation.return_value(None)
+
+    def set_state(self, unit, state):
+        self.connection.emit_signal(
+            None, self.unit_path(unit), "org.freedesktop.DBus.Properties", "PropertiesChanged",
+            GLib.Variant("(sa{sv}as)", (
+                dragwaysk_gui.SystemdWatcher.UNIT_IFACE, {"ActiveState": GLib.Variant("s", state)}, []
+            ))
+        )
+        self.connection.flush_sync(None)
+
+    def unit_files_changed(self):
+        self.connection.emit_signal(
+            None, dragwaysk_gui.SystemdWatcher.MANAGER_PATH, dragwaysk_gui.SystemdWatcher.MANAGER_IFACE,
+            "UnitFilesChanged", None
+        )
+        self.connection.flush_sync(None)
+
+    def stop(self):
+        self.loop.quit()
+
+
+@unittest.skipIf(MISSING, MISSING)
+class SystemdWatcherTest(unittest.TestCase):
+
+    def setUp(self):
+        self.saved_env = {key: os.environ.get(key) for key in ("DBUS_SESSION_BUS_ADDRESS", "DRAGWAYSK_SYSTEMD_BUS")}
+        os.environ["DRAGWAYSK_SYSTEMD_BUS"] = "session"
+        self.buses = []
+        self.start_bus()
+
+        # La ventana sin GTK: sus métodos reales con los colaboradores que usan
+        self.applied = []
+        self.polled = []
+        window = types.SimpleNamespace(
+            service_rows=[
+                types.SimpleNamespace(service_name="mariadb", service_exists=True),
+                types.SimpleNamespace(service_name="shinobi", service_exists=True),
+            ],
+            pm2_watcher=types.SimpleNamespace(watched_services=set),
+            broker=types.SimpleNamespace(connected=False),
+            broker_source="pendiente",  # La conexión al broker no entra en estas pruebas
+            _check_populated=lambda: None,
+            scheduler=types.SimpleNamespace(
+                paused=False, set_services=lambda services: self.polled.append([s["service"] for s in services])
+            ),
+            poller=dragwaysk_gui.StatusPoller(lambda changes: None),
+            apply_statuses=self.applied.append,
+        )
+        window.polled_rows = lambda: dragwaysk_gui.ControlPanelWindow.polled_rows(window)
+        window.update_polling = lambda: dragwaysk_gui.ControlPanelWindow.update_polling(window)
+        self.window = window
+        self.unit_files_changes = []
+        self.watcher = dragwaysk_gui.SystemdWatcher(
+            lambda statuses: dragwaysk_gui.ControlPanelWindow.on_watcher_changes(window, statuses),
+            lambda: dragwaysk_gui.ControlPanelWindow.update_polling(window),
+            lambda: self.unit_files_changes.append(True)
+        )
+        window.systemd_watcher = self.watcher
+        self.watcher.start(["mariadb"])
+        # No bloquea: la conexión y las llamadas se resuelven en el bucle principal
+        self.assertEqual(self.systemd.calls, [])
+        self.assertEqual(self.watcher.watched_services(), set())
+        self.assertTrue(iterate_until(lambda: self.watcher.watched_services()))
+
+    def start_bus(self):
+        """Un dbus-daemon de sesión nuevo con su systemd simulado; queda como bus de sesión"""
+        self.daemon = subprocess.Popen(
+            ["dbus-daemon", "--session", "--nofork", "--print-address=1"],
+            stdout=subprocess.PIPE, text=True
+        )
+        address = self.daemon.stdout.readline().strip()
+        os.environ["DBUS_SESSION_BUS_ADDRESS"] = address
+        self.systemd = FakeSystemd(address)
+        self.systemd.start()
+        self.buses.append((self.daemon, self.systemd))
+        self.assertTrue(self.systemd.ready.wait(5))
+
+    def tearDown(self):
+        self.watcher.stop()
+        self.window.poller.shutdown()
+        for daemon, systemd in self.buses:
+            systemd.stop()
+            systemd.join(5)
+            if daemon.poll() is None:
+                daemon.terminate()
+            daemon.wait()
+            daemon.stdout.close()
+        for key, value in self.saved_env.items():
+            if value is None:
+                os.environ.pop(key, None)
+            else:
+                os.environ[key] = value
+        # La conexión de sesión es un singleton débil: sin referencias, la próxima prueba abre otra
+        self.watcher = self.window = None
+        gc.collect()
+
+    def test_subscribes_through_the_manager(self):
+        self.assertEqual(self.systemd.calls, ["Subscribe", "LoadUnit"])
+        self.assertEqual(self.watcher.watched_services(), {"mariadb"})
+        dragwaysk_gui.ControlPanelWindow.update_polling(self.window)
+        self.assertEqual(self.polled[-1], ["shinobi"])  # mariadb llega por señales y no se sondea
+
+    def test_properties_changed_reaches_apply_statuses(self):
+        self.systemd.set_state("mariadb.service", "activating")  # Transitorio: se ignora
+        self.systemd.set_state("mariadb.service", "failed")
+        self.assertTrue(iterate_until(lambda: self.applied))
+        self.assertEqual(self.applied, [{"mariadb": "failed"}])
+
+        self.systemd.set_state("mariadb.service", "failed")  # Sin cambio: no se vuelve a aplicar
+        self.systemd.set_state("mariadb.service", "active")
+        self.assertTrue(iterate_until(lambda: len(self.applied) == 2))
+        self.assertEqual(self.applied[1], {"mariadb": "active"})
+
+    def test_signals_of_other_units_are_ignored(self):
+        self.systemd.set_state("cups.service", "failed")
+        self.systemd.set_state("mariadb.service", "inactive")
+        self.assertTrue(iterate_until(lambda: self.applied))
+        self.assertEqual(self.applied, [{"mariadb": "inactive"}])
+
+    def test_unit_files_changed(self):
+        self.systemd.unit_files_changed()
+        self.assertTrue(iterate_until(lambda: self.unit_files_changes))
+
+    def test_polling_resumes_when_the_bus_disappears(self):
+        self.daemon.terminate()
+        self.daemon.wait()
+        self.assertTrue(iterate_until(lambda: not self.watcher.active))
+        self.assertEqual(self.watcher.watched_services(), set())
+        self.assertIsNone(self.watcher.bus)  # Se volverá a suscribir en la próxima comprobación
+        # on_watched_changed es update_polling: mariadb vuelve al planificador de sondeo
+        self.assertEqual(sorted(self.polled[-1]), ["mariadb", "shinobi"])
+
+        # Vuelve el bus y la próxima comprobación de existencia no trae servicios nuevos:
+        # igualmente se suscriben de nuevo todos los existentes, no solo los que aparecieron
+        gc.collect()  # Suelta la conexión cerrada para que Gio abra otra con la nueva dirección
+        self.start_bus()
+        dragwaysk_gui.ControlPanelWindow._apply_existence(self.window, {"mariadb": True, "shinobi": True})
+        self.assertTrue(iterate_until(lambda: self.watcher.watched_services() == {"mariadb"}))
+        self.assertEqual(self.systemd.calls, ["Subscribe", "LoadUnit"])
+        self.assertEqual(self.polled[-1], ["shinobi"])
+
+        self.systemd.set_state("mariadb.service", "failed")
+        self.assertTrue(iterate_until(lambda: self.applied))
+        self.assertEqual(self.applied, [{"mariadb": "failed"}])
+
+
+if __name__ == "__main__":
+    unittest.main()